@@ -29,6 +29,8 @@ from generator.config.Config import Config
 from generator.config.GeneratorArguments import GeneratorArguments
 from generator.runtime.Log import Log
 from generator.runtime.InterruptRegistry import InterruptRegistry
+from generator.runtime import Generatord, DirWatcher
+from generator.resource.Library import Library
 
 #import warnings
 #warnings.filterwarnings("error") # turn warnings into errors - e.g. for UnicodeWarning
@@ -131,9 +133,30 @@ def initConfig(console, options, args):
    return config;
 
 
-def main():
+##
+# Run as a daemon, forward to a running daemon, or run the jobs here
+#
+# @param argv    {List} command line args
+# @param forward {Boolean} whether the command line may be forwarded to a daemon
+#
+def main(argv, forward=True):
     global options
-    (options, args) = GeneratorArguments(option_class=ExtendAction).parse_args(sys.argv[1:])
+    (options, args) = GeneratorArguments(option_class=ExtendAction).parse_args(argv)
+
+    # Daemon mode
+    if options.daemon or options.daemon_stop or (forward and not options.no_daemon):
+        sockPath = Generatord.socketPath(options.config)
+        if options.daemon:
+            runDaemon(sockPath)
+            return
+        elif options.daemon_stop:
+            if Generatord.stop(sockPath) is None:
+                print("No generator daemon running for %s" % options.config)
+            return
+        else:
+            code = Generatord.forward(sockPath, argv)
+            if code is not None:
+                sys.exit(code)
 
     if args:
         options.jobs = args[0].split(',')
@@ -141,7 +164,7 @@ def main():
         options.jobs = []
 
     # Save cli options to Context
-    gen_opts = [x for x in sys.argv[1:] if x not in args]  # cli options without jobs list
+    gen_opts = [x for x in argv if x not in args]  # cli options without jobs list
     Context.generator_opts = gen_opts  # as list
 
     # Initialize console
@@ -260,22 +283,43 @@ def main():
     return
 
 
-if __name__ == '__main__':
+def runDaemon(sockPath):
+    if not Generatord.available():
+        raise RuntimeError("Daemon mode is not supported on this platform")
+
+    def runForwarded(argv):
+        interruptRegistry.Callbacks.clear()  # registered by the previous run's objects
+        return runMain(argv, forward=False)
+
+    Library.watchDirs = DirWatcher.available()  # library scans stay in memory
+
+    Generatord.Generatord(sockPath, runForwarded, Log()).serve()
+
+
+##
+# Run main(), turning the outcome into an exit code
+def runMain(argv, forward=True):
+    global options
     options = None
     try:
         #sys.settrace(stacktrace)
-        main()
+        main(argv, forward)
+
+    except SystemExit as e:
+        return e.code or 0
 
     except KeyboardInterrupt:
         print()
         print("Keyboard interrupt!")
         interruptCleanup()
-        sys.exit(2)
+        return 2
 
     except Exception as e:
         interruptCleanup()
         if (options == None or            # do a stack trace if we fail when parsing options
            (hasattr(options, "stacktrace") and options.stacktrace)):  # or when 'stacktrace' is enabled
+            if hasattr(e, "workerTraceback"):  # raised in a worker process (see Generator.runParallel())
+                print("Worker process " + e.workerTraceback, file=sys.stderr)
             raise
         else:
             err = ''
@@ -290,4 +334,10 @@ if __name__ == '__main__':
             else:
                 msg = "\nTerminating on {0}; please re-run with -s.".format(type(e))
                 print(msg, file=sys.stderr)
-            sys.exit(1)
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(runMain(sys.argv[1:]))
@@ -486,6 +486,268 @@ class Tokenizer(object):
         return '\n'.join(nlines)
 
 
+##
+# Token  -- compact token, as produced by FastTokenizer
+#
+# Carries the attributes treegenerator.TokenStream works with (so it needs no
+# copy of its own), and answers dict-style access with the keys of the token
+# dicts of Tokenizer ('type', 'source', ...) for other consumers.
+class Token(object):
+    __slots__ = ('name', 'value', 'detail', 'line', 'column', 'id',
+                 'begin', 'end', 'connection', 'multiline')
+
+    def __init__(self, name, value, detail, line, column, id):
+        self.name   = name     # token type, "operator" where Tokenizer has "token"
+        self.value  = value    # source text
+        self.detail = detail
+        self.line   = line
+        self.column = column
+        self.id     = id       # id of the tokenized file/string
+        self.begin = self.end = self.connection = self.multiline = None  # comments only
+
+    type   = property(lambda self: "token" if self.name == "operator" else self.name)
+    source = property(lambda self: self.value)
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def __str__(self):
+        return "(%s[\"%s...\"](%s:%s))" % (self.name, self.value[:10], self.line, self.column)
+
+    __repr__ = __str__
+
+
+##
+# FastTokenizer -- Tokenizer in a single pass
+#
+# Produces the same tokens as Tokenizer.parseStream() (s. the conformance test
+# in tool/test/compiler/tokenizer.py), as Token objects, but runs the
+# low-level scanner regexps itself instead of stacking generators, and
+# creates a single object per token.
+#
+# Tokenizer classifies a token while the tokens up to two positions before it
+# may not have been added to its output yet (when they are comments, which
+# peek ahead for their 'end' attribute), and looks behind only at what has
+# been added. This is reproduced here by limiting the look-behind to <n>
+# tokens, s. _lookBehind().
+class FastTokenizer(Tokenizer):
+
+    patt      = Scanner.Scanner.patt
+    stringEnd = Scanner.Scanner.stringEnd
+
+    ##
+    # Interface function
+    def parseStream(self, content, uniqueId=""):
+        out        = []
+        comments   = []  # indices of comments in out
+        line       = 1
+        sol        = 0  # index of start-of-line
+        cursor     = 0
+        lenData    = len(content)
+        match      = self.patt.match
+        TOKENS     = lang.TOKENS
+        RESERVED   = lang.RESERVED
+        BUILTIN    = lang.BUILTIN
+
+        while cursor < lenData:
+            mo     = match(content, cursor)
+            kind   = mo.lastgroup
+            value  = mo.group()
+            column = cursor - sol + 1
+            cursor = mo.end()
+
+            if kind == 'white':
+                token = Token('white', value, '', line, column, uniqueId)
+
+            elif kind == 'nl':
+                token = Token('eol', '\n', '', line, column, uniqueId)
+                line += 1
+                sol   = cursor
+
+            elif kind == 'float':
+                token = Token('number', value, 'float', line, column, uniqueId)
+
+            elif kind in ('hexnum', 'number'):
+                token = Token('number', value, 'int', line, column, uniqueId)
+
+            # string
+            elif value in ('"', "'"):
+                token = Token('string', value, 'doublequotes' if value == '"' else 'singlequotes', line, column, uniqueId)
+                source, cursor = self._scanDelimited(content, cursor, value, token, "Unterminated string: '%s'")
+                token.value = source[:-1]
+                line += token.value.count("\n")
+
+            # operator
+            elif value in TOKENS:
+
+                # division, div-assignment, regexp
+                if value in ('/', '/='):
+                    n = self._lookBehind(out)
+                    prev = None
+                    for i in xrange(n-1, -1, -1):
+                        if out[i].name not in ('eol', 'white'):
+                            prev = out[i]
+                            break
+                    if (prev is None or (
+                            prev.name not in ('number', 'name', 'string')
+                            and prev.detail not in ('RP', 'RB'))):
+                        token = Token('regexp', value, '', line, column, uniqueId)
+                        regexp, cursor = self._scanRegexp(content, cursor, token)
+                        token.value += regexp
+                    else:
+                        token = Token('operator', value, TOKENS[value], line, column, uniqueId)
+
+                # comment, inline
+                elif value == '//':
+                    token = Token('comment', value, 'inline', line, column, uniqueId)
+                    n = self._lookBehind(out)
+                    if n and out[n-1].value == '\\':
+                        self.raiseSyntaxException(token, "Inline comment out of context")
+                    mo = self.stringEnd['\n'].match(content, cursor)
+                    cursor = mo.end()
+                    token.value    += mo.group()
+                    token.begin     = not self._hasLeadingContent(out, n)
+                    token.multiline = False
+                    comments.append(len(out))
+
+                # comment, multiline
+                elif value == '/*':
+                    token = Token('comment', value, '', line, column, uniqueId)
+                    n = self._lookBehind(out)
+                    if n and out[n-1].value == '\\':
+                        self.raiseSyntaxException(token, "Multiline comment out of context")
+                    commnt, cursor = self._scanDelimited(content, cursor, r'\*/', token,
+                        "Unterminated multi-line comment:\n '%s'")
+                    token.value    += self.alignMultiLines(commnt, column)
+                    token.detail    = Comment.Comment(token.value).getFormat()
+                    token.begin     = not self._hasLeadingContent(out, n)
+                    linecnt         = token.value.count("\n")
+                    line           += linecnt
+                    token.multiline = linecnt > 0
+                    comments.append(len(out))
+
+                # every other operator goes as is
+                else:
+                    token = Token('operator', value, TOKENS[value], line, column, uniqueId)
+
+            # JS keywords, unless they are a property (a.import)
+            elif value in RESERVED and not self._follows(out, "DOT"):
+                token = Token('reserved', value, RESERVED[value], line, column, uniqueId)
+
+            # JS/BOM objects
+            elif value in BUILTIN:
+                token = Token('builtin', value, '', line, column, uniqueId)
+
+            # identifier
+            elif value[:2] == "__":
+                token = Token('name', value, 'private', line, column, uniqueId)
+            elif value[0] == "_":
+                token = Token('name', value, 'protected', line, column, uniqueId)
+            else:
+                token = Token('name', value, 'public', line, column, uniqueId)
+
+            out.append(token)
+
+        out.append(Token('eof', '', '', line, lenData - sol + 1, uniqueId))
+
+        # comment attributes that depend on the following tokens
+        for i in comments:
+            token = out[i]
+            nextNames = [x.name for x in out[i+1:i+3]] + [None]
+            token.end = (nextNames[0] == 'eol' or nextNames[:2] == ['white', 'eol'])
+            token.connection = "after" if token.end and not token.begin else "before"
+
+        return out
+
+
+    ##
+    # Number of tokens in <out> a new token gets to look behind at
+    def _lookBehind(self, out):
+        n = len(out)
+        if n > 1 and out[n-2].name == 'comment':
+            return n - 2
+        elif n > 0 and out[n-1].name == 'comment':
+            return n - 1
+        return n
+
+
+    def _follows(self, out, detail):
+        n = self._lookBehind(out)
+        return n > 0 and out[n-1].detail == detail
+
+
+    ##
+    # check if there is a preceding non-white token on this line
+    def _hasLeadingContent(self, out, n):
+        for i in xrange(n-1, -1, -1):
+            if out[i].name == 'eol':
+                return False
+            if out[i].name != 'white':
+                return True
+        return False
+
+
+    ##
+    # Scan up to the next unescaped <delimiter>
+    # @return (text including delimiter, new cursor)
+    def _scanDelimited(self, content, cursor, delimiter, token, unterminatedMsg):
+        search = self.stringEnd[delimiter].search
+        parts  = []
+        while True:
+            if cursor >= len(content):
+                self.raiseSyntaxException(token, unterminatedMsg % u''.join(parts))
+            mo = search(content, cursor)
+            if not mo:
+                self.raiseSyntaxException(token, "Unable to tokenize text starting with: \"%s\"" % content[cursor:cursor+200])
+            parts.append(mo.group())
+            cursor = mo.end()
+            if not Scanner.is_last_escaped(parts[-1]):  # be aware of escaped quotes
+                return u''.join(parts), cursor
+
+
+    ##
+    # Scan a regular expression, after its leading '/' (s. parseRegexp())
+    # @return (regexp text, new cursor)
+    def _scanRegexp(self, content, cursor, token):
+        match   = self.patt.match
+        lenData = len(content)
+        rexp    = ""
+        in_char_class = False
+        while True:
+            if cursor >= lenData:
+                self.raiseSyntaxException(token, "Unterminated regexp literal: '%s'" % rexp)
+            mo     = match(content, cursor)
+            value  = mo.group(mo.lastgroup)
+            cursor = mo.end()
+            rexp  += value
+            if value == "[":
+                if not Scanner.is_last_escaped(rexp):
+                    in_char_class = True
+            elif value == "]" and in_char_class:
+                if not Scanner.is_last_escaped(rexp):
+                    in_char_class = False
+            elif mo.lastgroup == 'nl':
+                self.raiseSyntaxException(token, "Unterminated regexp literal: '%s'" % rexp)
+            elif rexp[-1] == "/" and not in_char_class:
+                if not Scanner.is_last_escaped(rexp):
+                    break
+
+        # regexp modifiers
+        if cursor < lenData:
+            mo = match(content, cursor)
+            if mo.lastgroup == 'ident':
+                rexp  += mo.group('ident')
+                cursor = mo.end()
+
+        return rexp, cursor
+
+
 if __name__ == "__main__":
     from misc import filetool
     if len(sys.argv)>1:
@@ -19,7 +19,7 @@
 #
 ################################################################################
 
-import sys, os, copy, re
+import sys, os, copy, itertools, re
 
 from misc import util
 
@@ -62,12 +62,33 @@ NODE_STATEMENT_CONTAINERS = ("statements", "block")
 
 class Node(object):
 
+    # Trees are big (about a million nodes for the framework classes), so the
+    # node fields live in slots; other attributes still go to the instance
+    # __dict__, which Python only creates when they are set.
+    __slots__ = ('type', 'parent', 'children', 'attributes', '__dict__')
+
+    dep = None  # a potential DependencyItem(); set in __dict__
+    _lazy = None  # the pending subtree of a lazily decoded tree (see treecodec); set in __dict__
+
     def __init__ (self, ntype):
         self.type = ntype
         self.parent = None
         self.children = []
         self.attributes = {}
-        self.dep = None # a potential DependencyItem()
+
+    ##
+    # Only called for attributes that are not set. The nodes of a subtree
+    # that a lazy treecodec has not decoded yet have their type and parent,
+    # and get children, attributes and comment lists on first access.
+    def __getattr__(self, name):
+        if name in _lazySlotNames and not _hasChildren(self):
+            node = self
+            while node is not None and node._lazy is None:
+                node = node.parent
+            if node is not None:
+                node._lazy.inflate()
+                return getattr(self, name)
+        raise AttributeError("'%s' object has no attribute '%s'" % (self.__class__.__name__, name))
 
     def __str__(self):
         return nodeToXmlStringNR(self)
@@ -110,6 +131,83 @@ class Node(object):
         if len(self.attributes) == 0:
             del self.attributes
 
+    ##
+    # (name, value) of the slots that are set, and the entries of __dict__
+    def _items(self):
+        _materialize(self)
+        for name, slot in _slotDescriptors(self.__class__):
+            try:
+                yield name, slot.__get__(self)
+            except AttributeError:
+                pass
+        extra = _instanceDict(self)
+        if extra:
+            for item in extra.items():
+                yield item
+
+    def __copy__(self):
+        clone_ = self.__class__.__new__(self.__class__)
+        for name, val in self._items():
+            setattr(clone_, name, val)
+        return clone_
+
+    def __deepcopy__(self, memo):
+        clone_ = self.__class__.__new__(self.__class__)
+        memo[id(self)] = clone_
+        for name, val in self._items():
+            setattr(clone_, name, copy.deepcopy(val, memo))
+        return clone_
+
+    ##
+    # Pickling
+    #
+    # The state of a node is (__dict__ or None, {slot : value}), without the
+    # children, which cPickle restores without calling back into Python. The
+    # top node of a tree adds the nodes below it, and the children lists of
+    # all of them, as flat preorder lists, which are linked up again by
+    # setting _subtree. So pickling a tree does not recurse along its depth,
+    # and nodes that are referenced from elsewhere (like scopes and hints) are
+    # still pickled only once. A node that is not among its parent's children
+    # (removeChild() keeps .parent) is the top node of its own subtree. The
+    # nodes of a subtree are looked up in _listedNodes, so telling them from
+    # top nodes does not search the children of their parents.
+    def __getstate__(self):
+        _materialize(self)
+        slots = {}
+        for name, slot in _stateSlotDescriptors(self.__class__):
+            try:
+                slots[name] = slot.__get__(self)
+            except AttributeError:
+                pass
+
+        parent = self.parent
+        index = _listedNodes.pop(id(self), None)
+        if index is not None and _isChildAt(parent, self, index):
+            isTop = False
+        else:
+            isTop = parent is None or self not in parent.children
+        if isTop:
+            if parent is None:
+                _listedNodes.clear()  # left over by nodes pickled before their top node
+            nodes = []
+            stack = [self]
+            while stack:
+                node = stack.pop()
+                nodes.append(node)
+                children = node.children
+                for i, child in enumerate(children):
+                    _listedNodes[id(child)] = i
+                stack.extend(reversed(children))
+            slots['_subtree'] = (nodes, [x.children for x in nodes])
+
+        return (_instanceDict(self), slots)
+
+    def _setSubtree(self, subtree):
+        for node, children in itertools.izip(*subtree):
+            node.children = children
+
+    _subtree = property(None, _setSubtree)
+
     ##
     # Make a default copy of self (this includes instanceof)
     def clone(self):
@@ -123,7 +221,7 @@ class Node(object):
     # Copy the properties of self into other
     # (this might not be entirely in sync with treegenerator.symbol())
     def patch(self, other):
-        for attr, val in vars(self).items():
+        for attr, val in list(self._items()):
             if attr in (
                 "type", "id",  # preserve other's classification
                 "children", # don't adopt existing children (what would their .parent be?!)
@@ -649,6 +747,74 @@ class Node(object):
             return
 
 
+##
+# Pickling helpers for Node
+
+_slotCache = {}  # {class : (slot names, [(name, descriptor)], pickled [(name, descriptor)])}
+
+##
+# Reading slots through their descriptors does not fall back to
+# Node.__getattr__ for unset ones
+def _slotNamesOf(cls):
+    try:
+        return _slotCache[cls]
+    except KeyError:
+        slots = tuple((name, c.__dict__[name]) for c in reversed(cls.__mro__)
+                      for name in c.__dict__.get('__slots__', ())
+                      if name not in ('__dict__', '__weakref__'))
+        names = tuple(name for name, _ in slots)
+        stateSlots = tuple(x for x in slots if x[0] != 'children')
+        return _slotCache.setdefault(cls, (names, slots, stateSlots))
+
+def _slotNames(cls):
+    return _slotNamesOf(cls)[0]
+
+def _slotDescriptors(cls):
+    return _slotNamesOf(cls)[1]
+
+def _stateSlotDescriptors(cls):
+    return _slotNamesOf(cls)[2]
+
+##
+# The nodes of the subtrees collected by Node.__getstate__() that are not
+# pickled yet, {id(node) : index in its parent's children}. Entries are only
+# hints, which _isChildAt() checks, as ids of freed nodes are reused.
+_listedNodes = {}
+
+def _isChildAt(parent, node, index):
+    if parent is None:
+        return False
+    children = parent.children
+    return index < len(children) and children[index] is node
+
+_lazySlotNames = frozenset(('children', 'attributes', 'comments', 'commentsIn', 'commentsAfter'))
+
+_childrenSlot = Node.__dict__['children']
+
+def _hasChildren(node):
+    try:
+        _childrenSlot.__get__(node, Node)
+    except AttributeError:
+        return False
+    return True
+
+##
+# Decode the pending subtree <node> belongs to, if any
+def _materialize(node):
+    if not _hasChildren(node):
+        getattr(node, 'children', None)
+
+##
+# The __dict__ of <node>, or None if it is empty. (Reading the attribute makes
+# Python create an empty dict, which is dropped again.)
+def _instanceDict(node):
+    extra = node.__dict__
+    if not extra:
+        del node.__dict__
+        return None
+    return extra
+
+
 def nodeToXmlStringNR(node, prefix="", encoding="utf-8"):
     hasText = False
     asString = prefix + "<" + node.type
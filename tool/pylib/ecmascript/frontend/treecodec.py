@@ -0,0 +1,393 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+################################################################################
+#
+#  qooxdoo - the new era of web development
+#
+#  http://qooxdoo.org
+#
+#  License:
+#    MIT: https://opensource.org/licenses/MIT
+#    See the LICENSE file in the project's top-level directory for details.
+#
+################################################################################
+
+##
+# treecodec -- Binary encoding of syntax trees for the cache
+#
+# A tree is stored as columns over its nodes, in breadth-first order, so the
+# children of every node are a contiguous slice of the node list and parent
+# links can be re-created from indices. The nodes in the comment lists of
+# nodes (comments, commentsIn, commentsAfter) are encoded as further roots.
+#
+# The subtrees of the entries of the members, statics and properties maps of
+# a class are encoded as segments of their own, after the rest of the tree.
+# A lazy codec only decodes them when a node of the subtree is accessed for
+# its children, attributes or comment lists (see tree.Node.__getattr__), so
+# looking up the class map or a single method does not decode all the code.
+#
+#   MAGIC, len(columns), marshal(columns), cPickle(extras)
+#
+#   columns  (classes, types, classIndex, typeIndex, parentIndex, skeleton,
+#             subtrees)
+#     classes      [(module, name)] of the node classes
+#     types        [type] string pool of node types
+#     classIndex, typeIndex, parentIndex
+#                  array('i') per node; a parent index of -1 is None
+#     skeleton     segment of the tree without the subtrees
+#     subtrees     [(head, start, roots, marshal(segment))] the segments of
+#                  the subtrees, with the index of the subtree node, the index
+#                  of the first node below it, and the indices of the comment
+#                  nodes of the segment
+#   segment  (childCounts, attributes, nodeLists), each for the head node and
+#            the nodes from start on
+#     childCounts  array('i'), -1 for the head of a subtree
+#     attributes   [{key:value}], None if the node has none
+#     nodeLists    [(node index, list name, [node index] | earlier entry)]
+#                  for the comment lists that are not empty or shared
+#   extras   {node index : [(name, value)]}, all other slots and __dict__
+#            entries of the nodes, and parents not among the nodes; nodes
+#            are pickled as their indices
+#
+# Decoding runs in a few loops over the node list, and marshal restores the
+# attribute tables (with interned type and key strings) in C. A content that
+# is not a regular tree (no Node, nodes shared by several children lists) is
+# pickled as a whole.
+##
+
+import sys, gc, array, itertools, marshal, struct
+import cPickle as pickle
+import cStringIO as StringIO
+
+from ecmascript.frontend import tree, treeutil
+
+MAGIC          = "QXT\x02"
+MAGIC_PICKLE   = "QXP\x01"
+NODE_LISTS     = ("comments", "commentsIn", "commentsAfter")
+COLUMN_SLOTS   = frozenset(("type", "parent", "children", "attributes") + NODE_LISTS)
+LAZY_MAPS      = ("members", "statics", "properties")
+
+_setType   = tree.Node.__dict__['type'].__set__
+_setParent = tree.Node.__dict__['parent'].__set__
+
+
+class TreeCodec(object):
+
+    ##
+    # @param lazy  {Bool} whether decode() leaves the subtrees of class map
+    #              entries to their first access
+    def __init__(self, lazy=False):
+        self.lazy = lazy
+
+
+    ##
+    # Encode <content> (a tree.Node) to a string
+    def encode(self, content):
+        if isinstance(content, tree.Node):
+            try:
+                try:
+                    return self._encodeTree(content, _classMapEntries(content))
+                except _SharedAcrossSegments:
+                    return self._encodeTree(content, ())
+            except _IrregularTree:
+                pass
+        return MAGIC_PICKLE + pickle.dumps(content, 2)
+
+
+    ##
+    # Decode a string returned by encode()
+    def decode(self, data):
+        if data.startswith(MAGIC):
+            return self._decodeTree(data)
+        elif data.startswith(MAGIC_PICKLE):
+            return pickle.loads(data[len(MAGIC_PICKLE):])
+        else:
+            raise ValueError("Not an encoded tree")
+
+
+    def _encodeTree(self, root, lazyRoots):
+        encoder = _Encoder(lazyRoots)
+        encoder.add(root)
+        _, _, skeleton = encoder.segment(0, root)
+        subtrees = []
+        for segmentId, head in enumerate(encoder.subtreeHeads, 1):
+            start, roots, segment = encoder.segment(segmentId, head)
+            subtrees.append((encoder.index[id(head)], start, roots, marshal.dumps(segment, 2)))
+
+        classes, classIds = [], {}
+        types, typeIds = [], {}
+        classIndex  = array.array('i')
+        typeIndex   = array.array('i')
+        parentIndex = array.array('i')
+        index = encoder.index
+        for pos, node in enumerate(encoder.nodes):
+            cls = node.__class__
+            if cls not in classIds:
+                classIds[cls] = len(classes)
+                classes.append((cls.__module__, cls.__name__))
+            classIndex.append(classIds[cls])
+            ntype = node.type
+            if ntype not in typeIds:
+                typeIds[ntype] = len(types)
+                types.append(intern(ntype) if type(ntype) is str else ntype)
+            typeIndex.append(typeIds[ntype])
+            parent = node.parent
+            if parent is None:
+                parentIndex.append(-1)
+            elif id(parent) in index:
+                parentIndex.append(index[id(parent)])
+            else:
+                parentIndex.append(-1)
+                encoder.extras.setdefault(pos, []).append(("parent", parent))
+
+        columns = marshal.dumps((classes, types, classIndex.tostring(), typeIndex.tostring(),
+            parentIndex.tostring(), skeleton, subtrees), 2)
+
+        out = StringIO.StringIO()
+        pickler = pickle.Pickler(out, 2)
+        pickler.inst_persistent_id = lambda obj: index.get(id(obj))
+        pickler.dump(encoder.extras)
+
+        return MAGIC + struct.pack("<I", len(columns)) + columns + out.getvalue()
+
+
+    def _decodeTree(self, data):
+        offset = len(MAGIC) + 4
+        if len(data) < offset:
+            raise ValueError("Truncated tree")
+        size, = struct.unpack("<I", data[len(MAGIC):offset])
+        (classes, types, classIndex, typeIndex, parentIndex,
+            skeleton, subtrees) = marshal.loads(data[offset:offset + size])
+
+        classes = [getattr(_module(module), name) for module, name in classes]
+        listClasses = frozenset(cls for cls in classes if _hasListSlots(cls))
+        nodes = map(object.__new__, map(classes.__getitem__, array.array('i', classIndex)))
+        map(_setType, nodes, map(types.__getitem__, array.array('i', typeIndex)))
+        map(_setParent, nodes, map((nodes + [None]).__getitem__, array.array('i', parentIndex)))
+
+        _fill(nodes, listClasses, 0, 1, skeleton)
+        for head, start, roots, segment in subtrees:
+            if self.lazy:
+                subtree = _Subtree(nodes, listClasses, head, start, roots, segment)
+                for pos in [head] + roots:
+                    nodes[pos]._lazy = subtree
+            else:
+                _fill(nodes, listClasses, head, start, marshal.loads(segment))
+
+        unpickler = pickle.Unpickler(StringIO.StringIO(data[offset + size:]))
+        unpickler.persistent_load = nodes.__getitem__
+        for pos, extra in unpickler.load().iteritems():
+            node = nodes[pos]
+            for name, value in extra:
+                setattr(node, name, value)
+
+        return nodes[0]
+
+
+##
+# Collects the nodes of a tree and encodes them segment by segment
+class _Encoder(object):
+
+    def __init__(self, lazyRoots):
+        self.lazyRoots    = set(map(id, lazyRoots))
+        self.subtreeHeads = []  # nodes of lazyRoots, in the order of the tree
+        self.nodes        = []
+        self.index        = {}  # {id(node) : index in nodes}
+        self.listEntries  = {}  # {id(list) : (segment id, entry number in nodeLists | first use)}
+        self.classSlots   = {}  # {class : ([(name, descriptor)] of the comment lists, of the extras)}
+        self.extras       = {}
+
+    def add(self, node):
+        if id(node) in self.index:
+            raise _IrregularTree()
+        self.index[id(node)] = len(self.nodes)
+        self.nodes.append(node)
+
+    ##
+    # Encode <head> and the nodes below it, apart from subtrees that get
+    # segments of their own
+    def segment(self, segmentId, head):
+        nodes = self.nodes
+        start = len(nodes)
+        childCounts  = array.array('i')
+        attributes   = []
+        nodeLists    = []
+        roots        = []
+        pendingRoots = []
+
+        pos = self.index[id(head)]
+        cursor = start
+        while True:
+            node = nodes[pos]
+            if segmentId == 0 and id(node) in self.lazyRoots:
+                self.subtreeHeads.append(node)
+                childCounts.append(-1)
+                attributes.append(None)
+            else:
+                childCounts.append(len(node.children))
+                for child in node.children:
+                    self.add(child)
+                attributes.append(getattr(node, "attributes", None))
+                self._encodeItems(segmentId, pos, node, nodeLists, pendingRoots)
+
+            if cursor == len(nodes):
+                # the tree is done, continue with the next comment node
+                while pendingRoots and id(pendingRoots[-1]) in self.index:
+                    pendingRoots.pop()
+                if not pendingRoots:
+                    break
+                roots.append(cursor)
+                self.add(pendingRoots.pop())
+            pos = cursor
+            cursor += 1
+
+        nodeLists = [(pos, name, value if isinstance(value, int) else [self.index[id(x)] for x in value])
+                     for pos, name, value in nodeLists]
+        return start, roots, (childCounts.tostring(), attributes, nodeLists)
+
+    ##
+    # Sort the slots and __dict__ entries of <node> into the comment lists and
+    # the extras
+    def _encodeItems(self, segmentId, pos, node, nodeLists, pendingRoots):
+        cls = node.__class__
+        if cls not in self.classSlots:
+            slots = tree._slotDescriptors(cls)
+            self.classSlots[cls] = ([x for x in slots if x[0] in NODE_LISTS],
+                                    [x for x in slots if x[0] not in COLUMN_SLOTS])
+        listSlots, extraSlots = self.classSlots[cls]
+
+        for name, slot in listSlots:
+            try:
+                value = slot.__get__(node)
+            except AttributeError:
+                continue
+            key = id(value)
+            if key in self.listEntries:
+                listSegment, entry = self.listEntries[key]
+                if listSegment != segmentId:
+                    raise _SharedAcrossSegments()
+                if type(entry) is tuple:
+                    # a shared empty list, only recorded now
+                    nodeLists.append(entry)
+                    entry = len(nodeLists) - 1
+                    self.listEntries[key] = (segmentId, entry)
+                nodeLists.append((pos, name, entry))
+            elif value:
+                self.listEntries[key] = (segmentId, len(nodeLists))
+                nodeLists.append((pos, name, value))
+                pendingRoots.extend(reversed(value))
+            else:
+                self.listEntries[key] = (segmentId, (pos, name, []))
+
+        extra = []
+        for name, slot in extraSlots:
+            try:
+                extra.append((name, slot.__get__(node)))
+            except AttributeError:
+                pass
+        instanceDict = tree._instanceDict(node)
+        if instanceDict:
+            extra.extend(instanceDict.iteritems())
+        if extra:
+            self.extras[pos] = extra
+
+
+##
+# A segment of a lazily decoded tree, set as ._lazy on its head and comment
+# nodes until it is inflated
+class _Subtree(object):
+
+    def __init__(self, nodes, listClasses, head, start, roots, segment):
+        self.nodes       = nodes
+        self.listClasses = listClasses
+        self.head        = head
+        self.start       = start
+        self.roots       = roots
+        self.segment     = segment
+
+    def inflate(self):
+        nodes = self.nodes
+        for pos in [self.head] + self.roots:
+            del nodes[pos]._lazy
+            tree._instanceDict(nodes[pos])  # drops an empty __dict__
+        # like Cache.read(), keep the collector from scanning the heap for all
+        # the new containers
+        gcEnabled = gc.isenabled()
+        gc.disable()
+        try:
+            _fill(nodes, self.listClasses, self.head, self.start, marshal.loads(self.segment))
+        finally:
+            if gcEnabled:
+                gc.enable()
+
+
+##
+# Set children, attributes and comment lists of the nodes of a segment
+def _fill(nodes, listClasses, head, start, segment):
+    childCounts, attributes, nodeLists = segment
+    childCounts = array.array('i', childCounts)
+    segmentNodes = [nodes[head]] + nodes[start:start + len(childCounts) - 1]
+
+    next = start  # index of the next node that is a child
+    for pos, node, count, attrs in itertools.izip(
+            itertools.chain((head,), itertools.count(start)), segmentNodes, childCounts, attributes):
+        if pos == next:
+            next += 1  # a root
+        if count < 0:
+            continue  # a subtree of its own
+        node.children = nodes[next:next + count]
+        next += count
+        if attrs is not None:
+            node.attributes = attrs
+        if node.__class__ in listClasses:
+            node.comments = []
+            node.commentsIn = []
+            node.commentsAfter = []
+
+    lists = []
+    for pos, name, value in nodeLists:
+        if isinstance(value, int):
+            value = lists[value]
+        else:
+            value = [nodes[x] for x in value]
+        lists.append(value)
+        setattr(nodes[pos], name, value)
+
+
+##
+# The value nodes of the entries of the members, statics and properties maps,
+# if <root> defines a class
+def _classMapEntries(root):
+    try:
+        qxDefine = treeutil.findQxDefine(root)
+        classMap = treeutil.getClassMap(qxDefine) if qxDefine else {}
+    except tree.NodeAccessException:
+        return []
+    result = []
+    for key in LAZY_MAPS:
+        entries = classMap.get(key)
+        if isinstance(entries, dict):
+            result.extend(entries.values())
+    return result
+
+
+class _IrregularTree(Exception):
+    pass
+
+
+class _SharedAcrossSegments(Exception):
+    pass
+
+
+def _hasListSlots(cls):
+    return NODE_LISTS[0] in tree._slotNames(cls)
+
+
+def _module(name):
+    if name not in sys.modules:
+        __import__(name)
+    return sys.modules[name]
+
+
+codec     = TreeCodec()
+lazyCodec = TreeCodec(lazy=True)
@@ -43,7 +43,7 @@
 #   nud => pfix
 ##
 
-import sys, os, re, types, string, itertools as itert
+import sys, os, re, types, string, threading, itertools as itert
 from ecmascript.frontend.SyntaxException import SyntaxException
 from ecmascript.frontend.tree            import Node
 from ecmascript.frontend.Scanner         import IterObject, LQueue, LimLQueue, is_last_escaped
@@ -102,7 +102,7 @@ SYMBOLS = {
 }
 
 def expressionTerminated():
-    return token.id in StmntTerminatorTokens or tokenStream.eolBefore
+    return ps.token.id in StmntTerminatorTokens or ps.tokenStream.eolBefore
 
 class SyntaxTreeError(SyntaxException): pass
 
@@ -150,7 +150,7 @@ class TokenStream(IterObject):
         for t in toks[::-1]:
             self.tokenStream.putBack(t)
 
-        return self._symbolFromToken(Token(toks[-1]))
+        return self._symbolFromToken(Token.of(toks[-1]))
 
     ##
     # Peek n tokens behind
@@ -264,7 +264,7 @@ class TokenStream(IterObject):
     def __iter__(self):
         for i,t in enumerate(self.tok_stream):
             self.tpos = i
-            tok = Token(t)
+            tok = Token.of(t)
             s = self._symbolFromToken(tok)
             if not s:
                 continue
@@ -305,14 +305,35 @@ class Token(object):
 
     __repr__ = __str__
 
+    ##
+    # tokenizer.Token objects (from tokenizer.FastTokenizer) are used as they
+    # are, token dicts are wrapped
+    @staticmethod
+    def of(t):
+        return t if t.__class__ is tokenizer.Token else Token(t)
+
 
 # - Grammar Infrastructure -------------------------------------------------
 
 # symbol (token type) registry
 symbol_table = {}
-next = None   # produce next node into 'token'
-token= None   # current symbol_base() node
-tokenStream = None # stream of symbol_base() nodes
+
+##
+# ParserState -- the state of a parse, i.e. the stream of symbol_base() nodes,
+# a function producing the next node and the current node. It is kept per
+# thread, and TreeGenerator.parse() restores it when done, so files can be
+# parsed in several threads at the same time, and parses can be nested.
+class ParserState(threading.local):
+    next        = None  # produce next node into 'token'
+    token       = None  # current symbol_base() node
+    tokenStream = None  # stream of symbol_base() nodes
+
+    def start(self, tokenArr):
+        self.tokenStream = TokenStream(tokenArr) # TODO: adapt TokenStream to token array arg
+        self.next  = iter(self.tokenStream).next
+        self.token = self.next()
+
+ps = ParserState()  # state of the parse running in the current thread
 
 # Debugging helpers (node mutation, here for the .parent attribute)
 
@@ -329,6 +350,8 @@ def _del_parent(self):
 
 class symbol_base(Node):
 
+    __slots__ = ('comments', 'commentsIn', 'commentsAfter', 'scope', 'hint')
+
     def __init__(self, line=None, column=None):  # to override Node.__init__(self,type)
         #self.attributes = {}  # compat with Node.attributes
         #self.children   = []  # compat with Node.children
@@ -513,9 +536,8 @@ def symbol(id_, bind_left=0):
         s = symbol_table[id_]
     except KeyError:
         class s(symbol_base):
-            pass
+            __slots__ = ()  # .type is the Node slot, set from .id
         s.__name__ = "symbol-" + id_ # for debugging
-        s.type     = id_  # compat with Node.type
         s.id       = id_
         s.value    = None
         s.bind_left = bind_left
@@ -683,12 +705,11 @@ def prepostfix(id_, bp):  # pre-/post-fix operators (++, --)
 
 
 def advance(id_=None):
-    global token
-    t = token
-    if id_ and token.id != id_:
-        raise SyntaxException("Syntax error: Expected %r (pos %r)" % (id_, (token.get("line"),token.get("column"))))
-    if token.id != "eof":
-        token = next()
+    t = ps.token
+    if id_ and ps.token.id != id_:
+        raise SyntaxException("Syntax error: Expected %r (pos %r)" % (id_, (ps.token.get("line"),ps.token.get("column"))))
+    if ps.token.id != "eof":
+        ps.token = ps.next()
     return t
 
 # decorator
@@ -854,9 +875,9 @@ def toListG(self):
 
 @method(symbol("."))
 def ifix(self, left):
-    if token.id != "identifier":
-        raise SyntaxException("Expected an attribute name (pos %r)." % ((token.get("line"), token.get("column")),))
-    accessor = symbol("dotaccessor")(token.get("line"), token.get("column"))
+    if ps.token.id != "identifier":
+        raise SyntaxException("Expected an attribute name (pos %r)." % ((ps.token.get("line"), ps.token.get("column")),))
+    accessor = symbol("dotaccessor")(ps.token.get("line"), ps.token.get("column"))
     accessor.childappend(left)
     accessor.childappend(expression(symbol(".").bind_left))
         # i'm providing the rbp to expression() here explicitly, so "foo.bar(baz)" gets parsed
@@ -915,13 +936,13 @@ symbol("("), symbol(")"), symbol("arguments")
 
 @method(symbol("("))  # <call>
 def ifix(self, left):
-    call = symbol("call")(token.get("line"), token.get("column"))
+    call = symbol("call")(ps.token.get("line"), ps.token.get("column"))
     # operand
-    operand = symbol("operand")(token.get("line"), token.get("column"))
+    operand = symbol("operand")(ps.token.get("line"), ps.token.get("column"))
     call.childappend(operand)
     operand.childappend(left)
     # params - parse as group
-    params = symbol("arguments")(token.get("line"), token.get("column"))
+    params = symbol("arguments")(ps.token.get("line"), ps.token.get("column"))
     call.childappend(params)
     group = self.pfix()
     for c in group.children:
@@ -952,13 +973,13 @@ def pfix(self):
     # the parsing methods themselves are class-based.
     group = symbol("group")()
     self.patch(group) # for "line", "column", .comments, etc.
-    if token.id != ")":
+    if ps.token.id != ")":
         while True:
-            if token.id == ")":
+            if ps.token.id == ")":
                 break
             #group.childappend(expression())  # future:
             group.childappend(expression(symbol(",").bind_left +1))
-            if token.id != ",":
+            if ps.token.id != ",":
                 break
             advance(",")
     #if not group.children:  # bug#7079
@@ -992,11 +1013,11 @@ def ifix(self, left):
     # identifier
     accessor.childappend(left)
     # selector
-    key = symbol("key")(token.get("line"), token.get("column"))
+    key = symbol("key")(ps.token.get("line"), ps.token.get("column"))
     accessor.childappend(key)
     key.childappend(expression())
     # assert token.id == ']'
-    affix_comments(key.commentsAfter, token)
+    affix_comments(key.commentsAfter, ps.token)
     advance("]")
     return accessor
 
@@ -1006,20 +1027,20 @@ def pfix(self):
     self.patch(arr)
     is_after_comma = 0
     while True:
-        if token.id == "]":
+        if ps.token.id == "]":
             if is_after_comma:  # preserve dangling comma (bug#6210)
                 arr.childappend(symbol("(empty)")())
             if arr.children:
-                affix_comments(arr.children[-1].commentsAfter, token)
+                affix_comments(arr.children[-1].commentsAfter, ps.token)
             else:
-                affix_comments(arr.commentsIn, token)
+                affix_comments(arr.commentsIn, ps.token)
             break
-        elif token.id == ",":  # elision
+        elif ps.token.id == ",":  # elision
             arr.childappend(symbol("(empty)")())
         else:
             #arr.childappend(expression())  # future:
             arr.childappend(expression(symbol(",").bind_left +1))
-        if token.id != ",":
+        if ps.token.id != ",":
             break
         else:
             is_after_comma = 1
@@ -1074,18 +1095,18 @@ symbol("}")
 def pfix(self):
     mmap = symbol("map")()
     self.patch(mmap)
-    if token.id != "}":
+    if ps.token.id != "}":
         is_after_comma = 0
         while True:
-            if token.id == "}":
+            if ps.token.id == "}":
                 if is_after_comma:  # prevent dangling comma '...,}' (bug#6210)
-                    raise SyntaxException("Illegal dangling comma in map (pos %r)" % ((token.get("line"),token.get("column")),))
+                    raise SyntaxException("Illegal dangling comma in map (pos %r)" % ((ps.token.get("line"),ps.token.get("column")),))
                 break
             is_after_comma = 0
-            map_item = symbol("keyvalue")(token.get("line"), token.get("column"))
+            map_item = symbol("keyvalue")(ps.token.get("line"), ps.token.get("column"))
             mmap.childappend(map_item)
             # key
-            keyname = token
+            keyname = ps.token
             assert (keyname.type=='identifier' or
                 (keyname.type=='constant' and keyname.get('constantType','') in ('number','string'))
                 ), "Illegal map key: %s" % keyname.get('value')
@@ -1099,10 +1120,10 @@ def pfix(self):
             # value
             #keyval = expression()  # future:
             keyval = expression(symbol(",").bind_left +1)
-            val = symbol("value")(token.get("line"), token.get("column"))
+            val = symbol("value")(ps.token.get("line"), ps.token.get("column"))
             val.childappend(keyval)
             map_item.childappend(val)  # <value> is a child of <keyvalue>
-            if token.id != ",":
+            if ps.token.id != ",":
                 break
             else:
                 is_after_comma = 1
@@ -1173,7 +1194,7 @@ def toListG(self):
 # call for constructs that have blocks, like "for", "while", etc.
 
 def block():
-    t = token
+    t = ps.token
     advance("{")
     s = symbol("block")()
     t.patch(s)
@@ -1201,21 +1222,21 @@ symbol("function")
 def pfix(self):
     # optional name
     opt_name = None
-    if token.id == "identifier":
+    if ps.token.id == "identifier":
         #self.childappend(token.get("value"))
         #self.childappend(token)
         #self.set("name", token.get("value"))
-        opt_name = token
+        opt_name = ps.token
         advance()
     # params
-    assert token.id == "(", "Function definition requires parameter list"
+    assert ps.token.id == "(", "Function definition requires parameter list"
     params = parameters()
     self.childappend(params)
     # body
     body = symbol("body")()
-    token.patch(body)
+    ps.token.patch(body)
     self.childappend(body)
-    if token.id == "{":
+    if ps.token.id == "{":
         body.childappend(block())
     else:
         body.childappend(statement())
@@ -1280,22 +1301,22 @@ symbol("var")
 @method(symbol("var"))
 def pfix(self):
     while True:
-        defn = symbol("definition")(token.get("line"), token.get("column"))
+        defn = symbol("definition")(ps.token.get("line"), ps.token.get("column"))
         self.childappend(defn)
-        n = token
+        n = ps.token
         if n.id != "identifier":
-            raise SyntaxException("Expected a new variable name (pos %r)" % ((token.get("line"), token.get("column")),))
+            raise SyntaxException("Expected a new variable name (pos %r)" % ((ps.token.get("line"), ps.token.get("column")),))
         advance()
         # initialization
-        if token.id == "=":
-            t = token
+        if ps.token.id == "=":
+            t = ps.token
             advance()
             elem = t.ifix(n)
         # plain identifier
         else:
             elem = n
         defn.childappend(elem)
-        if token.id != ",":
+        if ps.token.id != ",":
             break
         else:
             advance(",")
@@ -1360,7 +1381,7 @@ def std(self):
     # condition
     advance("(")
     # try to consume the first part of a (pot. longer) condition
-    if token.id != ";":
+    if ps.token.id != ";":
         chunk = expression(symbol(",").bind_left+1)
     else:
         chunk = None
@@ -1373,18 +1394,18 @@ def std(self):
     # for (;;) [mind: all three subexpressions are optional]
     else:
         self.set("forVariant", "iter")
-        condition = symbol("expressionList")(token.get("line"), token.get("column")) # TODO: expressionList is bogus here
+        condition = symbol("expressionList")(ps.token.get("line"), ps.token.get("column")) # TODO: expressionList is bogus here
         self.childappend(condition)
         # init part
-        first = symbol("first")(token.get("line"), token.get("column"))
+        first = symbol("first")(ps.token.get("line"), ps.token.get("column"))
         condition.childappend(first)
         if chunk is None:       # empty init expr
             pass
         else: # at least one init expr
-            exprList = symbol("expressionList")(token.get("line"), token.get("column"))
+            exprList = symbol("expressionList")(ps.token.get("line"), ps.token.get("column"))
             first.childappend(exprList)
             exprList.childappend(chunk)
-            if token.id == ',':
+            if ps.token.id == ',':
                 advance(',')
                 lst = init_list()
                 for assgn in lst:
@@ -1401,32 +1422,32 @@ def std(self):
         #        exprList.childappend(assgn)
         advance(";")
         # condition part
-        second = symbol("second")(token.get("line"), token.get("column"))
+        second = symbol("second")(ps.token.get("line"), ps.token.get("column"))
         condition.childappend(second)
-        if token.id != ";":
-            exprList = symbol("expressionList")(token.get("line"), token.get("column"))
+        if ps.token.id != ";":
+            exprList = symbol("expressionList")(ps.token.get("line"), ps.token.get("column"))
             second.childappend(exprList)
-            while token.id != ';':
+            while ps.token.id != ';':
                 expr = expression(symbol(",").bind_left+1)
                 exprList.childappend(expr)
-                if token.id == ',':
+                if ps.token.id == ',':
                     advance(',')
         advance(";")
         # update part
-        third = symbol("third")(token.get("line"), token.get("column"))
+        third = symbol("third")(ps.token.get("line"), ps.token.get("column"))
         condition.childappend(third)
-        if token.id != ")":
-            exprList = symbol("expressionList")(token.get("line"), token.get("column"))
+        if ps.token.id != ")":
+            exprList = symbol("expressionList")(ps.token.get("line"), ps.token.get("column"))
             third.childappend(exprList)
-            while token.id != ')':
+            while ps.token.id != ')':
                 expr = expression(symbol(",").bind_left+1)
                 exprList.childappend(expr)
-                if token.id == ',':
+                if ps.token.id == ',':
                     advance(',')
 
     # body
     advance(")")
-    body = symbol("body")(token.get("line"), token.get("column"))
+    body = symbol("body")(ps.token.get("line"), ps.token.get("column"))
     body.childappend(statementOrBlock())
     self.childappend(body)
     return self
@@ -1499,7 +1520,7 @@ def std(self):
     self.childappend(exprList)
     for c in group.children:
         exprList.childappend(c)
-    body = symbol("body")(token.get("line"), token.get("column"))
+    body = symbol("body")(ps.token.get("line"), ps.token.get("column"))
     body.childappend(statementOrBlock())
     self.childappend(body)
     return self
@@ -1528,7 +1549,7 @@ symbol("do")
 def std(self):
     self.type = "loop" # compat with Node.type
     self.set("loopType", "DO")
-    body = symbol("body")(token.get("line"), token.get("column"))
+    body = symbol("body")(ps.token.get("line"), ps.token.get("column"))
     body.childappend(statementOrBlock())
     self.childappend(body)
     advance("while")
@@ -1561,7 +1582,7 @@ def std(self):
     advance("(")
     self.childappend(expression(0))
     advance(")")
-    body = symbol("body")(token.get("line"), token.get("column"))
+    body = symbol("body")(ps.token.get("line"), ps.token.get("column"))
     body.childappend(statementOrBlock())
     self.childappend(body)
     return self
@@ -1593,12 +1614,12 @@ def std(self):
     advance("(")
     self.childappend(expression(0))
     advance(")")
-    then_part = symbol("body")(token.get("line"), token.get("column"))
+    then_part = symbol("body")(ps.token.get("line"), ps.token.get("column"))
     then_part.childappend(statementOrBlock())
     self.childappend(then_part)
-    if (token.id == "else"):
+    if (ps.token.id == "else"):
         advance("else")
-        else_part = symbol("body")(token.get("line"), token.get("column"))
+        else_part = symbol("body")(ps.token.get("line"), ps.token.get("column"))
         else_part.childappend(statementOrBlock())
         self.childappend(else_part)
     return self
@@ -1757,8 +1778,8 @@ def toListG(self):
 @method(symbol("new"))  # need to treat 'new' explicitly, for the awkward 'new Foo()' "call" syntax
 def pfix(self):
     arg = expression(self.bind_left-1)  # first, parse a normal expression (this excludes '()')
-    if token.id == '(':  # if the next token indicates a call
-        t = token
+    if ps.token.id == '(':  # if the next token indicates a call
+        t = ps.token
         advance("(")
         arg = t.ifix(left=arg)   # invoke '('.ifix, with class name as <left> arg
     self.childappend(arg)
@@ -1775,24 +1796,24 @@ def std(self):
     self.childappend(expression(0))
     advance(")")
     advance("{")
-    body = symbol("body")(token.get("line"), token.get("column"))
+    body = symbol("body")(ps.token.get("line"), ps.token.get("column"))
     self.childappend(body)
     while True:
-        if token.id == "}": break
-        elif token.id == "case":
-            case = token  # make 'case' the root node (instead e.g. ':')
+        if ps.token.id == "}": break
+        elif ps.token.id == "case":
+            case = ps.token  # make 'case' the root node (instead e.g. ':')
             advance("case")
             case.childappend(expression(symbol(":").bind_left +1))
             advance(":")
-            if token.id in ("case", "default") : # fall-through
+            if ps.token.id in ("case", "default") : # fall-through
                 pass
             else:
                 case.childappend(case_block())
-        elif token.id == "default":
-            case = token
+        elif ps.token.id == "default":
+            case = ps.token
             advance("default")
             advance(":")
-            if token.id in ("case",) : # fall-through
+            if ps.token.id in ("case",) : # fall-through
                 pass
             else:
                 case.childappend(case_block())
@@ -1802,9 +1823,9 @@ def std(self):
 
 def case_block():
     # we assume here that there is at least one statement to parse
-    s = symbol("statements")(token.get("line"), token.get("column"))
+    s = symbol("statements")(ps.token.get("line"), ps.token.get("column"))
     while True:
-        if token.id in ("case", "default", "}"):
+        if ps.token.id in ("case", "default", "}"):
             break
         s.childappend(statement())
     return s
@@ -1869,8 +1890,8 @@ symbol("try"); symbol("catch"); symbol("finally")
 @method(symbol("try"))
 def std(self):
     self.childappend(block())
-    if token.id == "catch":
-        catch = token
+    if ps.token.id == "catch":
+        catch = ps.token
         self.childappend(catch)
         advance("catch")
         #advance("(")
@@ -1878,13 +1899,13 @@ def std(self):
         #advance(")")
 
         # insert "params" node, par. to function.pfix
-        assert token.id == "(", "Catch requires parameter list"
+        assert ps.token.id == "(", "Catch requires parameter list"
         params = parameters()
         catch.childappend(params)
         # body
         catch.childappend(block())
-    if token.id == "finally":
-        finally_ = token
+    if ps.token.id == "finally":
+        finally_ = ps.token
         advance("finally")
         self.childappend(finally_)
         finally_.childappend(block())
@@ -1917,7 +1938,7 @@ symbol("throw")
 
 @method(symbol("throw"))
 def std(self):
-    if token.id not in ("eol",  ";"):
+    if ps.token.id not in ("eol",  ";"):
         self.childappend(expression(0))
     #advance(";")
     return self
@@ -1933,13 +1954,12 @@ def toJS(self, opts):
 symbol("throw").toListG = toListG_self_first
 
 def expression(bind_right=0):
-    global token
-    t = token
-    token = next()
+    t = ps.token
+    ps.token = ps.next()
     left = t.pfix()
-    while token.bind_left > bind_right:
-        t = token
-        token = next()
+    while ps.token.bind_left > bind_right:
+        t = ps.token
+        ps.token = ps.next()
         left = t.ifix(left)
     return left
 
@@ -1948,30 +1968,30 @@ symbol("label")
 
 def statement():
     # labeled statement
-    if token.type == "identifier" and tokenStream.peek(1).id == ":": # label
-        s = symbol("label")(token.get("line"), token.get("column"))
-        s.attributes = token.attributes
+    if ps.token.type == "identifier" and ps.tokenStream.peek(1).id == ":": # label
+        s = symbol("label")(ps.token.get("line"), ps.token.get("column"))
+        s.attributes = ps.token.attributes
         advance()
         advance(":")
         s.childappend(statement())
     # normal SourceElement
     else:
-        n = token
+        n = ps.token
         s = None
         # function declaration, doesn't need statementEnd
-        if token.id == 'function' and tokenStream.peek(1).type == 'identifier':
+        if ps.token.id == 'function' and ps.tokenStream.peek(1).type == 'identifier':
             advance()
             s = n.pfix()
-            if token.id == ';':  # consume dangling semi
+            if ps.token.id == ';':  # consume dangling semi
                 advance()
         # statement
         else:
-            if getattr(token, 'std', None):
+            if getattr(ps.token, 'std', None):
                 advance()
                 s = n.std()
-            elif token.id == ';': # empty statement
+            elif ps.token.id == ';': # empty statement
                 s = symbol("(empty)")()
-            elif token.type != 'eol': # it's not an empty line
+            elif ps.token.type != 'eol': # it's not an empty line
                 s = expression()
                 # Crockford's too tight here
                 #if not (s.id == "=" or s.id == "("):
@@ -1982,11 +2002,11 @@ def statement():
                 # but there is this conflict between ',' as an operator infix(",", 5)
                 # and a stock symbol(",", 0) that terminates every expression() parse, like for
                 # arrays, maps, etc.).
-                if token.id == ',':
-                    s1 = symbol("expressionList")(token.get("line"), token.get("column"))
+                if ps.token.id == ',':
+                    s1 = symbol("expressionList")(ps.token.get("line"), ps.token.get("column"))
                     s1.childappend(s)
                     s = s1
-                    while token.id == ',':
+                    while ps.token.id == ',':
                         advance(',')
                         s.childappend(expression())
             statementEnd()
@@ -2016,13 +2036,13 @@ symbol("label").toListG = toListG_self_first
 
 
 def statementEnd():
-    if token.id in (";", "eol", "eof"):
+    if ps.token.id in (";", "eol", "eof"):
         advance()
-    elif token.id in ("}",):  # parse e.g. if condition and block on same line: 'if() { expr }'
+    elif ps.token.id in ("}",):  # parse e.g. if condition and block on same line: 'if() { expr }'
         pass
     #elif token.id == "eof":
     #    return token  # ok as stmt end, but don't just skip it (bc. comments)
-    elif tokenStream.eolBefore:
+    elif ps.tokenStream.eolBefore:
         pass # that's ok as statement end
     #if token.id in ("eof",
     #    "eol", # these are not yielded by the TokenStream currently
@@ -2031,11 +2051,11 @@ def statementEnd():
     #    ):
     #    advance()
     else:
-        ltok = tokenStream.lookbehind()
+        ltok = ps.tokenStream.lookbehind()
         if ltok.id == '}':  # it's a statement ending with a block ('if' etc.)
             pass
         else:
-            raise SyntaxException("Unterminated statement (pos %r)" % ((token.get("line"), token.get("column")),))
+            raise SyntaxException("Unterminated statement (pos %r)" % ((ps.token.get("line"), ps.token.get("column")),))
 
 
 @method(symbol("eof"))
@@ -2045,17 +2065,17 @@ def toJS(self, opts):
 symbol("eof").toListG = toListG_self_first
 
 def statementOrBlock(): # for 'if', 'while', etc. bodies
-    if token.id == '{':
+    if ps.token.id == '{':
         return block()
     else:
         return statement()
 
 def statements():  # plural!
-    s = symbol("statements")(token.get("line"), token.get("column"))
+    s = symbol("statements")(ps.token.get("line"), ps.token.get("column"))
     while True:
-        if token.id == "}" or token.id == "eof":
-            if token.id == "eof" and token.comments:
-                s.childappend(token)  # keep eof for pot. comments
+        if ps.token.id == "}" or ps.token.id == "eof":
+            if ps.token.id == "eof" and ps.token.comments:
+                s.childappend(ps.token)  # keep eof for pot. comments
             break
         st = statement()
         if st:
@@ -2081,11 +2101,11 @@ symbol("statements").toListG = toListG_just_children
 def init_list():  # parse anything from "i" to "i, j=3, k,..."
     lst = []
     while True:
-        if token.id != "identifier":
+        if ps.token.id != "identifier":
             break
         elem = expression()
         lst.append(elem)
-        if token.id != ",":
+        if ps.token.id != ",":
             break
         else:
             advance(",")
@@ -2094,16 +2114,16 @@ def init_list():  # parse anything from "i" to "i, j=3, k,..."
 # next is not used!
 def argument_list(list):
     while 1:
-        if token.id != "identifier":
-            raise SyntaxException("Expected an argument name (pos %r)." % ((token.get("line"), token.get("column")),))
-        list.append(token)
+        if ps.token.id != "identifier":
+            raise SyntaxException("Expected an argument name (pos %r)." % ((ps.token.get("line"), ps.token.get("column")),))
+        list.append(ps.token)
         advance()
-        if token.id == "=":
+        if ps.token.id == "=":
             advance()
             list.append(expression())
         else:
             list.append(None)
-        if token.id != ",":
+        if ps.token.id != ",":
             break
         advance(",")
 
@@ -2204,7 +2224,7 @@ symbol("third").toListG = toListG_just_children
 
 def parameters():
     # a - pot. empty - list of identifiers
-    params = symbol("params")(token.get("line"), token.get("column"))
+    params = symbol("params")(ps.token.get("line"), ps.token.get("column"))
     group = expression()
     for c in group.children:
         assert c.id == "identifier", "Formal function parameters must be identifiers"
@@ -2244,20 +2264,21 @@ class TreeGenerator(object):
     # in the generator, which does the tokenization on its own, and then calls
     # 'createFileTree'.
     def parse(self, tokenArr, expr=False):
-        global token, next, tokenStream
-        tokenStream = TokenStream(tokenArr) # TODO: adapt TokenStream to token array arg
-        next   = iter(tokenStream).next
-        token  = next()
-        if expr:
-            entry_rule = expression
-        else:
-            entry_rule = statements
+        saved = ps.tokenStream, ps.next, ps.token  # of an enclosing parse
+        ps.start(tokenArr)
         try:
-            res = entry_rule()
-        except AssertionError, e:
-            #raise
-            raiseSyntaxException("Syntax error%s" % ((": %s" % e.args[0]) if len(e.args) else ''), token)
-        return res
+            if expr:
+                entry_rule = expression
+            else:
+                entry_rule = statements
+            try:
+                res = entry_rule()
+            except AssertionError, e:
+                #raise
+                raiseSyntaxException("Syntax error%s" % ((": %s" % e.args[0]) if len(e.args) else ''), ps.token)
+            return res
+        finally:
+            ps.tokenStream, ps.next, ps.token = saved
 
 
 # - Interface -----------------------------------------------------------------
@@ -2270,23 +2291,20 @@ def createFileTree(tokenArr, fileId=''):
     return fileNode
 
 def createFileTree_from_string(string_, fileId=''):
-    ts = tokenizer.Tokenizer().parseStream(string_)
+    ts = tokenizer.FastTokenizer().parseStream(string_)
     return createFileTree(ts, fileId)
 
 # quick high-level frontend
 def parse(string_, expr=False):
-    ts = tokenizer.Tokenizer().parseStream(string_)
+    ts = tokenizer.FastTokenizer().parseStream(string_)
     return TreeGenerator().parse(ts,expr)
 
 # - Main ----------------------------------------------------------------------
 
 def test(x, program):
-    global token, next, tokenStream
     print ">>>", program
     tokenArr = tokenizer.Tokenizer().parseStream(program)
-    tokenStream = TokenStream(tokenArr)
-    next = iter(tokenStream).next
-    token = next()
+    ps.start(tokenArr)
     if x == e:
         res =  expression()
         print res.toXml()
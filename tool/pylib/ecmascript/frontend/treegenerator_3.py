@@ -45,7 +45,7 @@
 # CAVEATS
 ##
 
-import sys, os, re, types, string, itertools as itert
+import sys, os, re, types, string, threading, itertools as itert
 from ecmascript.frontend.SyntaxException import SyntaxException
 from ecmascript.frontend.tree            import Node
 from ecmascript.frontend.Scanner         import IterObject, LQueue, LimLQueue, is_last_escaped
@@ -104,7 +104,7 @@ SYMBOLS = {
 }
 
 def expressionTerminated():
-    return token.id in StmntTerminatorTokens or tokenStream.eolBefore
+    return ps.token.id in StmntTerminatorTokens or ps.tokenStream.eolBefore
 
 class SyntaxTreeError(SyntaxException): pass
 
@@ -308,12 +308,28 @@ class Token(object):
 
 # symbol (token type) registry
 symbol_table = {}
-next = None   # produce next node into 'token'
-token= None   # current symbol_base() node
-tokenStream = None # stream of symbol_base() nodes
+
+##
+# ParserState -- the state of a parse, i.e. the stream of symbol_base() nodes,
+# a function producing the next node and the current node. It is kept per
+# thread, and TreeGenerator.parse() restores it when done, so files can be
+# parsed in several threads at the same time, and parses can be nested.
+class ParserState(threading.local):
+    next        = None  # produce next node into 'token'
+    token       = None  # current symbol_base() node
+    tokenStream = None  # stream of symbol_base() nodes
+
+    def start(self, tokenArr):
+        self.tokenStream = TokenStream(tokenArr) # TODO: adapt TokenStream to token array arg
+        self.next  = iter(self.tokenStream).next
+        self.token = self.next()
+
+ps = ParserState()  # state of the parse running in the current thread
 
 class symbol_base(Node):
 
+    __slots__ = ('comments', 'commentsIn', 'commentsAfter', 'scope', 'hint')
+
     def __init__(self, line=None, column=None):  # to override Node.__init__(self,type)
         #self.attributes = {}  # compat with Node.attributes
         #self.children   = []  # compat with Node.children
@@ -584,9 +600,8 @@ def symbol(id_, bind_left=0):
         s = symbol_table[id_]
     except KeyError:
         class s(symbol_base):
-            pass
+            __slots__ = ()  # .type is the Node slot, set from .id
         s.__name__ = "symbol-" + id_ # for debugging
-        s.type     = id_  # compat with Node.type
         s.id       = id_
         s.value    = None
         s.bind_left      = bind_left
@@ -757,11 +772,10 @@ def prepostfix(id_, bp):  # pre-/post-fix operators (++, --)
 
 
 def advance(id_=None):
-    global token
-    if id_ and token.id != id_:
-        raise SyntaxException("Expected %r (pos %r)" % (id_, (token.get("line"),token.get("column"))))
-    if token.id != "eof":
-        token = next()
+    if id_ and ps.token.id != id_:
+        raise SyntaxException("Expected %r (pos %r)" % (id_, (ps.token.get("line"),ps.token.get("column"))))
+    if ps.token.id != "eof":
+        ps.token = ps.next()
 
 # decorator
 
@@ -882,7 +896,7 @@ def pfix(self):
 
     rexp = ""
     while True:
-        rexp += token.get("value")      # accumulate token strings
+        rexp += ps.token.get("value")      # accumulate token strings
         if rexp.endswith("/"):   # check for end of regexp
             # make sure "/" is not escaped, ie. preceded by an odd number of "\"
             if not is_last_escaped(rexp):
@@ -893,8 +907,8 @@ def pfix(self):
     s       = (symbol_table["constant"])()  # create a symbol object for the regexp
     s.value = rexp
     self.childappend(s)
-    if token.id == "identifier":   # pick up regexp modifiers
-        self.childappend(token)
+    if ps.token.id == "identifier":   # pick up regexp modifiers
+        self.childappend(ps.token)
         advance()
     return self
 
@@ -907,7 +921,7 @@ def ifix(self, left):
     # second
     self.childappend(expression())
     # ":"
-    self.childappend(token)
+    self.childappend(ps.token)
     advance(":")
     # third
     self.childappend(expression())
@@ -947,9 +961,9 @@ def toListG(self):
 
 @method(symbol("."))
 def ifix(self, left):
-    if token.id != "identifier":
-        SyntaxException("Expected an attribute name (pos %r)." % ((token.get("line"), token.get("column")),))
-    accessor = symbol("dotaccessor")(token.get("line"), token.get("column"))
+    if ps.token.id != "identifier":
+        SyntaxException("Expected an attribute name (pos %r)." % ((ps.token.get("line"), ps.token.get("column")),))
+    accessor = symbol("dotaccessor")(ps.token.get("line"), ps.token.get("column"))
     accessor.childappend(left)
     accessor.childappend(self)  # "."
     accessor.childappend(expression(symbol(".").bind_left)) 
@@ -1008,15 +1022,15 @@ symbol("("), symbol(")"), symbol("arguments")
 
 @method(symbol("("))  # <call>
 def ifix(self, left):
-    call = symbol("call")(token.get("line"), token.get("column"))
+    call = symbol("call")(ps.token.get("line"), ps.token.get("column"))
     # operand
-    operand = symbol("operand")(token.get("line"), token.get("column"))
+    operand = symbol("operand")(ps.token.get("line"), ps.token.get("column"))
     call.childappend(operand)
     operand.childappend(left)
     # "("
     #call.childappend(self)
     # arguments - parse as group
-    arguments = symbol("arguments")(token.get("line"), token.get("column"))
+    arguments = symbol("arguments")(ps.token.get("line"), ps.token.get("column"))
     call.childappend(arguments)
     group = self.pfix()
     for c in group.children:
@@ -1048,17 +1062,17 @@ def pfix(self):
     group = symbol("group")()
     self.patch(group) # for "line", "column", .comments, etc.
     group.childappend(self)
-    if token.id != ")":
+    if ps.token.id != ")":
         while True:
-            if token.id == ")":
+            if ps.token.id == ")":
                 break
             group.childappend(expression())
-            if token.id != ",":
+            if ps.token.id != ",":
                 break
-            group.childappend(token)
+            group.childappend(ps.token)
             advance(",")
     # ")"
-    group.childappend(token)
+    group.childappend(ps.token)
     advance(")")
     return group
 
@@ -1086,11 +1100,11 @@ def ifix(self, left):
     # '['
     accessor.childappend(self)
     # selector
-    key = symbol("key")(token.get("line"), token.get("column"))
+    key = symbol("key")(ps.token.get("line"), ps.token.get("column"))
     accessor.childappend(key)
     key.childappend(expression())
     # ']'
-    accessor.childappend(token)
+    accessor.childappend(ps.token)
     advance("]")
     return accessor
 
@@ -1101,15 +1115,15 @@ def pfix(self):
     # '['
     arr.childappend(self)
     while True:
-        if token.id == "]":
+        if ps.token.id == "]":
             break
-        elif token.id == ",":  # elision
-            arr.childappend(token)
+        elif ps.token.id == ",":  # elision
+            arr.childappend(ps.token)
             advance(",")
         else:
             arr.childappend(expression())
     # ']'
-    arr.childappend(token)
+    arr.childappend(ps.token)
     advance("]")
     return arr
 
@@ -1163,33 +1177,33 @@ def pfix(self):
     mmap = symbol("map")()
     self.patch(mmap)
     mmap.childappend(self)
-    if token.id != "}":
+    if ps.token.id != "}":
         is_after_comma = 0
         while True:
-            if token.id == "}":
+            if ps.token.id == "}":
                 if is_after_comma:  # prevent dangling comma '...,}' (bug#6210)
-                    raise SyntaxException("Illegal dangling comma in map (pos %r)" % ((token.get("line"),token.get("column")),))
+                    raise SyntaxException("Illegal dangling comma in map (pos %r)" % ((ps.token.get("line"),ps.token.get("column")),))
                 break
-            elif token.id == ",":
-                mmap.childappend(token)
+            elif ps.token.id == ",":
+                mmap.childappend(ps.token)
                 advance(",")
             else: # key:val
                 is_after_comma = 0
                 # key
                 keyname = expression()
-                map_item = symbol("keyvalue")(token.get("line"), token.get("column"))
+                map_item = symbol("keyvalue")(ps.token.get("line"), ps.token.get("column"))
                 # the <keyname> node is not entered into the ast, but resolved into <keyvalue>
                 mmap.childappend(map_item)
                 map_item.childappend(keyname)
                 # ":"
-                map_item.childappend(token)
+                map_item.childappend(ps.token)
                 advance(":")
                 # value
                 keyval = expression()
-                val = symbol("value")(token.get("line"), token.get("column"))
+                val = symbol("value")(ps.token.get("line"), ps.token.get("column"))
                 val.childappend(keyval)
                 map_item.childappend(val)  # <value> is a child of <keyvalue>
-    mmap.childappend(token)
+    mmap.childappend(ps.token)
     advance("}")
     return mmap
 
@@ -1198,7 +1212,7 @@ def std(self):
     block = symbol("block")()
     block.childappend(self)
     block.childappend(statements())
-    block.childappend(token)
+    block.childappend(ps.token)
     advance("}")
     return block
 
@@ -1246,7 +1260,7 @@ def toJS(self, opts):
 
 def block():
     # token.id == '{'
-    t = token
+    t = ps.token
     advance("{")
     return t.std()
 
@@ -1269,13 +1283,13 @@ symbol("function")
 @method(symbol("function"))
 def pfix(self):
     # optional name
-    if token.id == "identifier":
-        self.childappend(token)
+    if ps.token.id == "identifier":
+        self.childappend(ps.token)
         advance()
     # params
-    assert token.id == "("
+    assert ps.token.id == "("
     params = symbol("params")()
-    token.patch(params)
+    ps.token.patch(params)
     self.childappend(params)
     group = expression()  # group parsing as helper
     for c in group.children:
@@ -1283,9 +1297,9 @@ def pfix(self):
     #params.children = group.children # nope - retains group as parent!
     # body
     body = symbol("body")()
-    token.patch(body)
+    ps.token.patch(body)
     self.childappend(body)
-    if token.id == "{":
+    if ps.token.id == "{":
         body.childappend(block())
     else:
         body.childappend(statement())
@@ -1345,25 +1359,25 @@ symbol("var")
 @method(symbol("var"))
 def pfix(self):
     while True:
-        defn = symbol("definition")(token.get("line"), token.get("column"))
+        defn = symbol("definition")(ps.token.get("line"), ps.token.get("column"))
         self.childappend(defn)
-        ident = token
+        ident = ps.token
         if ident.id != "identifier":
-            raise SyntaxException("Expected a new variable name (pos %r)" % ((token.get("line"), token.get("column")),))
+            raise SyntaxException("Expected a new variable name (pos %r)" % ((ps.token.get("line"), ps.token.get("column")),))
         advance()
         # initialization
-        if token.id == "=":
-            t = token
+        if ps.token.id == "=":
+            t = ps.token
             advance()
             elem = t.ifix(ident)
         # plain identifier
         else:
             elem = ident
         defn.childappend(elem)
-        if token.id != ",":
+        if ps.token.id != ",":
             break
         else:
-            self.childappend(token)
+            self.childappend(ps.token)
             advance(",")
     return self
 
@@ -1424,10 +1438,10 @@ def std(self):
     self.set("loopType", "FOR")
     
     # condition
-    self.childappend(token)
+    self.childappend(ps.token)
     advance("(")
     # try to consume the first part of a (pot. longer) condition
-    if token.id != ";":
+    if ps.token.id != ";":
         chunk = expression()
     else:
         chunk = None
@@ -1435,63 +1449,63 @@ def std(self):
     # for (in)
     if chunk and chunk.id == 'in':
         self.set("forVariant", "in")
-        condition = symbol("forInControl")(token.get("line"), token.get("column"))
+        condition = symbol("forInControl")(ps.token.get("line"), ps.token.get("column"))
         self.childappend(condition)
         condition.childappend(chunk)
 
     # for (;;) [mind: all three subexpressions are optional]
     else:
         self.set("forVariant", "iter")
-        condition = symbol("forIterControl")(token.get("line"), token.get("column"))
+        condition = symbol("forIterControl")(ps.token.get("line"), ps.token.get("column"))
         self.childappend(condition)
         # init part
-        first = symbol("first")(token.get("line"), token.get("column"))
+        first = symbol("first")(ps.token.get("line"), ps.token.get("column"))
         condition.childappend(first)
         if chunk is None:       # empty init expr
             pass
         else:  # at least one init expr
-            exprList = symbol("expressionList")(token.get("line"), token.get("column"))
+            exprList = symbol("expressionList")(ps.token.get("line"), ps.token.get("column"))
             first.childappend(exprList)
             exprList.childappend(chunk)
-            if token.id == ',':  # multiple inits
-                exprList.childappend(token)
+            if ps.token.id == ',':  # multiple inits
+                exprList.childappend(ps.token)
                 advance(',')
                 lst = init_list()
                 for assgn in lst:
                     exprList.childappend(assgn)
-        condition.childappend(token)
+        condition.childappend(ps.token)
         advance(";")
         # condition part 
-        second = symbol("second")(token.get("line"), token.get("column"))
+        second = symbol("second")(ps.token.get("line"), ps.token.get("column"))
         condition.childappend(second)
-        if token.id != ";":
-            exprList = symbol("expressionList")(token.get("line"), token.get("column"))
+        if ps.token.id != ";":
+            exprList = symbol("expressionList")(ps.token.get("line"), ps.token.get("column"))
             second.childappend(exprList)
-            while token.id != ';':
+            while ps.token.id != ';':
                 expr = expression (0)
                 exprList.childappend(expr)
-                if token.id == ',':
-                    exprList.childappend(token)
+                if ps.token.id == ',':
+                    exprList.childappend(ps.token)
                     advance(',')
-        condition.childappend(token)
+        condition.childappend(ps.token)
         advance(";")
         # update part
-        third = symbol("third")(token.get("line"), token.get("column"))
+        third = symbol("third")(ps.token.get("line"), ps.token.get("column"))
         condition.childappend(third)
-        if token.id != ")":
-            exprList = symbol("expressionList")(token.get("line"), token.get("column"))
-            while token.id != ')':
+        if ps.token.id != ")":
+            exprList = symbol("expressionList")(ps.token.get("line"), ps.token.get("column"))
+            while ps.token.id != ')':
                 expr = expression(0)
                 exprList.childappend(expr)
-                if token.id == ',':
-                    exprList.childappend(token)
+                if ps.token.id == ',':
+                    exprList.childappend(ps.token)
                     advance(',')
             third.childappend(exprList)
 
     # body
-    self.childappend(token)
+    self.childappend(ps.token)
     advance(")")
-    body = symbol("body")(token.get("line"), token.get("column"))
+    body = symbol("body")(ps.token.get("line"), ps.token.get("column"))
     body.childappend(statementOrBlock())
     self.childappend(body)
     return self
@@ -1544,10 +1558,10 @@ def pfix(self):
     while True:
         elem = expression()
         self.childappend(elem)
-        if token.id != ",":
+        if ps.token.id != ",":
             break
         else:
-            self.childappend(token)
+            self.childappend(ps.token)
             advance(",")
     return self
 
@@ -1570,15 +1584,15 @@ symbol("while")
 def std(self):
     self.type = "loop" # compat with Node.type
     self.set("loopType", "WHILE")
-    self.childappend(token)
+    self.childappend(ps.token)
     advance("(")
-    expList = symbol("expressionList")(token.get("line"), token.get("column"))
+    expList = symbol("expressionList")(ps.token.get("line"), ps.token.get("column"))
     self.childappend(expList)
-    if token.id != ")":
+    if ps.token.id != ")":
         expList.pfix()
-    self.childappend(token)
+    self.childappend(ps.token)
     advance(")")
-    body = symbol("body")(token.get("line"), token.get("column"))
+    body = symbol("body")(ps.token.get("line"), ps.token.get("column"))
     body.childappend(statementOrBlock())
     self.childappend(body)
     return self
@@ -1603,18 +1617,18 @@ symbol("do")
 def std(self):
     self.type = "loop" # compat with Node.type
     self.set("loopType", "DO")
-    body = symbol("body")(token.get("line"), token.get("column"))
+    body = symbol("body")(ps.token.get("line"), ps.token.get("column"))
     body.childappend(statementOrBlock())
     self.childappend(body)
-    self.childappend(token)
+    self.childappend(ps.token)
     advance("while")
-    self.childappend(token)
+    self.childappend(ps.token)
     advance("(")
-    expList = symbol("expressionList")(token.get("line"), token.get("column"))
+    expList = symbol("expressionList")(ps.token.get("line"), ps.token.get("column"))
     self.childappend(expList)
-    if token.id != ")":
+    if ps.token.id != ")":
         expList.pfix()
-    self.childappend(token)
+    self.childappend(ps.token)
     advance(")")
     return self
 
@@ -1641,12 +1655,12 @@ symbol("with")
 def std(self):
     self.type = "loop" # compat. with Node.type
     self.set("loopType", "WITH")
-    self.childappend(token)
+    self.childappend(ps.token)
     advance("(")
     self.childappend(expression(0))
-    self.childappend(token)
+    self.childappend(ps.token)
     advance(")")
-    body = symbol("body")(token.get("line"), token.get("column"))
+    body = symbol("body")(ps.token.get("line"), ps.token.get("column"))
     body.childappend(statementOrBlock())
     self.childappend(body)
     return self
@@ -1673,18 +1687,18 @@ symbol("if"); symbol("else")
 def std(self):
     self.type = "loop" # compat with Node.type (i'd rather use explicit 'if', 'for', etc.)
     self.set("loopType", "IF")
-    self.childappend(token)
+    self.childappend(ps.token)
     advance("(")
     self.childappend(expression(0))
-    self.childappend(token)
+    self.childappend(ps.token)
     advance(")")
-    then_part = symbol("body")(token.get("line"), token.get("column"))
+    then_part = symbol("body")(ps.token.get("line"), ps.token.get("column"))
     then_part.childappend(statementOrBlock())
     self.childappend(then_part)
-    if (token.id == "else"):
-        self.childappend(token)
+    if (ps.token.id == "else"):
+        self.childappend(ps.token)
         advance("else")
-        else_part = symbol("body")(token.get("line"), token.get("column"))
+        else_part = symbol("body")(ps.token.get("line"), ps.token.get("column"))
         else_part.childappend(statementOrBlock())
         self.childappend(else_part)
     return self
@@ -1780,8 +1794,8 @@ def toListG(self):
 @method(symbol("new"))  # need to treat 'new' explicitly, for the awkward 'new Foo()' "call" syntax
 def pfix(self):
     arg = expression(self.bind_left-1)  # first, parse a normal expression (this excludes '()')
-    if token.id == '(':  # if the next token indicates a call
-        t = token
+    if ps.token.id == '(':  # if the next token indicates a call
+        t = ps.token
         advance("(")
         arg = t.ifix(left=arg)   # invoke '('.ifix, with class name as <left> arg
     self.childappend(arg)
@@ -1792,49 +1806,49 @@ symbol("switch"); symbol("case"); symbol("default")
 
 @method(symbol("switch"))
 def std(self):
-    self.childappend(token)
+    self.childappend(ps.token)
     advance("(")
     self.childappend(expression(0))
-    self.childappend(token)
+    self.childappend(ps.token)
     advance(")")
-    body = symbol("body")(token.get("line"), token.get("column"))
+    body = symbol("body")(ps.token.get("line"), ps.token.get("column"))
     self.childappend(body)
-    block = symbol("block")(token.get("line"), token.get("column"))
+    block = symbol("block")(ps.token.get("line"), ps.token.get("column"))
     body.childappend(block)
-    block.childappend(token)
+    block.childappend(ps.token)
     advance("{")
     while True:
-        if token.id == "}": break
-        elif token.id == "case":
-            case = token  # make 'case' the root node (instead e.g. ':')
+        if ps.token.id == "}": break
+        elif ps.token.id == "case":
+            case = ps.token  # make 'case' the root node (instead e.g. ':')
             block.childappend(case)
             advance("case")
             case.childappend(expression(0))
-            case.childappend(token)
+            case.childappend(ps.token)
             advance(":")
-            if token.id in ("case", "default") : # fall-through
+            if ps.token.id in ("case", "default") : # fall-through
                 pass
             else:
                 case.childappend(case_block())
-        elif token.id == "default":
-            case = token
-            block.childappend(token)
+        elif ps.token.id == "default":
+            case = ps.token
+            block.childappend(ps.token)
             advance("default")
-            case.childappend(token)
+            case.childappend(ps.token)
             advance(":")
-            if token.id in ("case",) : # fall-through
+            if ps.token.id in ("case",) : # fall-through
                 pass
             else:
                 case.childappend(case_block())
-    block.childappend(token)
+    block.childappend(ps.token)
     advance("}")
     return self
 
 def case_block():
     # we assume here that there is at least one statement to parse
-    s = symbol("statements")(token.get("line"), token.get("column"))
+    s = symbol("statements")(ps.token.get("line"), ps.token.get("column"))
     while True:
-        if token.id in ("case", "default", "}"):
+        if ps.token.id in ("case", "default", "}"):
             break
         s.childappend(statement())
     return s
@@ -1883,22 +1897,22 @@ symbol("try"); symbol("catch"); symbol("finally")
 @method(symbol("try"))
 def std(self):
     self.childappend(block())
-    if token.id == "catch":
-        catch = token
+    if ps.token.id == "catch":
+        catch = ps.token
         self.childappend(catch)
         advance("catch")
         # insert "params" node, par. to function.pfix
-        assert token.id == "("
+        assert ps.token.id == "("
         #catch.childappend(token)
-        params = symbol("params")(token.get("line"), token.get("column"))
+        params = symbol("params")(ps.token.get("line"), ps.token.get("column"))
         catch.childappend(params)
         group = expression()  # group parsing as helper
         for c in group.children:
             params.childappend(c)  # to have params as parent of group's children
         # the closing ')' is probably swallowed in group
         catch.childappend(block())
-    if token.id == "finally":
-        finally_ = token
+    if ps.token.id == "finally":
+        finally_ = ps.token
         self.childappend(finally_)
         advance("finally")
         finally_.childappend(block())
@@ -1935,7 +1949,7 @@ symbol("throw")
 
 @method(symbol("throw"))
 def std(self):
-    if token.id not in ("eol",  ";"):
+    if ps.token.id not in ("eol",  ";"):
         self.childappend(expression(0))
     #advance(";")
     return self
@@ -1949,13 +1963,12 @@ def toJS(self, opts):
     return r
 
 def expression(bind_right=0):
-    global token
-    t = token
-    token = next()
+    t = ps.token
+    ps.token = ps.next()
     left = t.pfix()
-    while token.bind_left > bind_right:
-        t = token
-        token = next()
+    while ps.token.bind_left > bind_right:
+        t = ps.token
+        ps.token = ps.next()
         left = t.ifix(left)
     return left
 
@@ -1963,35 +1976,35 @@ def expression(bind_right=0):
 symbol("label")
 
 def statement():
-    statmnt = symbol("statement")(token.get("line"), token.get("column"))
+    statmnt = symbol("statement")(ps.token.get("line"), ps.token.get("column"))
     # labeled statement
-    if token.type == "identifier" and tokenStream.peek(1).id == ":": # label
-        s = symbol("label")(token.get("line"), token.get("column"))
-        s.childappend(token)
+    if ps.token.type == "identifier" and ps.tokenStream.peek(1).id == ":": # label
+        s = symbol("label")(ps.token.get("line"), ps.token.get("column"))
+        s.childappend(ps.token)
         advance()
-        s.childappend(token)
+        s.childappend(ps.token)
         advance(":")
         s.childappend(statement())
     # normal SourceElement
     else:
-        n = token
+        n = ps.token
         s = None 
         # function declaration, doesn't need statementEnd
-        if token.id == 'function' and tokenStream.peek(1).type == 'identifier':
+        if ps.token.id == 'function' and ps.tokenStream.peek(1).type == 'identifier':
             advance()
             s = n.pfix()
-            if token.id == ';':  # consume dangling semi
-                s.childappend(token)
+            if ps.token.id == ';':  # consume dangling semi
+                s.childappend(ps.token)
                 advance()
         # statement
         else:
-            if getattr(token, 'std', None):
+            if getattr(ps.token, 'std', None):
                 advance()
                 s = n.std()
-            elif token.id == ';': # empty statement
+            elif ps.token.id == ';': # empty statement
                 s = symbol("(empty)")()
-                s.childappend(token)
-            elif token.type != 'eol': # it's not an empty line
+                s.childappend(ps.token)
+            elif ps.token.type != 'eol': # it's not an empty line
                 s = expression()
                 # Crockford's too tight here
                 #if not (s.id == "=" or s.id == "("):
@@ -2002,12 +2015,12 @@ def statement():
                 # but there is this conflict between ',' as an operator infix(",", 5)
                 # and a stock symbol(",", 0) that terminates every expression() parse, like for
                 # arrays, maps, etc.).
-                if token.id == ',':
-                    s1 = symbol("expressionList")(token.get("line"), token.get("column"))
+                if ps.token.id == ',':
+                    s1 = symbol("expressionList")(ps.token.get("line"), ps.token.get("column"))
                     s1.childappend(s)
                     s = s1
-                    while token.id == ',':
-                        s.childappend(token)
+                    while ps.token.id == ',':
+                        s.childappend(ps.token)
                         advance(',')
                         s.childappend(expression())
             # Tentatively removing the statementEnd check. It's an assertion anyway, so doesn't do
@@ -2017,8 +2030,8 @@ def statement():
             # the parsing of dense code, like "for(..){...}a=1" (bug#7156).
             #statementEnd()
     statmnt.childappend(s)
-    if token.id == ';':
-        statmnt.childappend(token)
+    if ps.token.id == ';':
+        statmnt.childappend(ps.token)
         advance(';')
     return statmnt
 
@@ -2045,15 +2058,15 @@ def toJS(self, opts):
 
 
 def statementEnd():
-    if token.id in (";","}"):
+    if ps.token.id in (";","}"):
         pass
-    elif token.id == "eof":
+    elif ps.token.id == "eof":
     #    return token  # ok as stmt end, but don't just skip it (bc. comments)
         pass
-    elif tokenStream.eolBefore:
+    elif ps.tokenStream.eolBefore:
         pass # that's ok as statement end
     else:
-        raise SyntaxException("Unterminated statement (pos %r)" % ((token.get("line"), token.get("column")),))
+        raise SyntaxException("Unterminated statement (pos %r)" % ((ps.token.get("line"), ps.token.get("column")),))
 
     #if token.id in ("eof", 
     #    "eol", # these are not yielded by the TokenStream currently
@@ -2074,17 +2087,17 @@ def toJS(self, opts):
     return u''
 
 def statementOrBlock(): # for 'if', 'while', etc. bodies
-    if token.id == '{':
+    if ps.token.id == '{':
         return block()
     else:
         return statement()
 
 def statements():  # plural!
-    s = symbol("statements")(token.get("line"), token.get("column"))
+    s = symbol("statements")(ps.token.get("line"), ps.token.get("column"))
     while True:
-        if token.id == "}" or token.id == "eof":
-            if token.id == "eof" and token.comments:
-                s.childappend(token)  # keep eof for pot. comments
+        if ps.token.id == "}" or ps.token.id == "eof":
+            if ps.token.id == "eof" and ps.token.comments:
+                s.childappend(ps.token)  # keep eof for pot. comments
             break
         st = statement()
         if st:
@@ -2108,14 +2121,14 @@ def toJS(self, opts):
 def init_list():  # parse anything from "i" to "i, j=3, k,..."
     lst = []
     while True:
-        if token.id != "identifier":
+        if ps.token.id != "identifier":
             break
         elem = expression()
         lst.append(elem)
-        if token.id != ",":
+        if ps.token.id != ",":
             break
         else:
-            lst.append(token)
+            lst.append(ps.token)
             advance(",")
     return lst
 
@@ -2240,14 +2253,15 @@ class TreeGenerator(object):
     # in the generator, which does the tokenization on its own, and then calls
     # 'createFileTree'.
     def parse(self, tokenArr, expr=False):
-        global token, next, tokenStream
-        tokenStream = TokenStream(tokenArr) # TODO: adapt TokenStream to token array arg
-        next   = iter(tokenStream).next
-        token  = next()
-        if expr:
-            return expression()
-        else:
-            return statements()
+        saved = ps.tokenStream, ps.next, ps.token  # of an enclosing parse
+        ps.start(tokenArr)
+        try:
+            if expr:
+                return expression()
+            else:
+                return statements()
+        finally:
+            ps.tokenStream, ps.next, ps.token = saved
 
 
 # - Interface -----------------------------------------------------------------
@@ -2271,12 +2285,9 @@ def parse(string_, expr=False):
 # - Main ----------------------------------------------------------------------
 
 def test(x, program):
-    global token, next, tokenStream
     print ">>>", program
     tokenArr = tokenizer.Tokenizer().parseStream(program)
-    tokenStream = TokenStream(tokenArr)
-    next = iter(tokenStream).next
-    token = next()
+    ps.start(tokenArr)
     if x == e:
         res =  expression()
         print res.toXml()
@@ -469,7 +469,7 @@ def compileString(jsString, uniqueId=""):
     """
     Compile a string containing a JavaScript fragment into a syntax tree.
     """
-    return treegenerator.createFileTree(tokenizer.Tokenizer().parseStream(jsString, uniqueId)).getFirstChild().getFirstChild()  # strip (file (statements ...) nodes
+    return treegenerator.createFileTree(tokenizer.FastTokenizer().parseStream(jsString, uniqueId)).getFirstChild().getFirstChild()  # strip (file (statements ...) nodes
 
 
 def variableOrArrayNodeToArray(node):
@@ -883,21 +883,135 @@ def ensureClosureWrapper(nodes):
         closure_statements.addChild(node)
     return new_tree, closure_statements
 
+##
+# {(class, prefix) : {node type : handler function}}, see handlerTable()
+_handlerTables = {}
+
+##
+# The methods <prefix><type> of class <cls>, as a map from node type to
+# (unbound) function. Built once per class, so that visitors dispatch on the
+# node type with a dict lookup instead of a getattr() per node.
+#
+def handlerTable(cls, prefix):
+    key = (cls, prefix)
+    try:
+        return _handlerTables[key]
+    except KeyError:
+        table = {}
+        for name in dir(cls):
+            if name.startswith(prefix) and len(name) > len(prefix):
+                func = getattr(cls, name)
+                if callable(func):
+                    table[name[len(prefix):]] = getattr(func, "im_func", func)
+        _handlerTables[key] = table
+        return table
+
 ##
 # NodeVisitor class
 #
+# Calls visit_<type>(node) for the topmost nodes of each type it has a
+# handler for; the handler is responsible for visiting deeper, if needed.
+# The tree is walked with an explicit stack.
+#
 class NodeVisitor(object):
 
     def __init__(self, debug=False):
         self.debug = debug
-        
+
+    ##
+    # The bound visit_<ntype> method, or None
+    def handler(self, ntype):
+        func = handlerTable(self.__class__, "visit_").get(ntype)
+        return func and func.__get__(self, self.__class__)
+
     def visit(self, node):
-        if hasattr(self, "visit_"+node.type):
-            if self.debug:
+        handlers = handlerTable(self.__class__, "visit_")
+        debug = self.debug
+        stack = [node]
+        pop = stack.pop
+        while stack:
+            node = pop()
+            if debug:
                 print "visiting:", node.type
-            getattr(self, "visit_"+node.type)(node)
-        else:
-            for child in node.children:
-                if self.debug:
-                    print "visiting:", child.type
-                self.visit(child)
+            func = handlers.get(node.type)
+            if func is not None:
+                func(self, node)
+            else:
+                children = node.children
+                if children:
+                    stack.extend(children[::-1])
+
+
+##
+# TreePass class
+#
+# A visitor that leaves the traversal to walkPasses(), so that several passes
+# can share a single walk over a tree. For each node, enter_<type>(node) is
+# called before its children are walked and leave_<type>(node) after them;
+# enter(node) and leave(node) stand in for types without their own method.
+# The children are read after the enter methods ran. finish() is called when
+# the walk is done.
+#
+class TreePass(object):
+
+    def finish(self):
+        pass
+
+    ##
+    # Run this pass alone on <node>
+    def run(self, node):
+        walkPasses(node, [self])
+        return node
+
+
+_leaveMark = object()
+
+##
+# Walk the tree of <node> once, running the TreePass'es <passes> in list
+# order on each node.
+#
+def walkPasses(node, passes):
+    handlers = {}   # {node type : ([bound enter methods], [bound leave methods])}
+
+    def lookup(ntype):
+        enters = []
+        leaves = []
+        for pas in passes:
+            func = getattr(pas, "enter_" + ntype, None) or getattr(pas, "enter", None)
+            if func is not None:
+                enters.append(func)
+            func = getattr(pas, "leave_" + ntype, None) or getattr(pas, "leave", None)
+            if func is not None:
+                leaves.append(func)
+        handlers[ntype] = (enters, leaves)
+        return enters, leaves
+
+    stack = [node]
+    pop = stack.pop
+    push = stack.append
+    while stack:
+        node = pop()
+        if node is _leaveMark:
+            node = pop()
+            for func in handlers[node.type][1]:
+                func(node)
+            continue
+        try:
+            enters, leaves = handlers[node.type]
+        except KeyError:
+            enters, leaves = lookup(node.type)
+        for func in enters:
+            func(node)
+        children = node.children
+        if leaves:
+            if not children:
+                for func in leaves:
+                    func(node)
+                continue
+            push(node)
+            push(_leaveMark)
+        if children:
+            stack.extend(children[::-1])
+
+    for pas in passes:
+        pas.finish()
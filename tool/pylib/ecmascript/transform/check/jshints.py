@@ -24,17 +24,34 @@ from generator.code.HintArgument import HintArgument
 from generator import Context as context
 
 ##
-# A visitor on a syntax tree to create a tree of Hint() objects from JSDoc comments.
+# A pass over a syntax tree to create a tree of Hint() objects from JSDoc comments,
+# attached to corresp. nodes of <tree> (see create_hints_tree()).
 #
-class CreateHintsVisitor(treeutil.NodeVisitor):
+class CreateHintsVisitor(treeutil.TreePass):
 
     def __init__(self, tree):
-        hint = self.process_comments(tree)
+        self.tree = tree
+        self.curr_hint = None
+        self._start_hint_tree(tree)
+        # Special case: top-level sequence of statements:
+        # each tl statement gets its own hint tree, tied to the first in finish()
+        self.root_node = None
+        if tree.type=='statements':
+            self.root_node = tree
+        elif len(tree.children)==1 and tree.children[0].type=='statements':
+            self.root_node = tree.children[0]
+        if self.root_node:
+            self.skipped = set((tree, self.root_node))
+            self.tl_statements = set(self.root_node.children)
+
+    def _start_hint_tree(self, node):
+        self.curr_hint = None
+        hint = self.process_comments(node)
         if not hint:
             hint = Hint() # provide an inital, empty top-level Hint() object
         self.curr_hint = hint
-        tree.hint = hint
-        hint.node = tree
+        node.hint = hint
+        hint.node = node
 
     @staticmethod
     def find_enclosing_hint(node):
@@ -48,7 +65,12 @@ class CreateHintsVisitor(treeutil.NodeVisitor):
 
     # -----------------------------------------------------------------
 
-    def visit(self, node):
+    def enter(self, node):
+        if self.root_node:
+            if node in self.skipped:
+                return
+            if node in self.tl_statements:
+                self._start_hint_tree(node)
 
         hint = self.process_comments(node)
         if hint:
@@ -62,12 +84,27 @@ class CreateHintsVisitor(treeutil.NodeVisitor):
             hint.node = main_node # node?!
             # scope nested hints
             self.curr_hint = hint
-        for cld in node.children:
-            self.visit(cld)
+
+    def finish(self):
+        if not self.root_node:
+            return
+        # tie the hint trees of all subsequent tl statements to the first
+        # (as the first statement gets the very first jsdoc comment which should scope over all)
+        tree = self.tree
+        first_cld = True
+        for cld in self.root_node.children:
+            if first_cld:
+                first_cld = False
+                first = cld
+                first.hint.parent = tree.hint
+                tree.hint.children.append(first.hint)
+            else:
+                first.hint.children.append(cld.hint)
+                cld.hint.parent = first.hint
 
     def _key_is_ignored(self, at_key, hint_node):
         for hint in itertools.chain([hint_node], self.curr_hint.search_upward() 
-                if hasattr(self,'curr_hint') else []  # self.curr_hint might not be initialized yet, see __init__
+                if self.curr_hint else []  # self.curr_hint might not be initialized yet, see _start_hint_tree
             ):
             if hint.ident_matches(at_key, ('lint', 'ignoreJsdocKey')):
                 return True
@@ -181,29 +218,8 @@ def find_hints_upward(node):
 ##
 # Create a tree of Hint() objects, attached to corresp. nodes of tree.
 #
+# To create the hints in the traversal of another pass, pass a
+# CreateHintsVisitor(tree) to treeutil.walkPasses() instead.
+#
 def create_hints_tree(tree):
-    treeHintColltor = CreateHintsVisitor(tree)
-    # Special case: top-level sequence of statements:
-    # tie the hint trees of all subsequent tl statements to the first
-    # (as the first statement gets the very first jsdoc comment which should scope over all)
-    if tree.type=='statements' or (len(tree.children)==1 and tree.children[0].type=='statements'):
-        if tree.type=='statements':
-            root_node = tree
-        elif tree.children[0].type=='statements':
-            root_node = tree.children[0]
-        first_cld = True
-        for cld in root_node.children:
-            cldColltor = CreateHintsVisitor(cld)
-            cldColltor.visit(cld)
-            if first_cld:
-                first_cld = False
-                first = cld
-                first.hint.parent = tree.hint
-                tree.hint.children.append(first.hint)
-            else:
-                first.hint.children.append(cld.hint)
-                cld.hint.parent = first.hint
-    else:
-        treeHintColltor.visit(tree)
-    return tree
-
+    return CreateHintsVisitor(tree).run(tree)
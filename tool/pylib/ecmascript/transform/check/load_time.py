@@ -34,21 +34,7 @@ class LoadTimeAnnotator(scopes.ScopeVisitor):
             self.visit(cld)
 
     def visit_function(self, scopeNode):
-        node = scopeNode.node
-
-        # immediate-call functions are load-time = <inherit>
-        if (node.hasParentContext("call/operand") or
-            node.hasParentContext("call/operand/group")):
-                scopeNode.is_load_time = scopeNode.parent.is_load_time if scopeNode.parent else False
-
-        # 'defer' function is load-time = True
-        elif treeutil.isDeferFunction(node):
-            scopeNode.is_load_time = True
-            scopeNode.is_defer = True
-
-        else:
-            scopeNode.is_load_time = False
-
+        annotate_function(scopeNode)
         for cld in scopeNode.children:
             self.visit(cld)
         # ideally, we would traverse the ast of this scope, identify call sites
@@ -57,8 +43,39 @@ class LoadTimeAnnotator(scopes.ScopeVisitor):
         # outside the qx closed form.
 
 
+##
+# LoadTimeAnnotator as a tree pass, to annotate the scopes of a file tree while
+# they are created (see scopes.create_scopes()).
+#
+class LoadTimePass(treeutil.TreePass):
+
+    def enter_file(self, node):
+        if hasattr(node, 'scope'):
+            node.scope.is_load_time = True
+
+    def enter_function(self, node):
+        if hasattr(node, 'scope'):
+            annotate_function(node.scope)
+
+
 # - ---------------------------------------------------------------------------
 
+def annotate_function(scopeNode):
+    node = scopeNode.node
+
+    # immediate-call functions are load-time = <inherit>
+    if (node.hasParentContext("call/operand") or
+        node.hasParentContext("call/operand/group")):
+            scopeNode.is_load_time = scopeNode.parent.is_load_time if scopeNode.parent else False
+
+    # 'defer' function is load-time = True
+    elif treeutil.isDeferFunction(node):
+        scopeNode.is_load_time = True
+        scopeNode.is_defer = True
+
+    else:
+        scopeNode.is_load_time = False
+
 def load_time_check(scope_node):
     load_time_checker = LoadTimeAnnotator()
     scope_node.is_load_time = True  # assume this is file-level
@@ -30,9 +30,9 @@ from ecmascript.frontend import treeutil
 class ScopeVisitor(object):
 
     def visit(self, scopeNode):
-        scope_type = scopeNode.node.type
-        if hasattr(self, "visit_"+scope_type):
-            getattr(self, "visit_"+scope_type)(scopeNode)
+        func = treeutil.handlerTable(self.__class__, "visit_").get(scopeNode.node.type)
+        if func is not None:
+            func(self, scopeNode)
         else:
             for child in scopeNode.children:
                 self.visit(child)
@@ -44,9 +44,9 @@ class ScopeVisitor(object):
 class VarsCollector(ScopeVisitor):
 
     def visit(self, scopeNode):
-        scope_type = scopeNode.node.type
-        if hasattr(self, "visit_"+scope_type):
-            getattr(self, "visit_"+scope_type)(scopeNode)
+        func = treeutil.handlerTable(self.__class__, "visit_").get(scopeNode.node.type)
+        if func is not None:
+            func(self, scopeNode)
         else:
             varsCollector = AssignScopeVarsVisitor(scopeNode)
             varsCollector.visit(scopeNode.node)
@@ -186,10 +186,10 @@ class AssignScopeVarsVisitor(treeutil.NodeVisitor):
 
 
 ##
-# AST visitor that only creates the Scope() tree for this AST, but doesn't
+# AST pass that only creates the Scope() tree for this AST, but doesn't
 # assign var occurrences to scopes.
 #
-class CreateScopesVisitor(treeutil.NodeVisitor):
+class CreateScopesVisitor(treeutil.TreePass):
 
     def __init__(self, root_node):
         super(CreateScopesVisitor, self).__init__()
@@ -198,33 +198,24 @@ class CreateScopesVisitor(treeutil.NodeVisitor):
         root_node.scope = self.global_scope
         self.curr_scope = self.global_scope
 
-    def visit_function(self, node):
-        #print "function visitor", node
-        node.scope = Scope(node)
-        node.scope.parent = self.curr_scope
-        self.curr_scope.children.append(node.scope)
-
-        # switch to function scope and get nested scopes
-        self.curr_scope = node.scope
-        for child in node.children:
-            self.visit(child)
-        # and restore old scope
-        self.curr_scope = node.scope.parent
+    def visit(self, node):
+        return self.run(node)
 
-    def visit_catch(self, node):
-        #print "catch visitor", node
-        # create a scope solely for the execption param
+    def enter_function(self, node):
         node.scope = Scope(node)
         node.scope.parent = self.curr_scope
         self.curr_scope.children.append(node.scope)
-
         # switch to function scope and get nested scopes
         self.curr_scope = node.scope
-        for child in node.children:
-            self.visit(child)
+
+    def leave_function(self, node):
         # restore old scope
         self.curr_scope = node.scope.parent
 
+    # a catch clause gets a scope solely for the exception param
+    enter_catch = enter_function
+    leave_catch = leave_function
+
     # 'with' does not introduce a nested scope, although ECMA262 says that the
     # object expression in 'with(...)' is pushed in front of the scope chain.
     # but all browsers implement it as a normal non-scope introducing statement.
@@ -395,17 +386,28 @@ def find_enclosing(node):
 
 # - Interface function --------------------------------------------------------
 
-def create_scopes(node):
+##
+# Create the Scope() tree of <node> and collect the vars into it.
+#
+# <passes> are further treeutil.TreePass'es that run in the same traversal of
+# the tree that creates the scopes (after the scope pass on each node, so they
+# can use node.scope), e.g. load_time.LoadTimePass. They also run if the tree
+# is not suitable for scopes.
+#
+def create_scopes(node, passes=()):
+    passes = list(passes)
     # check we're scoping a matching tree
     file_node = node.getRoot()
     treegen = file_node.get("treegenerator_tag", ())
     if treegen == () or treegen != 1:
         # TODO: console.debug("Not creating scopes for unsuitable tree")
+        if passes:
+            treeutil.walkPasses(node, passes)
         return node # silently do nothing
 
     # create only the scope tree for this ast
     scopeCollector = CreateScopesVisitor(node)
-    scopeCollector.visit(node)
+    treeutil.walkPasses(node, [scopeCollector] + passes)
     # now go through the scopes and collect vars into it
     varCollector = VarsCollector()
     varCollector.visit(node.scope)
@@ -81,7 +81,39 @@ def crypt(id, name, privmap):
     privmap[combined] = repl
 
     return repl
-        
+
+
+##
+# return the "<id>:<private>" keys of the privates defined in <tree>, in the
+# order patch() would allocate replacements for them
+#
+def collect(id, tree):
+    recorder = KeyRecorder()
+    lookup(id, tree, {}, recorder)
+    return recorder.keys_in_order
+
+
+##
+# allocate replacements for <keys> (as returned by collect()) in <privmap>,
+# the same way crypt() does
+#
+def merge(keys, privmap):
+    for combined in keys:
+        if combined not in privmap:
+            privmap[combined] = "__%s" % convert(len(privmap))
+    return privmap
+
+
+class KeyRecorder(dict):
+    def __init__(self):
+        dict.__init__(self)
+        self.keys_in_order = []
+
+    def __setitem__(self, key, val):
+        self.keys_in_order.append(key)
+        dict.__setitem__(self, key, val)
+
+
     
 ##
 # collect privates and associate a replacement in <privates>
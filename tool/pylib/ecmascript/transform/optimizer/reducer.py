@@ -144,8 +144,9 @@ class ASTReducer(treeutil.NodeVisitor):
             nnode.addChild(cld)
 
         # try reducing current node, might return a fresh symbol()
-        if hasattr(self, "visit_"+node.type):
-            nnode = getattr(self, "visit_"+node.type)(nnode)
+        handler = self.handler(node.type)
+        if handler:
+            nnode = handler(nnode)
 
         return nnode
 
@@ -35,8 +35,9 @@ from generator.runtime.CodeIssue import CodeIssue
 class Tree3ToTree1(treeutil.NodeVisitor):
 
     def visit(self, node):
-        if hasattr(self, "visit_" + node.type):
-            nnode = getattr(self, "visit_" + node.type)(node)
+        handler = self.handler(node.type)
+        if handler:
+            nnode = handler(node)
         else:
             nnode = node.clone()
             nnode.children = []
@@ -22,7 +22,8 @@
 
 #
 
-import re, os, sys, types, string, time
+import re, os, sys, types, string, time, traceback
+import cPickle as pickle
 
 from misc                            import textutil, util, json
 from generator.code.DependencyLoader import DependencyLoader
@@ -38,6 +39,7 @@ from generator.action                import Logging, FileSystem, Resources
 from generator.action                import MiniWebServer, JsonValidation
 from generator.output                import CodeProvider
 from generator.runtime.Cache         import Cache
+from generator.runtime               import WorkerPool
 from generator                       import Context
 
 
@@ -60,11 +62,19 @@ class Generator(object):
         else:
             cache_path = self._job.get("cache/compile", "cache")
             cache_path = self._config.absPath(cache_path)
+            shared_path = self._job.get("cache/shared")
+            if shared_path:
+                shared_path = self._config.absPath(shared_path)
             self._cache = Cache(cache_path, **{
                 'interruptRegistry' : context['interruptRegistry'],
                 'console' : context['console'],
                 'cache/downloads' : self._job.get("cache/downloads", cache_path + "/downloads"),
                 'cache/invalidate-on-tool-change' : self._job.get('cache/invalidate-on-tool-change', False),
+                'cache/backend' : self._job.get('cache/backend', 'file'),
+                'cache/memory-limit' : self._job.get('cache/memory-limit', {}),
+                'cache/invalidation' : self._job.get('cache/invalidation', 'mtime'),
+                'cache/shared' : shared_path,
+                'cache/shared-write' : self._job.get('cache/shared-write', False),
             })
             context['cache'] = self._cache
 
@@ -461,6 +471,57 @@ class Generator(object):
                 self._classesObj["qx.core.Environment"].init_envKeyProviderIndex(self._classesObj)
 
 
+        ##
+        # Parse the classes of all libraries, the syntax tree of which is not
+        # in the cache (or outdated), in worker processes. Dependency analysis
+        # will then find all trees in the cache. Parse errors are left to
+        # Class.tree() to report, when the class is actually used.
+        def warmClassTrees():
+            workers = WorkerPool.workerCount(config.get("compile-options/code/workers", 1))
+            if workers < 2:
+                return
+            classIds = [x for x in sorted(self._classesObj) if not self._classesObj[x].treeIsCached()]
+            if len(classIds) < 2:
+                return
+            self._console.info("Parsing %s classes  " % len(classIds), feed=False)
+            WorkerPool.map(_parseClassTask, classIds, workers, self._console.dot,
+                           {'classes' : self._classesObj})
+            self._console.dotclear()
+
+
+        ##
+        # Number of worker processes (compile-options/code/workers) to process
+        # the variant sets of the job with. Only compile jobs that optimize
+        # variants in a build or hybrid version are processed in parallel, as
+        # otherwise every variant set writes the same files. Not with the
+        # 'privates' optimization either, as the variant sets allocate
+        # replacements in the site-wide privates db one after the other;
+        # the classes of each set are then compiled in parallel instead.
+        def variantSetWorkers(variantSets, triggers):
+            if len(variantSets) < 2 or triggers != set(["compile"]):
+                return 1
+            optimize = config.get("compile-options/code/optimize", [])
+            if ("variants" not in optimize or "privates" in optimize
+                or config.get("compile/type", "") == "source"):
+                return 1
+            return WorkerPool.workerCount(config.get("compile-options/code/workers", 1))
+
+
+        ##
+        # Run process(num) for every num in range(count) in worker processes,
+        # which share the (file) cache. The console output of each is written
+        # when it is done, in order.
+        def runParallel(process, count, workers):
+            self._console.info("Processing %s variant sets in %s processes" % (count, min(workers, count)))
+            data = {'process' : process, 'console' : self._console}
+            for captured, error in WorkerPool.imap(_variantSetTask, range(count), workers, data):
+                self._console.replay(captured)
+                if error:
+                    if hasattr(error, "workerTraceback"):
+                        self._console.debug(error.workerTraceback)
+                    raise error
+
+
         ##
         # Safely take out a member from a set. Returns the member if it could
         # be removed, None otherwise.
@@ -522,6 +583,7 @@ class Generator(object):
 
             # -- Process job triggers that require a class list (and some)
             prepareGenerator()
+            warmClassTrees()
 
             # Preprocess include/exclude lists
             includeWithDeps, includeNoDeps = getIncludes(self._job.get("include", []))
@@ -555,7 +617,9 @@ class Generator(object):
             # Processing all combinations of variants
             environData = getVariants("environment")   # e.g. {'qx.debug':false, 'qx.aspects':[true,false]}
             variantSets = util.computeCombinations(environData) # e.g. [{'qx.debug':'on','qx.aspects':'on'},...]
-            for variantSetNum, variantset in enumerate(variantSets):
+
+            def processVariantSet(variantSetNum):
+                variantset = variantSets[variantSetNum]
                 # some console output
                 printVariantInfo(variantSetNum, variantset, variantSets, environData)
 
@@ -615,6 +679,14 @@ class Generator(object):
                     Logging.runLogUnusedClasses(self._job, script)
                     Logging.runLogResources(self._job, script)
 
+            workers = variantSetWorkers(variantSets, jobTriggers)
+            if workers < 2:
+                for variantSetNum in range(len(variantSets)):
+                    processVariantSet(variantSetNum)
+            else:
+                runParallel(processVariantSet, len(variantSets), workers)
+
+        self._console.debug("Memory cache: %(entries)d entries (%(size)d bytes), %(hits)d hits, %(misses)d misses, %(evictions)d evictions" % self._cache.memoryStats())
         elapsedsecs = time.time() - starttime
         self._console.info("Done (%dm%05.2f)" % (int(elapsedsecs/60), elapsedsecs % 60))
 
@@ -653,13 +725,12 @@ class Generator(object):
 
         for libObj in libraryKey:
 
-            checkFile, fsTime = libObj.mostRecentlyChangedFile() # use the fresh Library() object to get the newest file on disk
             cacheId = "lib-%s" % libObj.manipath
-            checkObj, cacheTime = self._cache.read(cacheId, memory=True)
+            checkObj, _ = self._cache.read(cacheId, memory=True)
             # need re-scan?
-            if not checkObj or cacheTime < fsTime:
+            if not checkObj or not libObj.scanIsCurrent(checkObj):
                 self._console.debug("Re-scanning lib %s" % libObj.path)
-                libObj.scan(cacheTime)
+                libObj.scan(checkObj)
                 self._cache.write(cacheId, libObj, memory=True)
             else:
                 libObj = checkObj  # continue with cached obj
@@ -671,6 +742,11 @@ class Generator(object):
 
             for entry in classList:
                 classes[entry.id] = entry
+                # a cached lib obj might come from an earlier generator run in
+                # this process (daemon mode), with its own console and cache
+                entry.context['console'] = self._console
+                entry.context['cache'] = self._cache
+                entry._runMemo = {}
 
             docs.update(libObj.getDocs())
             translations[namespace] = libObj.getTranslations()
@@ -684,5 +760,36 @@ class Generator(object):
         return (namespaces, classes, docs, translations, libraries)
 
 
-
-
+##
+# WorkerPool task for Generator.run(); classes are passed through
+# WorkerPool.shared
+def _parseClassTask(classId):
+    try:
+        WorkerPool.shared['classes'][classId].tree()
+    except Exception:
+        return False
+    return True
+
+
+##
+# WorkerPool task for Generator.run(), processing a variant set; returns the
+# console output and the error that ended processing, if any. The error keeps
+# its type where it can be pickled, and carries the worker's traceback in
+# .workerTraceback.
+def _variantSetTask(variantSetNum):
+    console = WorkerPool.shared['console']
+    captured = console.capture()
+    error = None
+    try:
+        WorkerPool.shared['process'](variantSetNum)
+    except SystemExit, e:
+        error = SystemExit(e.code)
+    except Exception, e:
+        trace = traceback.format_exc()
+        error = e
+        try:
+            pickle.loads(pickle.dumps(error, 2))
+        except Exception:
+            error = RuntimeError("%s: %s" % (e.__class__.__name__, e))
+        error.workerTraceback = trace
+    return captured, error
@@ -24,6 +24,7 @@ import re, os, sys, types, glob, time, string, platform
 from misc import filetool, textutil
 from generator import Context
 from generator.runtime.ShellCmd import ShellCmd
+from generator.runtime import DirWatcher
 
 ##
 # Library that contains various functions that implement Generator job actions
@@ -148,9 +149,13 @@ class CommandLineTemplate(string.Template):
 ##
 # Exposes a .check() method to check for changes in the configured paths.
 # - Only concerned with the file checking, no timing, no actions.
+# - Where available, a DirWatcher tells whether there were changes at all,
+#   so the paths are only searched then.
 #
 class Watcher(object):
 
+    _ignored_dirs = re.compile(r'%s' % '|'.join(filetool.VERSIONCONTROL_DIR_PATTS), re.I)
+
     def __init__(self, jobconf, confObj):
         self.jobconf = jobconf
         self.confObj = confObj
@@ -159,6 +164,13 @@ class Watcher(object):
         self.with_dirs = jobconf.get("watch-files/include-dirs", False)
         self.pattern = self._watch_pattern(jobconf.get("watch-files/include", []))
         self.console = Context.console
+        self.dirWatcher = None
+        if DirWatcher.available():
+            try:
+                self.dirWatcher = DirWatcher.DirWatcher()
+            except OSError, e:  # e.g. over the limit of inotify instances
+                self.console.debug("Cannot watch directories: %s" % e)
+        self.watching = False  # whether dirWatcher covers all directories
 
     def _watch_pattern(self, include):
         pattern = u''
@@ -169,7 +181,31 @@ class Watcher(object):
         pattern = '|'.join(a)
         return pattern
 
+    ##
+    # Have dirWatcher watch the directories under the paths (again, to include
+    # new ones); returns False if that is not possible
+    def _watch_dirs(self):
+        for path in self.paths:
+            if not os.path.isdir(path):
+                path = os.path.dirname(path)
+                if not os.path.isdir(path) or not self.dirWatcher.watch(path):
+                    return False
+                continue
+            for root, dirs, files in filetool.walk(path):
+                dirs[:] = [x for x in dirs if not self._ignored_dirs.match(x)]
+                if not self.dirWatcher.watch(root):
+                    return False
+        return True
+
     def check(self, since):
+        if self.dirWatcher:
+            if self.watching and self.dirWatcher.changes() == set():
+                return []  # nothing happened in the watched directories
+            # (re-)watch before checking, so changes during the check are not missed
+            self.watching = self._watch_dirs()
+            if not self.watching:  # fall back to searching every time
+                self.dirWatcher.close()
+                self.dirWatcher = None
         ylist = []
         for path in self.paths:
             self.console.debug("checking path '%s'" % path)
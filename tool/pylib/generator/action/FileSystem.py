@@ -47,16 +47,42 @@ def runResources(confObj, script):
     # make resources to copy unique
     resources_to_copy = set(_res for cls in classList for _res in cls.resources)
     # Copy resources
-    #for lib in libs:
-    for res in resources_to_copy:
+    pairs = []
+    for res in sorted(resources_to_copy, key=lambda res: res.id):
         # construct target path
         resTarget = os.path.join(resTargetRoot, 'resource', res.id)
-        # Copy
-        _copyResources(res.path, os.path.dirname(resTarget))
+        if os.path.isdir(res.path):
+            _copyResources(res.path, os.path.dirname(resTarget))
+        elif os.path.basename(res.path) not in skip_list_obj:
+            pairs.append((res.path, resTarget))
+
+    manifest = _readCopyManifest()
+    targets = set(target for _, target in pairs)
+    prefix = os.path.join(resTargetRoot, 'resource', '')
+    for target in manifest.keys():  # forget targets of this root that are no longer copied
+        if target.startswith(prefix) and target not in targets:
+            del manifest[target]
+    copied = copytool.copyFiles(pairs, manifest, jobconf.get("copy-resources/link", None) or None,
+                                jobconf.get("copy-resources/threads", 4), console)
+    console.debug("Copied %d of %d resources" % (copied, len(pairs)))
+    _writeCopyManifest(manifest)
 
     console.outdent()
 
 
+##
+# The manifest of copied files ({target: (source, source stamp, target
+# stamp)}), kept in the cache
+copy_manifest_id = "copied-files"
+
+def _readCopyManifest():
+    manifest = Context.cache.read(copy_manifest_id, memory=True)[0]
+    return manifest if isinstance(manifest, dict) else {}
+
+def _writeCopyManifest(manifest):
+    Context.cache.write(copy_manifest_id, manifest, memory=True)
+
+
 def runCopyFiles(jobconf, confObj):
     # Copy application files
     if not jobconf.get("copy-files/files", False):
@@ -95,6 +121,7 @@ def runCopyFiles(jobconf, confObj):
 
 #skip_list = [x.strip("^\\$") for x in filetool.VERSIONCONTROL_DIR_PATTS]
 skip_list = filetool.VERSIONCONTROL_DIR_PATTS
+skip_list_obj = copytool.SkipList(skip_list)
 
 
 ##
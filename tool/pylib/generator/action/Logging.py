@@ -31,6 +31,7 @@ from ecmascript.transform.optimizer import privateoptimizer
 from ecmascript.transform.optimizer import featureoptimizer
 from generator.output.CodeGenerator   import CodeGenerator
 from generator.code.Class           import Class, CompileOptions
+from generator.code.DepGraph        import DepGraph
 
 def runLogUnusedClasses(jobconf, script):
     if not jobconf.get("log/classes-unused", False):
@@ -198,49 +199,22 @@ def runLogDependencies(jobconf, script):
     # will report used-by relations of a specific class in sequence
     def lookupUsedByDeps(packages, includeTransitives, forceFreshDeps=False):
 
-        depsMap = {}
+        classes = [x for package in packages for x in package.classes]
+        depGraph = DepGraph(classes, script.classesAll, variants, script.jobconfig,
+                            includeTransitives=includeTransitives, force=forceFreshDeps)
 
         # build up depsMap {"classId" : ("packageId", [<load_deps>,...], [<run_deps>, ...]) }
+        depsMap = {}
         for packageId, package in enumerate(packages):
             for classObj in package.classes:
-                classId = classObj.id
-                if classId not in depsMap:
-                    depsMap[classId] = (packageId, [], [])
-                classDeps, _ = classObj.getCombinedDeps(script.classesAll, variants, script.jobconfig, projectClassNames=False, force=forceFreshDeps)
-                ignored_names = [x.name for x in classDeps["ignore"]]
-                loads = classDeps["load"]
-                runs  = classDeps["run"]
-
-                # strip transitive dependencies
-                if not includeTransitives:
-                    loads1, loads = loads[:], []
-                    for dep in loads1:
-                        # if the .requestor is different from classId, it must be included
-                        # through a transitive analysis
-                        if dep.requestor == classId:
-                            loads.append(dep)
-
-                # project class names
-                loads1, loads = loads[:], []
-                for dep in loads1:
-                    if dep.name not in (x.name for x in loads):
-                        loads.append(dep)
-                runs1, runs = runs[:], []
-                for dep in runs1:
-                    if dep.name not in (x.name for x in runs):
-                        runs.append(dep)
-
-                # collect dependencies
-                for dep in loads:
-                    if dep.name not in ignored_names:
-                        if dep.name not in depsMap:
-                            depsMap[dep.name] = (packageId, [], [])  # the packageId is bogus here
-                        depsMap[dep.name][1].append(classId)
-                for dep in runs:
-                    if dep.name not in ignored_names:
-                        if dep.name not in depsMap:
-                            depsMap[dep.name] = (packageId, [], [])
-                        depsMap[dep.name][2].append(classId)
+                if classObj.id not in depsMap:
+                    depsMap[classObj.id] = (packageId,)
+        for depId in set(depGraph.loadedBy).union(depGraph.usedBy):
+            if depId not in depsMap:
+                usedBy = depGraph.loadedBy.get(depId) or depGraph.usedBy[depId]
+                depsMap[depId] = (depsMap[usedBy[0]][0],)  # the packageId is bogus here
+        for depId in depsMap:
+            depsMap[depId] += (depGraph.loadedBy.get(depId, []), depGraph.usedBy.get(depId, []))
 
         # yield depsMap
         for depId, depVal in depsMap.items():
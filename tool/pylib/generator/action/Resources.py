@@ -25,7 +25,7 @@
 import sys, os, re, types, string, glob
 from misc import Path, filetool, json
 from generator import Context
-from generator.resource.Image        import Image
+from generator.resource.Image        import Image, infoIndex as imageInfoIndex
 from generator.resource.ImageClipping    import ImageClipping
 
 def runImageSlicing(jobconf, confObj):
@@ -49,6 +49,8 @@ def runImageSlicing(jobconf, confObj):
             trim_width = True
         imageClipper.slice(image, prefix, border_width, trim_width)
 
+    imageInfoIndex.save()
+
 
 ##
 # Go through a list of images and create them as combination of other images
@@ -170,6 +172,7 @@ def runImageCombining(jobconf, confObj):
                 combinedMap[subId] = subMap
             filetool.save(image, json.dumpsCode(combinedMap))
 
+    imageInfoIndex.save()
     console.outdent()
 
     return
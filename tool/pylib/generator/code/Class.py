@@ -56,9 +56,9 @@ class Class(Resource, MClassHints, MClassI18N, MClassDependencies, MClassCode, M
         self.translations = {} # map of translatable strings in this class
         self.resources  = set() # set of resource objects needed by the class
         self._assetRegex= {}  # [AssetHint], to hold regex's from #asset hints, for resource matching
-        self.cacheId    = "class-%s" % self.path  # cache object for class-specific infos (outside tree, compile)
         self.treeId     = None # cache id for the source tree; filled in tree()
         self._tmp_tree  = None # for out-of-band optimization
+        self._runMemo   = {}   # results of the current run (getCombinedDeps(), classVariants())
         
         console = context["console"]
         cache   = context["cache"]
@@ -70,6 +70,7 @@ class Class(Resource, MClassHints, MClassI18N, MClassDependencies, MClassCode, M
         d = self.__dict__.copy()
         del d['context'] # don't keep any of the runtime infos (jobconf, cache, console)
         d['_tmp_tree'] = None # remove memoized run time tree
+        d['_runMemo'] = {}
         return d
 
     def __setstate__(self, d):
@@ -109,13 +110,14 @@ class Class(Resource, MClassHints, MClassI18N, MClassDependencies, MClassCode, M
     ##
     # classInfo = {
     #   'svariants' : ['qx.debug']    # supported variants
-    #   'deps-<path>-<variants>' : ([<Dep>qx.Class#define], <timestamp>)  # class dependencies
+    #   'deps-<cacheKey>-<variants>' : [(<transitive variant keys>, <their variants>,
+    #                                    [<Dep>qx.Class#define], <timestamp>, <digests>)]  # class dependencies
     #   'messages-<variants>' : ["Hello %1"]  # message strings
     #   'hint-meta' : parsed compiler hints (see MClassHints.py)
     # }
     def _getClassCache(self):
         cache = self.context['cache']
-        classInfo, modTime = cache.read(self.cacheId, self.path, memory=True)
+        classInfo, modTime = cache.read(self.cacheId, self.cacheDependsOn(), memory=True, shared=True)
         if self.writeCond():
             print "\nReading %s " % self.cacheId , 
         if classInfo:
@@ -124,7 +126,7 @@ class Class(Resource, MClassHints, MClassI18N, MClassDependencies, MClassCode, M
                     ["%s:%s" % (i,self.foo(classInfo[i][1]) if (type(classInfo[i])==tuple and len(classInfo[i])>1) else "-") for i in classInfo])
                 for k in classInfo.keys():
                     if k.startswith("deps-"):
-                        data = classInfo[k][0]['load']
+                        data = classInfo[k][-1][2]['load']
                         print (sorted(data, key=str))
                         print "len:", len(data)
             return classInfo, modTime
@@ -140,10 +142,45 @@ class Class(Resource, MClassHints, MClassI18N, MClassDependencies, MClassCode, M
                 ["%s:%s" % (i,self.foo(classInfo[i][1]) if (type(classInfo[i])==tuple and len(classInfo[i])>1) else "-") for i in classInfo])
             for k in classInfo.keys():
                 if k.startswith("deps-"):
-                    data = classInfo[k][0]['load']
+                    data = classInfo[k][-1][2]['load']
                     print (sorted(data, key=str))
                     print "len:", len(data)
-        cache.write(self.cacheId, classInfo, memory=True)
+        cache.write(self.cacheId, classInfo, memory=True, shared=True)
+
+
+    ##
+    # The part of cacheIds that identifies the source of this class: its path,
+    # or, with 'content' cache invalidation, library namespace, class id and
+    # the digest of its contents, which is independent of the location of the
+    # library (so entries can be shared between checkouts)
+    def cacheKey(self):
+        cache = self.context['cache']
+        if cache.invalidation == "content":
+            return "%s:%s-%s" % (self.library.namespace, self.id, cache.contentDigest(self.path))
+        else:
+            return self.path
+
+
+    ##
+    # The 'dependsOn' argument for Cache.read() of entries keyed by cacheKey();
+    # with 'content' invalidation, the key itself decides about freshness
+    def cacheDependsOn(self):
+        if self.context['cache'].invalidation == "content":
+            return None
+        else:
+            return self.path
+
+
+    ##
+    # Whether entries for this class, optimized with <optimize>, can go to the
+    # shared cache; not so with 'privates', as the replacements come from the
+    # local privates db
+    def cacheShared(self, optimize=[]):
+        return "privates" not in optimize
+
+
+    # cache object for class-specific infos (outside tree, compile)
+    cacheId = property(lambda self: "class-%s" % self.cacheKey())
 
 
     def foo(s,t):
@@ -269,5 +306,5 @@ class CompileOptions(object):
         self.variantset = variants
         self.format     = _format
         self.source_with_comments = source_with_comments
-        self.privateMap = {} # {"<classId>:<private>":"<repl>"}
+        self.privateMap = None # {"<classId>:<private>":"<repl>"}; if set, used instead of the privates db in the cache
 
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+################################################################################
+#
+#  qooxdoo - the new era of web development
+#
+#  http://qooxdoo.org
+#
+#  License:
+#    MIT: https://opensource.org/licenses/MIT
+#    See the LICENSE file in the project's top-level directory for details.
+#
+################################################################################
+
+##
+# DepGraph -- The dependency relations of a class list under a variant set
+#
+# Built once from Class.getCombinedDeps() of every class, so consumers can
+# look up dependencies in both directions, and the package of a class,
+# without querying and scanning the classes over and over again.
+#
+#   load, run         {classId : [depId,...]}  dependencies, in the order of
+#                                              getCombinedDeps(), without
+#                                              duplicates and ignored names
+#   loadedBy, usedBy  {depId : [classId,...]}  the reverse edges; depIds can
+#                                              also be classes outside the list
+#   classPackage      {classId : Package}      see mapPackages()
+##
+
+class DepGraph(object):
+
+    ##
+    # @param classes     {[Class]} class list
+    # @param classesAll  {{classId : Class}} all known classes
+    # @param variants    {Map} variant set
+    # @param jobconf     {Job}
+    # @param includeTransitives {Bool} whether to include load deps that a
+    #                    class inherits from its load deps
+    # @param force       {Bool} whether to re-calculate class dependencies
+    def __init__(self, classes, classesAll, variants, jobconf, includeTransitives=True, force=False):
+        self.classIds = [x.id for x in classes]
+        self.load     = {}
+        self.run      = {}
+        self.loadedBy = {}
+        self.usedBy   = {}
+        self.classPackage = {}
+
+        for clazz in classes:
+            deps, _ = clazz.getCombinedDeps(classesAll, variants, jobconf, projectClassNames=False, force=force)
+            ignored = set(x.name for x in deps['ignore'])
+            loads = deps['load']
+            if not includeTransitives:
+                # transitive load deps are requested by some other class
+                loads = [x for x in loads if x.requestor == clazz.id]
+            self._addEdges(clazz.id, loads, ignored, self.load, self.loadedBy)
+            self._addEdges(clazz.id, deps['run'], ignored, self.run, self.usedBy)
+
+
+    def _addEdges(self, classId, deps, ignored, edges, reverseEdges):
+        depIds = edges[classId] = []
+        seen = set(ignored)
+        for dep in deps:
+            if dep.name not in seen:
+                seen.add(dep.name)
+                depIds.append(dep.name)
+                reverseEdges.setdefault(dep.name, []).append(classId)
+
+
+    ##
+    # (Re-)Map the classes of the graph to <packages>, e.g. after packages have
+    # been merged
+    def mapPackages(self, packages):
+        self.classPackage = {}
+        for package in packages:
+            for clazz in package.classes:
+                self.classPackage.setdefault(clazz.id, package)
+
+
+    ##
+    # The packages the classes of <package> load-depend on, excluding itself
+    def packageDeps(self, package):
+        result = set()
+        for clazz in package.classes:
+            for depId in self.load[clazz.id]:
+                other = self.classPackage.get(depId)
+                if other is not None and other is not package:
+                    result.add(other)
+        return result
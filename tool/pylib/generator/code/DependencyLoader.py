@@ -44,7 +44,7 @@ import graph
 from misc.ExtMap                import ExtMap
 from ecmascript.frontend        import lang
 from ecmascript.transform.check import global_symbols as gs
-from generator.code.Class       import DependencyError
+from generator.code.Class       import Class, DependencyError
 from generator.code.DependencyItem  import DependencyItem
 from generator.action           import CodeMaintenance
 
@@ -59,6 +59,7 @@ class DependencyLoader(object):
         self._require = require
         self._use     = use
         self.counter  = 0
+        self._memo    = {}  # see _sharedAcrossVariants()
 
 
     def expand_hard_excludes(self, excludeWithDepsHard, script, verifyDeps=False):
@@ -130,8 +131,39 @@ class DependencyLoader(object):
 
 
 
+    ##
+    # Results of this run for class lists are shared by the variant sets that
+    # agree on the variant keys the dependencies of the listed classes depend
+    # on (see Class.combinedDepsVariantKeys()), so they are only computed
+    # again where the dependency graph differs.
+    #
+    # @param memoKey  {Tuple} identifies the computation, apart from <variants>
+    # @param compute  {Function} computes the class list for <variants>
+    #
+    def _sharedAcrossVariants(self, memoKey, variants, compute):
+        entries = self._memo.setdefault(memoKey, [])
+        for keys, projection, result in entries:
+            if Class.projectClassVariantsToCurrent(keys, variants) == projection:
+                return result[:]
+        result = compute()
+        keys = set()
+        for classId in result:
+            keys.update(self._classesObj[classId].combinedDepsVariantKeys(self._classesObj, variants, self._jobconf))
+        entries.append((keys, Class.projectClassVariantsToCurrent(keys, variants), result))
+        return result[:]
+
+
     def classlistFromInclude(self, includeWithDeps, excludeWithDeps, variants,
                              verifyDeps=False, script=None, allowBlockLoaddeps=True):
+        if len(includeWithDeps) == 0:  # all classes
+            return self._classlistFromInclude(includeWithDeps, excludeWithDeps, variants, verifyDeps, allowBlockLoaddeps)
+        memoKey = ("classlist", tuple(includeWithDeps), tuple(excludeWithDeps), verifyDeps, allowBlockLoaddeps)
+        return self._sharedAcrossVariants(memoKey, variants,
+            lambda: self._classlistFromInclude(includeWithDeps, excludeWithDeps, variants, verifyDeps, allowBlockLoaddeps))
+
+
+    def _classlistFromInclude(self, includeWithDeps, excludeWithDeps, variants,
+                              verifyDeps=False, allowBlockLoaddeps=True):
 
         def classlistFromClassRecursive(depsItem, excludeWithDeps, variants, result, warn_deps, loadDepsChain, allowBlockLoaddeps=True):
             # support blocking
@@ -362,59 +394,72 @@ class DependencyLoader(object):
 
     ##
     # Method chooser
-    def sortClasses(self, *args, **kwargs):
+    def sortClasses(self, classList, variants, buildType=""):
         #if  self._jobconf.get("dependencies/sort-topological", False):
-        return self.sortClassesRec(*args, **kwargs)
-        #return self.sortClassesTopological(*args, **kwargs)
-
+        return self._sharedAcrossVariants(("sort", tuple(classList), buildType), variants,
+            lambda: self.sortClassesIndexed(classList, variants, buildType))
+        #return self.sortClassesTopological(classList, variants, buildType)
 
-    def sortClassesRec(self, classList, variants, buildType=""):
 
-        def sortClassesRecurser(classId, classListSorted, path):
-            if classId in classListSorted:
-                return
+    ##
+    # Sorts classList so that every class comes after its load dependencies.
+    #
+    # The load dependency graph is built once, as adjacency lists of class
+    # indices, and then walked depth-first with an explicit stack, taking
+    # classes and their load deps in list order. This gives the order of the
+    # former recursive sort (which the generated output depends on), without
+    # its list lookups and recursion limit. All circular dependencies are
+    # reported before the sort fails.
+    def sortClassesIndexed(self, classList, variants, buildType=""):
+
+        # build the graph: node <n> is classIds[n]
+        classIds = []
+        index    = {}
+        for classId in classList:
+            if classId not in index:
+                index[classId] = len(classIds)
+                classIds.append(classId)
 
-            # reading dependencies
+        loadEdges = []
+        for classId in classIds:
             deps, cached = self._classesObj[classId].getCombinedDeps(self._classesObj, variants, self._jobconf)
-
             if self._console.getLevel() is "info":
                 self._console.dot("%s" % "." if cached else "*")
+            loadEdges.append([index[dep.name] for dep in deps["load"] if dep.name in index])
 
-            # path is needed for recursion detection
-            if not classId in path:
-                path.append(classId)
-
-            # process loadtime requirements
-            for dep in deps["load"]:
-                dep_name = dep.name
-                if dep_name in classList and not dep_name in classListSorted:
-                    if dep_name in path:
-                        self._console.warn("Detected circular dependency between: %s and %s" % (classId, dep_name))
-                        self._console.indent()
-                        self._console.debug("currently explored dependency path: %r" % path)
-                        self._console.outdent()
-                        raise RuntimeError("Circular class dependencies")
-                    else:
-                        sortClassesRecurser(dep_name, classListSorted, path)
-
-            if not classId in classListSorted:
-                # remove element from path
-                path.remove(classId)
-
-                # print "Add: %s" % classId
-                classListSorted.append(classId)
-
-            return
-
-        # ---------------------------------
-
-        classListSorted = []
-        path   = []
+        # depth-first walk, appending nodes after their load deps
+        NEW, ON_PATH, DONE = 0, 1, 2
+        state  = [NEW] * len(classIds)
+        result = []
+        cycles = []
+        for root in range(len(classIds)):
+            if state[root] != NEW:
+                continue
+            state[root] = ON_PATH
+            stack = [(root, 0)]  # (node, next edge to follow)
+            while stack:
+                node, edge = stack[-1]
+                edges = loadEdges[node]
+                while edge < len(edges) and state[edges[edge]] != NEW:
+                    if state[edges[edge]] == ON_PATH:
+                        path = [n for n,_ in stack]
+                        cycles.append(path[path.index(edges[edge]):] + [edges[edge]])
+                    edge += 1
+                if edge < len(edges):
+                    stack[-1] = (node, edge + 1)
+                    state[edges[edge]] = ON_PATH
+                    stack.append((edges[edge], 0))
+                else:
+                    stack.pop()
+                    state[node] = DONE
+                    result.append(classIds[node])
 
-        for classId in classList:
-            sortClassesRecurser(classId, classListSorted, path)
+        if cycles:
+            for cycle in cycles:
+                self._console.warn("Detected circular dependency: %s" % " -> ".join(classIds[n] for n in cycle))
+            raise RuntimeError("Circular class dependencies")
 
-        return classListSorted
+        return result
 
 
     def sortClassesTopological(self, classList, variants, buildType=''):
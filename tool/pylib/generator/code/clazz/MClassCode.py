@@ -27,6 +27,7 @@ from ecmascript.backend.Packer      import Packer
 from ecmascript.backend             import formatter
 from ecmascript.frontend import treeutil, tokenizer
 from ecmascript.frontend import treegenerator, lang
+from ecmascript.frontend.treecodec  import lazyCodec as treecodec
 from ecmascript.frontend.SyntaxException import SyntaxException
 from ecmascript.transform.check     import scopes, load_time, lint, jshints
 from ecmascript.transform.optimizer import variantoptimizer, variableoptimizer, commentoptimizer
@@ -35,7 +36,7 @@ from ecmascript.transform.optimizer import featureoptimizer
 from ecmascript.transform.optimizer import globalsoptimizer
 from generator import Context
 from generator.action               import CodeMaintenance
-from misc import util, filetool
+from misc import util, filetool, securehash as sha
 
 
 class MClassCode(object):
@@ -56,11 +57,11 @@ class MClassCode(object):
         cache = self.context['cache']
         console = self.context['console']
         tradeSpaceForSpeed = False  # Caution: setting this to True seems to make builds slower, at least on some platforms!?
-        cacheId = "tree%s-%s-%s" % (treegen.tag, self.path, util.toString({}))
+        cacheId = self._plainTreeCacheId(treegen)
         self.treeId = cacheId
 
         # Lookup for unoptimized tree
-        tree, _ = cache.read(cacheId, self.path, memory=tradeSpaceForSpeed)
+        tree, _ = cache.read(cacheId, self.cacheDependsOn(), memory=tradeSpaceForSpeed, shared=True, codec=treecodec)
 
         # Tree still undefined?, create it!
         if tree == None or force:
@@ -71,7 +72,7 @@ class MClassCode(object):
             fileContent = filetool.read(self.path, self.encoding)
             fileId = self.path if self.path else self.id
             try:
-                tokens = tokenizer.Tokenizer().parseStream(fileContent, self.id)
+                tokens = tokenizer.FastTokenizer().parseStream(fileContent, self.id)
             except SyntaxException, e:
                 # add file info
                 e.args = (e.args[0] + "\nFile: %s" % fileId,) + e.args[1:]
@@ -93,29 +94,33 @@ class MClassCode(object):
                 e.args = (e.args[0] + "\nFile: %s" % fileId,) + e.args[1:]
                 raise
 
-            # Annotate with scopes
-            if True:
-                tree = scopes.create_scopes(tree)  # checks for suitable treegenerator_tag
-                #tree.scope.prrnt()
-                #print self.id, " (globals):", [c for s in tree.scope.scope_iterator() for c in s.globals()]
-
-            # Annotate scopes with load time information
-            if True:
-                if hasattr(tree,'scope') and tree.scope:
-                    load_time.load_time_check(tree.scope)
-
-            # Annotate with jsdoc hints
-            if True:
-                tree = jshints.create_hints_tree(tree)
+            # Annotate with scopes, scopes with load time information, and
+            # with jsdoc hints - in a single traversal of the tree
+            passes = [load_time.LoadTimePass(), jshints.CreateHintsVisitor(tree)]
+            tree = scopes.create_scopes(tree, passes)  # checks for suitable treegenerator_tag
+            #tree.scope.prrnt()
+            #print self.id, " (globals):", [c for s in tree.scope.scope_iterator() for c in s.globals()]
 
             # Store unoptimized tree
-            cache.write(cacheId, tree, memory=tradeSpaceForSpeed)
+            cache.write(cacheId, tree, memory=tradeSpaceForSpeed, shared=True, codec=treecodec)
 
             console.outdent()
 
         return tree
 
 
+    ##
+    # Whether the unoptimized tree of this class is in the cache and up to date
+    # (so tree() would not have to parse)
+    #
+    def treeIsCached(self, treegen=treegenerator):
+        return self.context['cache'].isFresh(self._plainTreeCacheId(treegen), self.cacheDependsOn(), shared=True)
+
+
+    def _plainTreeCacheId(self, treegen=treegenerator):
+        return "tree%s-%s-%s" % (treegen.tag, self.cacheKey(), util.toString({}))
+
+
     ##
     # Raises in case of inconsistencies, otherwise returns None
     #
@@ -158,6 +163,9 @@ class MClassCode(object):
     #
     def classVariants(self, generate=True):
 
+        if 'svariants' in self._runMemo:
+            return self._runMemo['svariants']
+
         classinfo, _ = self._getClassCache()
         classvariants = None
         if not classinfo or 'svariants' not in classinfo:  # 'svariants' = supported variants
@@ -171,6 +179,8 @@ class MClassCode(object):
         else:
             classvariants = classinfo['svariants']
 
+        if classvariants is not None:
+            self._runMemo['svariants'] = classvariants
         return classvariants
 
     ##
@@ -238,22 +248,36 @@ class MClassCode(object):
             optimize  = compOptions.optimize
             variants  = compOptions.variantset
             format_   = compOptions.format
-            classVariants     = self.classVariants()
-            # relevantVariants is the intersection between the variant set of this job
-            # and the variant keys actually used in the class
-            relevantVariants  = self.projectClassVariantsToCurrent(classVariants, variants)
-            variantsId        = util.toString(relevantVariants)
-            optimizeId        = self._optimizeId(optimize)
-            cache             = self.context["cache"]
+            cache     = self.context["cache"]
 
-            cacheId = "compiled-%s-%s-%s-%s" % (self.path, variantsId, optimizeId, format_)
-            compiled, _ = cache.read(cacheId, self.path)
+            cacheId = self._compiledCacheId(compOptions)
+            compiled, _ = cache.read(cacheId, self.cacheDependsOn(), shared=self.cacheShared(compOptions.optimize))
 
             if compiled == None:
-                tree = self.optimize(None, optimize, variants, featuremap)
+                tree = self.optimize(None, optimize, variants, featuremap, compOptions.privateMap)
                 compiled = self.serializeTree(tree, optimize, format_)
                 if not "statics" in optimize:
-                    cache.write(cacheId, compiled)
+                    cache.write(cacheId, compiled, shared=self.cacheShared(optimize))
+
+        return compiled
+
+    ##
+    # Compiled code from <tree>, a tree of this class that has been through
+    # the "statics" optimization already (see CodeGenerator.optimizeDeadCode()),
+    # by applying the other optimizations of <compOptions> to it (in place).
+    # As the resulting code only depends on the features left in the tree, it
+    # is cached by them.
+    def getStaticsCode(self, tree, compOptions):
+        cache    = self.context["cache"]
+        optimize = compOptions.optimize
+        cacheId  = self._compiledCacheId(compOptions, tree)
+        compiled, _ = cache.read(cacheId, self.cacheDependsOn(), shared=self.cacheShared(optimize))
+
+        if compiled == None:
+            rest_optimize = [x for x in optimize if x not in ("statics", "variants")]
+            tree = self.optimize(tree, rest_optimize, privatesMap=compOptions.privateMap)
+            compiled = self.serializeTree(tree, rest_optimize, compOptions.format)
+            cache.write(cacheId, compiled, shared=self.cacheShared(optimize))
 
         return compiled
 
@@ -289,9 +313,15 @@ class MClassCode(object):
     ##
     # Optimize class tree.
     #
-    def optimize(self, p_tree=None, p_optimize=[], variantSet={}, featureMap={}):
+    # @param privatesMap {Map} if given, replacements for privates are taken
+    #   from this map instead of the site-wide privates db in the cache (which
+    #   is then neither read nor written)
+    #
+    def optimize(self, p_tree=None, p_optimize=[], variantSet={}, featureMap={}, privatesMap=None):
 
         def load_privates():
+            if privatesMap is not None:
+                return privatesMap
             cacheId = privateoptimizer.privatesCacheId
             privates, _ = cache.read(cacheId, keepLock=True)
             if privates == None:
@@ -299,6 +329,8 @@ class MClassCode(object):
             return privates
 
         def write_privates(globalprivs):
+            if privatesMap is not None:
+                return
             cacheId  = privateoptimizer.privatesCacheId
             cache.write(cacheId, globalprivs)  # removes lock by default
 
@@ -313,13 +345,6 @@ class MClassCode(object):
             cacheId  = featureoptimizer.cacheId
             cache.write(cacheId, globalfeatures)  # removes lock by default
 
-        def getTreeCacheId(optimize=[], variantSet={}):
-            classVariants = self.classVariants()
-            relevantVariants = self.projectClassVariantsToCurrent(classVariants, variantSet)
-            return "tree%s-%s-%s-%s" % (
-                treegenerator.tag, # TODO: hard-coded treegen.tag
-                self.path, self._optimizeId(optimize), util.toString(relevantVariants))
-
         def optimizeTree(tree):
 
             if "comments" in optimize:
@@ -347,9 +372,9 @@ class MClassCode(object):
                 basecalloptimizer.patch(tree)
 
             if "privates" in optimize:
-                privatesMap = load_privates()
-                privateoptimizer.patch(tree, id, privatesMap)
-                write_privates(privatesMap)
+                privates = load_privates()
+                privateoptimizer.patch(tree, id, privates)
+                write_privates(privates)
 
             if "globals" in optimize:
                 tree = globalsoptimizer.process(tree) # need to re-assign as this optimizer might change the root node
@@ -369,7 +394,7 @@ class MClassCode(object):
             # see if we have a "variants" optimized tree already (e.g. from calculating the class list)
             if "variants" in optimize:
                 # this is a very simple form of optimizations projection
-                result, _ = cache.read(getTreeCacheId(["variants"], variantSet), self.path)
+                result, _ = cache.read(self._treeCacheId(["variants"], variantSet), self.cacheDependsOn(), shared=True, codec=treecodec)
                 if result is None:
                     result = self.tree()
                 else:
@@ -390,14 +415,14 @@ class MClassCode(object):
 
         # else we're working on the class tree, and can cache
         else:
-            cacheId = getTreeCacheId(optimize, variantSet)
-            result, modtime = cache.read(cacheId, self.path)
+            cacheId = self._treeCacheId(optimize, variantSet)
+            result, modtime = cache.read(cacheId, self.cacheDependsOn(), shared=self.cacheShared(optimize), codec=treecodec)
 
             if result == None:
                 result = getBestMatchingTree()
                 result = optimizeTree(result)
                 if not "statics" in optimize:  # can't cache static optimized trees
-                    cache.write(cacheId, result)
+                    cache.write(cacheId, result, shared=self.cacheShared(optimize), codec=treecodec)
 
         return result
 
@@ -411,10 +436,86 @@ class MClassCode(object):
         return "[%s]" % ("-".join(optimize))
 
 
+    ##
+    # Cache id of an optimized tree of this class
+    #
+    def _treeCacheId(self, optimize=[], variantSet={}):
+        classVariants = self.classVariants()
+        relevantVariants = self.projectClassVariantsToCurrent(classVariants, variantSet)
+        return "tree%s-%s-%s-%s" % (
+            treegenerator.tag, # TODO: hard-coded treegen.tag
+            self.cacheKey(), self._optimizeId(optimize), util.toString(relevantVariants))
+
+
+    ##
+    # Cache id of the compiled code of this class
+    #
+    # @param statics_tree {Node} with the "statics" optimization, the tree the
+    #   code is compiled from (see getStaticsCode()); the features left in it
+    #   go into the id
+    #
+    def _compiledCacheId(self, compOptions, statics_tree=None):
+        classVariants     = self.classVariants()
+        # relevantVariants is the intersection between the variant set of this job
+        # and the variant keys actually used in the class
+        relevantVariants  = self.projectClassVariantsToCurrent(classVariants, compOptions.variantset)
+        variantsId        = util.toString(relevantVariants)
+        optimizeId        = self._optimizeId(compOptions.optimize)
+        cacheId = "compiled-%s-%s-%s-%s" % (self.cacheKey(), variantsId, optimizeId, compOptions.format)
+        if statics_tree is not None:
+            cacheId += "-" + self._featuresId(statics_tree)
+        return cacheId
+
+
+    ##
+    # Digest of the features (statics and members) in a class tree
+    #
+    def _featuresId(self, tree):
+        features = []
+        qxDefine = treeutil.findQxDefine(tree)
+        if qxDefine:
+            classMap = treeutil.getClassMap(qxDefine)
+            for section in ("statics", "members"):
+                if section in classMap:
+                    features.extend("%s:%s" % (section, key) for key in sorted(classMap[section]))
+        return sha.getHash(",".join(features))[:12]
+
+
+    ##
+    # Return the keys a "privates" optimization of this class would allocate
+    # in the privates db, in allocation order (see privateoptimizer.collect()).
+    # Returns an empty list if the optimization would not run, as the compiled
+    # code or the optimized tree is already cached. This allows to allocate
+    # privates up-front and in class list order, when classes are compiled in
+    # parallel.
+    #
+    # @param p_tree {Node} tree to inspect instead of the class tree (like
+    #   for optimize()); it is modified in place
+    #
+    def collectPrivates(self, compOptions, featuremap={}, p_tree=None):
+        optimize = compOptions.optimize
+        if "privates" not in optimize:
+            return []
+        before_privates = [x for x in optimize if x in ("comments", "variants", "statics", "basecalls")]
+        cache = self.context['cache']
+        if p_tree:
+            if "statics" in optimize:  # p_tree went through "statics" and "variants" already, see getStaticsCode()
+                if cache.read(self._compiledCacheId(compOptions, p_tree), self.cacheDependsOn())[0] is not None:
+                    return []
+                before_privates = [x for x in before_privates if x not in ("statics", "variants")]
+            tree = self.optimize(p_tree, before_privates)
+        else:
+            if cache.read(self._compiledCacheId(compOptions), self.cacheDependsOn())[0] is not None:
+                return []
+            if cache.isFresh(self._treeCacheId(optimize, compOptions.variantset), self.cacheDependsOn()):
+                return []
+            tree = self.optimize(None, before_privates, compOptions.variantset, featuremap)
+        return privateoptimizer.collect(id, tree)  # optimize() passes the same id to privateoptimizer.patch()
+
+
 
     ##
     # Convenience method for length of compiled class
-    # (Might become necessary if I want to cache the length).
     def getCompiledSize(self, compOptions, treegen=treegenerator, featuremap={}):
         code = self.getCode(compOptions, treegen, featuremap)
         return len(code)
@@ -52,6 +52,14 @@ class MClassDependencies(object):
     # as source code, and transitive load deps)
 
     def dependencies(self, variantSet, force=False, tree=None):
+        deps, cached, _ = self._dependencies(variantSet, force, tree)
+        return deps, cached
+
+
+    ##
+    # dependencies(), plus the variant keys the result depends on (those of
+    # this class and of the classes searched for transitive load deps)
+    def _dependencies(self, variantSet, force=False, tree=None):
 
         ##
         # Get deps from meta info and class code, and sort them into
@@ -134,9 +142,16 @@ class MClassDependencies(object):
         ##
         # Check wether load dependencies are fresh which are included following
         # a depsItem.needsRecursion of the current class
-        def transitiveDepsAreFresh(depsStruct, cacheModTime):
+        def transitiveDepsAreFresh(depsStruct, cacheModTime, depDigests=None):
             result = True
-            if cacheModTime is None:  # TODO: this can currently only occur with a Cache.memcache result
+            if depDigests is not None:  # 'content' invalidation
+                for depName, digest in depDigests.items():
+                    if (depName not in ClassesAll
+                        or cache.contentDigest(ClassesAll[depName].path) != digest):
+                        console.debug("Invalidating dep cache for %s, as %s has changed" % (self.id, depName))
+                        result = False
+                        break
+            elif cacheModTime is None:  # TODO: this can currently only occur with a Cache.memcache result
                 result = False
             else:
                 for dep in depsStruct["load"]:
@@ -159,21 +174,67 @@ class MClassDependencies(object):
 
             return result
 
+        ##
+        # Content digests of the classes included through recursion, for
+        # transitiveDepsAreFresh() with 'content' invalidation
+        def transitiveDepDigests(depsStruct):
+            if cache.invalidation != "content":
+                return None
+            depDigests = {}
+            for dep in depsStruct["load"]:
+                if dep.requestor != self.id and dep.name in ClassesAll:
+                    depDigests[dep.name] = cache.contentDigest(ClassesAll[dep.name].path)
+            return depDigests
+
+        ##
+        # Variant keys the transitive load dependencies in <depsStruct> depend
+        # on: those of the classes that have been searched by recursion, as
+        # their (variant-optimized) code determines what is found
+        def transitiveVariantKeys(shallowLoad, depsStruct):
+            keys = set()
+            if any(dep.needsRecursion for dep in shallowLoad):
+                for dep in depsStruct["load"]:
+                    if dep.name in ClassesAll:
+                        keys.update(ClassesAll[dep.name].classVariants())
+            return sorted(keys)
+
+        ##
+        # The entries cached under <cacheId>; anything else (like the
+        # (deps, time) of earlier tool versions, which might come from a
+        # cache that was not cleared, or from a shared cache) is a miss
+        def cachedEntries():
+            entries = classInfo.get(cacheId)
+            if (isinstance(entries, list)
+                and all(isinstance(x, tuple) and len(x) == 5 for x in entries)):
+                return entries
+            return []
+
+        ##
+        # Find the cache entry computed with the same values for the variant
+        # keys it depends on as <variantSet>
+        def findCached(entries):
+            for keys, variants, deps, cacheModTime, depDigests in entries:
+                if self.projectClassVariantsToCurrent(keys, variantSet) == variants:
+                    return deps, cacheModTime, depDigests, keys
+            return None, None, None, []
+
         # -- Main ---------------------------------------------------------
 
         # handles cache and invokes worker function
 
         console = self.context['console']
+        cache   = self.context['cache']
 
         classVariants = self.classVariants()
         relevantVariants = self.projectClassVariantsToCurrent(classVariants, variantSet)
         statics_optim = 'statics' in Context.jobconf.get("compile-options/code/optimize",[])
-        cacheId = "deps-%s-%s-%s" % (self.path, util.toString(relevantVariants), int(statics_optim))
+        cacheId = "deps-%s-%s-%s" % (self.cacheKey(), util.toString(relevantVariants), int(statics_optim))
         cached = True
 
-        # try compile cache
+        # try compile cache; entries are per class variants, and within those
+        # per variants of the transitive load deps
         classInfo, classInfoMTime = self._getClassCache()
-        (deps, cacheModTime) =  classInfo[cacheId] if cacheId in classInfo else (None,None)
+        (deps, cacheModTime, depDigests, keys) = findCached(cachedEntries())
 
         # try dependencies.json
         if (True  # just a switch
@@ -190,17 +251,23 @@ class MClassDependencies(object):
 
         if (deps == None
           or force == True
-          or not transitiveDepsAreFresh(deps, cacheModTime)):
+          or not transitiveDepsAreFresh(deps, cacheModTime, depDigests)):
             cached = False
             deps = buildShallowDeps(tree)
+            shallowLoad = deps["load"]
             deps = buildTransitiveDeps(deps)
+            keys = transitiveVariantKeys(shallowLoad, deps)
             if not tree: # don't cache for a passed-in tree
-                classInfo[cacheId] = (deps, time.time())
+                variants = self.projectClassVariantsToCurrent(keys, variantSet)
+                entries = [x for x in cachedEntries()
+                           if self.projectClassVariantsToCurrent(x[0], variantSet) != x[1]]
+                entries.append((keys, variants, deps, time.time(), transitiveDepDigests(deps)))
+                classInfo[cacheId] = entries
                 self._writeClassCache(classInfo)
 
-        return deps, cached
+        return deps, cached, sorted(set(classVariants).union(keys))
 
-        # end:dependencies()
+        # end:_dependencies()
 
 
     def getCombinedDeps(self, classesAll_, variants, config, stripSelfReferences=True, projectClassNames=True, force=False, tree=None):
@@ -208,11 +275,21 @@ class MClassDependencies(object):
         # init lists
         global ClassesAll
         ClassesAll = classesAll_  # TODO: this is a quick hack, to not have to pass classesAll_ around as param
+
+        # the results of this run are shared by all variant sets that agree
+        # on the variant keys the deps depend on
+        memoize = not force and tree is None
+        if memoize:
+            memo = self._runMemo.setdefault((stripSelfReferences, projectClassNames), [])
+            for keys, projection, deps in memo:
+                if self.projectClassVariantsToCurrent(keys, variants) == projection:
+                    return dict(deps), True
+
         loadFinal = []
         runFinal  = []
 
         # add static dependencies
-        static, cached = self.dependencies (variants, force, tree=tree)
+        static, cached, keys = self._dependencies(variants, force, tree=tree)
 
         loadFinal.extend(static["load"])
         runFinal.extend(static["run"])
@@ -254,7 +331,18 @@ class MClassDependencies(object):
             "ignore" : static['ignore'],
         }
 
-        return deps, cached
+        if memoize:
+            memo.append((keys, self.projectClassVariantsToCurrent(keys, variants), deps))
+        return dict(deps), cached
+
+
+    ##
+    # The variant keys the result of getCombinedDeps() depends on
+    def combinedDepsVariantKeys(self, classesAll_, variants, config):
+        self.getCombinedDeps(classesAll_, variants, config)
+        for keys, projection, _ in self._runMemo[(True, True)]:
+            if self.projectClassVariantsToCurrent(keys, variants) == projection:
+                return keys
 
 
     # ----------------------------------------------------------------------------------
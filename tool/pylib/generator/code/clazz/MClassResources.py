@@ -24,7 +24,7 @@
 
 import sys, os, types, re, string, copy
 from generator.resource.AssetHint   import AssetHint
-from generator.resource.CombinedImage    import CombinedImage
+from generator.resource.ResourceIndex    import ResourceIndex
 from generator import Context
 from misc import util
 from misc.securehash import sha_construct
@@ -107,36 +107,23 @@ class MClassResources(object):
     # classes' .resources member to hold suitable resources from the Libs.
     @staticmethod
     def mapResourcesToClasses(libs, classes, assetMacros={}):
-        
-        # Resource list
-        resources = []
-        for libObj in libs:
-            resources.extend(libObj.getResources()) # weightedness of same res id through order of script.libraries
-        # remove unwanted files
-        exclpatt = re.compile("\.(?:meta|py)$", re.I)
-        resources = [res for res in resources if not exclpatt.search(res.id)]
-        
-        # Asset pattern list  -- this is basically an optimization, to condense
-        # asset patterns
+
+        # only the resources under the literal prefix of an asset hint are
+        # matched against it
+        index = ResourceIndex.forLibraries(libs)
+
         #assetMacros = self._genobj._job.get('asset-let',{})
         assetHints  = []
         for clazz in classes:
-            assetHints.extend(clazz.getAssets(assetMacros))
+            classHints = clazz.getAssets(assetMacros)
+            assetHints.extend(classHints)
             clazz.resources = set() #TODO: they might be filled by previous jobs, with different libs
-
-        # Go through resources and asset patterns
-        for res in resources:
-            for hint in assetHints:
-                # add direct matches
-                if hint.regex.match(res.id):
+            matched, seen = index.match(classHints)
+            for i in matched:  # in resource order, so the first of the same id wins
+                clazz.resources.add(index.resources[i])
+            for hint, hintSeen in zip(classHints, seen):
+                if hintSeen:
                     hint.seen = True
-                    hint.clazz.resources.add(res)
-                # add matches of embedded images
-                if isinstance(res, CombinedImage):
-                    for embed in res.embeds:
-                        if hint.regex.match(embed.id):
-                            hint.seen = True
-                            hint.clazz.resources.add(res)
 
         # Now that the resource mapping is done, check if we have unfullfilled hints
         for hint in assetHints:
@@ -49,6 +49,11 @@ Arguments:
         self.add_option("-m", "--macro", dest="letmacros", metavar="KEY:VAL", action="map", type="string", default={}, help="define/overwrite a global 'let' macro KEY with value VAL")
         self.add_option("-I", "--no-progress-indicator", dest="show_progress_indicator", action="store_false", default=True, help="suppress animated progress indication")
 
+        # Daemon mode
+        self.add_option("--daemon", action="store_true", dest="daemon", default=False, help="run as a daemon for the configuration file, which later invocations forward their jobs to")
+        self.add_option("--daemon-stop", action="store_true", dest="daemon_stop", default=False, help="stop the daemon for the configuration file")
+        self.add_option("--no-daemon", action="store_true", dest="no_daemon", default=False, help="run jobs in this process, even if a daemon is running")
+
         # Grunt compat
         self.add_option("--list-jobs", action="store_true", dest="listjobs", default=False, help=optparse.SUPPRESS_HELP)
 
@@ -38,6 +38,7 @@ from ecmascript.backend         import formatter_3
 from ecmascript.backend.Packer  import Packer
 from ecmascript.transform.optimizer    import privateoptimizer
 #from ecmascript.transform.optimizer    import globalsoptimizer
+from generator.runtime          import WorkerPool
 from misc                       import filetool, json, Path, securehash as sha, util
 from misc.util                  import pipeline, bind
 from misc.ExtMap                import ExtMap
@@ -632,36 +633,120 @@ class CodeGenerator(object):
                     )
 
 
-        def compileClasses(classList, compConf, log_progress=lambda:None):
-            result = []
+        ##
+        # Compile the classes of <classList> and write their code to <out>,
+        # one class at a time
+        def compileClasses(classList, compConf, out, log_progress=lambda:None):
             # warn qx.allowUrlSettings - variants optim. conflict (bug#6141)
             if "variants" in compConf.optimize:
                 warn_if_qxAllowUrlSettings(self._job, compConf)
             # do "statics" optimization out of line
             if "statics" in compConf.optimize:
-                tmp_optimize = compConf.optimize[:]
                 #classList = optimizeDeadCode(classList, script._featureMap, compConf, treegen=treegenerator, log_progress=log_progress)
-                tmp_optimize.remove("statics")
-                if "variants" in tmp_optimize:
-                    tmp_optimize.remove("variants") # has been done in optimizeDeadCode
-                # do the rest
+                # do the rest on the trees from optimizeDeadCode
                 for clazz in classList:
-                    tree = clazz.optimize(clazz._tmp_tree, tmp_optimize)
-                    code = clazz.serializeTree(tree, tmp_optimize, compConf.format)
-                    result.append(code)
+                    code = precompiled.pop(clazz.id, None)
+                    if code is None:
+                        code = clazz.getStaticsCode(clazz._tmp_tree, compConf)
+                    out.write(code)
                     log_progress()
-                result = u''.join(result)
 
             # no 'statics' optimization
             else:
                 for clazz in classList:
-                    code = clazz.getCode(compConf, treegen=treegenerator, featuremap=script._featureMap) # choose parser frontend
-                    result.append(code)
+                    code = precompiled.pop(clazz.id, None)
+                    if code is None:
+                        code = clazz.getCode(compConf, treegen=treegenerator, featuremap=script._featureMap) # choose parser frontend
+                    out.write(code)
                     log_progress()
-                result =  u''.join(result)
 
-            return result
 
+        ##
+        # Compile the classes of all packages in worker processes
+        # (compile-options/code/workers), for compileClasses() to pick up.
+        # Replacements for privates are allocated up-front and in class list
+        # order, so the output is identical to that of serial compilation.
+        def precompileClassesIf(script, compConf, packages):
+            workers = WorkerPool.workerCount(compConf.get("code/workers", 1))
+            optimize = compConf.get("code/optimize", [])
+            sourceFilter = ClassMatchList(compConf.get("code/except", []))
+            classes = [c for p in packages for c in p.classes if not sourceFilter.match(c.id)]
+            if workers < 2 or len(classes) < 2 or not optimize:
+                return {}
+
+            compOptions = CompileOptions(optimize, script.variants, compConf.get("code/format", False))
+            taskData = {
+                'classes'     : dict((c.id, c) for c in classes),
+                'compOptions' : compOptions,
+                'featureMap'  : script._featureMap,
+                'statics'     : "statics" in optimize,  # see compileClasses()
+            }
+            classIds = [c.id for c in classes]
+
+            if "privates" in optimize:
+                classPrivates = WorkerPool.map(_collectPrivatesTask, classIds, workers, log_progress, taskData)
+                privates, _ = self._cache.read(privateoptimizer.privatesCacheId, keepLock=True)
+                if privates is None:
+                    privates = {}
+                for keys in classPrivates:
+                    privateoptimizer.merge(keys, privates)
+                self._cache.write(privateoptimizer.privatesCacheId, privates)  # removes lock
+                compOptions.privateMap = privates
+
+            codes = WorkerPool.map(_compileTask, classIds, workers, log_progress, taskData)
+            return dict(zip(classIds, codes))
+
+
+        ##
+        # Incremental builds (compile-options/code/incremental): a package is
+        # only compiled and written again if its signature (see
+        # packageSignature()) differs from that of the last run, or its files
+        # are gone. If the package structure has changed, all packages are
+        # built. Not with the 'statics' optimization, as it works on the
+        # whole class list.
+        #
+        # Returns the map of packages to reuse {package.id : state entry}.
+        def incrementalReuse(script, compConf, packages, state):
+            if not state or state.get('structure') != packageStructure(script, packages):
+                return {}
+            reuse = {}
+            for package in packages:
+                entry = state['packages'].get(package.id)
+                if (entry and entry['signature'] == packageSignature(script, compConf, package)
+                    and all(os.path.isfile(f) for f in entry['outfiles'])):
+                    reuse[package.id] = entry
+            return reuse
+
+        def incrementalStateId(script):
+            return "incremental-%s-%s" % (script.baseScriptPath, util.toString(script.variants))
+
+        def packageStructure(script, packages):
+            return [bootPackageId(script)] + [(p.id, [c.id for c in p.classes]) for p in packages]
+
+        ##
+        # Digest over everything that goes into the files of a package
+        def packageSignature(script, compConf, package):
+            sig = [
+                json.dumpsCode([compConf.get("code"), compConf.get("paths"), util.toString(script.variants)]),
+                getFilePrefix(compConf), getPackageData(package),
+            ]
+            for clazz in package.classes:
+                sig.append("%s:%s" % (clazz.id, self._cache.contentDigest(clazz.path)))
+            return sha.getHash(u"\n".join(sig).encode('utf-8'))
+
+        def writeIncrementalState(script, compConf, packages):
+            state = {
+                'structure' : packageStructure(script, packages),
+                'packages'  : {},
+            }
+            for package in packages:
+                state['packages'][package.id] = {
+                    'signature'  : packageSignature(script, compConf, package),
+                    'files'      : package.files,
+                    'outfiles'   : package.outfiles,
+                    'has_source' : package.has_source,
+                }
+            self._cache.write(incrementalStateId(script), state)
 
         ##
         # helper log function, to log progress here, but also in compileClasses()
@@ -676,14 +761,23 @@ class CodeGenerator(object):
         # Return the list of constructed URIs.
         def compileAndWritePackage(package, compConf, allClassVariants, per_file_prefix):
 
-            def compileAndAdd(compiled_classes, package_uris, prelude='', wrap=''):
-                compiled = compileClasses(compiled_classes, compOptions, log_progress)
-                if wrap:
-                    compiled = wrap % compiled
-                if prelude:
-                    compiled = prelude + compiled
-                filename = self._computeFilePath(script, sha.getHash(compiled)[:12])
-                self.writePackage(compiled, filename, script)
+            ##
+            # Stream <prelude>, the compiled classes and pot. the <wrap> = (head,
+            # tail) around them into a file named by the hash of its content.
+            def compileAndAdd(compiled_classes, package_uris, prelude='', wrap=('','')):
+                outdir = os.path.dirname(self._computeFilePath(script))  # the hash only goes into the file name
+                out = filetool.HashedFile(outdir, script.scriptCompress)
+                try:
+                    out.write(prelude + wrap[0])
+                    compileClasses(compiled_classes, compOptions, out, log_progress)
+                    out.write(wrap[1])
+                except:
+                    out.discard()
+                    raise
+                filename = self._computeFilePath(script, out.hexdigest()[:12])
+                console.debug("Writing script file %s" % filename)
+                out.close(filename)
+                package.outfiles.append(filename)
                 filename = OsPath(os.path.basename(filename))
                 shortUri = Uri(filename.toUri())
                 entry = "%s:%s" % ("__out__", shortUri.encodedValue())
@@ -728,9 +822,9 @@ class CodeGenerator(object):
                 # finally, treat remaining to be concat'ed classes
                 else:
                     if compiled_classes:
-                        closureWrap = ''
+                        closureWrap = ('', '')
                         if isClosurePackage(package, bootPackageId(script)):
-                            closureWrap = u'''qx.Part.$$notifyLoad("%s", function() {\n%%s\n});''' % package.id
+                            closureWrap = (u'''qx.Part.$$notifyLoad("%s", function() {\n''' % package.id, u'''\n});''')
                         if per_file_prefix:
                             package_data = per_file_prefix + package_data
                         package_uris = compileAndAdd(compiled_classes, package_uris, package_data, closureWrap)
@@ -753,6 +847,7 @@ class CodeGenerator(object):
 
             ##
             # Here's the meat
+            package.outfiles = []
             package.files = write_uris(package_data, package_classes, per_file_prefix)
 
             return package
@@ -817,11 +912,30 @@ class CodeGenerator(object):
 
         doStaticsOptimizationIf(script, compConf, packages) # do "statics" optimization out of line (needs script.classes)
 
+        incremental = compConf.get("code/incremental", False) and "statics" not in compConf.get("code/optimize", [])
+        reuse = {}
+        if incremental:
+            state, _ = self._cache.read(incrementalStateId(script))
+            reuse = incrementalReuse(script, compConf, packages, state)
+            self._console.debug("Reusing %d of %d packages from the last run" % (len(reuse), len(packages)))
+        buildPackages = [p for p in packages if p.id not in reuse]
+
+        precompiled = precompileClassesIf(script, compConf, buildPackages) # pot. compile classes in parallel
+
         # write packages to disk
         for packageIndex, package in enumerate(packages):
-            package = compileAndWritePackage(package, compConf, allClassVariants, per_file_prefix)
+            if package.id in reuse:
+                entry = reuse[package.id]
+                package.files      = entry['files']
+                package.outfiles   = entry['outfiles']
+                package.has_source = entry['has_source']
+            else:
+                package = compileAndWritePackage(package, compConf, allClassVariants, per_file_prefix)
         self._console.dotclear()
 
+        if incremental:
+            writeIncrementalState(script, compConf, packages)
+
         writeLoader(script, compConf, packages, globalCodes, per_file_prefix)
         self._console.outdent()
 
@@ -1264,6 +1378,29 @@ class CodeGenerator(object):
 
 
 
+##
+# WorkerPool tasks for CodeGenerator.runCompiled(); classes and compile
+# options are passed through WorkerPool.shared
+
+def _collectPrivatesTask(classId):
+    shared = WorkerPool.shared
+    clazz = shared['classes'][classId]
+    if shared['statics']:
+        return clazz.collectPrivates(shared['compOptions'], p_tree=clazz._tmp_tree)
+    else:
+        return clazz.collectPrivates(shared['compOptions'], shared['featureMap'])
+
+
+def _compileTask(classId):
+    shared = WorkerPool.shared
+    clazz = shared['classes'][classId]
+    compOptions = shared['compOptions']
+    if shared['statics']:
+        return clazz.getStaticsCode(clazz._tmp_tree, compOptions)
+    else:
+        return clazz.getCode(compOptions, treegen=treegenerator, featuremap=shared['featureMap'])
+
+
 # Helper class for string.Template, to overwrite the placeholder introducing delimiter
 class MyTemplate(string.Template):
     delimiter = "%"
@@ -163,6 +163,8 @@ class PartBuilder(object):
                         handleError("Package '%d' supposed to be in part '%s', but isn't" % (package.id, part.name))
         self._console.outdent()
 
+        depGraph = script.depGraph()
+
         self._console.debug("Verifying individual parts...")
         #self._console.indent()
         for part in partsMap.values():
@@ -179,9 +181,12 @@ class PartBuilder(object):
                     classList.append(classId)
                     classPackage.append((package.id,pos))
             allpartsclasses.extend(classList)
+            classIndex = {}  # {classId : first index in classList}
+            for idx, classId in enumerate(classList):
+                classIndex.setdefault(classId, idx)
             # 1) Check the initial part defining classes are included (trivial sanity)
             for classId in part.initial_deps:
-                if classId not in classList:
+                if classId not in classIndex:
                     handleError("Defining class not included in part: '%s'" % (classId,))
 
             # 2) Check individual class deps are fullfilled in part
@@ -191,20 +196,16 @@ class PartBuilder(object):
             for packageIdx, package in enumerate(part.packages):
                 for clazz in package.classes:
                     classIdx   += 1
-                    classDeps, _ = clazz.getCombinedDeps(script.classesAll, script.variants, script.jobconfig)
-                    loadDeps = set(x.name for x in classDeps['load'])
-                    ignoreDeps = set(x.name for x in classDeps['ignore'])
                     # we cannot enforce runDeps here, as e.g. the 'boot'
                     # part necessarily lacks classes from subsequent parts
                     # (that's the whole point of parts)
-                    for depsId in loadDeps.difference(ignoreDeps):
-                        try:
-                            depsIdx = classList.index(depsId)
-                        except ValueError:
+                    for depsId in depGraph.load[clazz.id]:
+                        depsIdx = classIndex.get(depsId)
+                        if depsIdx is None:
                             handleError("Unfullfilled dependency of class '%s'[%d,%d]: '%s'" %
                                (clazz.id, package.id, classIdx, depsId))
                             continue
-                        if depsId in loadDeps and classIdx < depsIdx:
+                        if classIdx < depsIdx:
                             handleError("Load-dep loaded after using class ('%s'[%d,%d]):  '%s'[%d,%d]" %
                                (clazz.id, package.id, classIdx,
                                 depsId, classPackage[depsIdx][0], classPackage[depsIdx][1]))
@@ -256,7 +257,7 @@ class PartBuilder(object):
     def _getPartDeps(self, script, smartExclude):
         parts = script.parts
         variants = script.variants
-        globalClassList = [x.id for x in script.classesObj]
+        globalClassList = set(x.id for x in script.classesObj)
 
         self._console.debug("")
         self._console.info("Assembling parts")
@@ -353,19 +354,10 @@ class PartBuilder(object):
                     part.packages.append(package)
 
         # Register dependencies between packages
+        depGraph = script.depGraph()
+        depGraph.mapPackages(packages)
         for package in packages:
-            # get all direct (load)deps of this package
-            allDeps = set(())
-            for clazz in package.classes:
-                classDeps, _ = clazz.getCombinedDeps(script.classesAll, script.variants, script.jobconfig)
-                loadDeps = set(x.name for x in classDeps['load'])
-                allDeps.update(loadDeps)
-
-            # record the other packages in which these classes are contained
-            for classId in allDeps:
-                for otherpackage in packages:
-                    if otherpackage != package and classId in (x.id for x in otherpackage.classes):
-                        package.packageDeps.add(otherpackage)
+            package.packageDeps.update(depGraph.packageDeps(package))
 
         self._console.outdent()
         return packages
@@ -375,7 +367,8 @@ class PartBuilder(object):
         packageSize = 0
         compOptions = CompileOptions()
         compOptions.optimize = script.optimize
-        compOptions.format = True
+        # compile like the build does, to share the compiled code in the cache
+        compOptions.format = script.jobconfig.get("compile-options/code/format", False) if script.jobconfig else True
         compOptions.variantset = variants
 
         self._console.indent()
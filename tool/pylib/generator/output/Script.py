@@ -29,6 +29,7 @@ from misc                   import util
 from misc.Trie              import Trie
 from misc.ExtMap            import ExtMap
 from generator.output.Package import Package
+from generator.code.DepGraph import DepGraph
 from generator.resource.CombinedImage import CombinedImage
 from generator.resource.FontMap import FontMap
 
@@ -52,6 +53,7 @@ class Script(object):
         self.libraries  = []   # involved libraries [generator.code.Library, ...]
         self.namespace  = u""  # the main name space (config macro "APPLICATION")
         self.excludes   = []   # fully expanded list of classes to exclude from the build
+        self._depGraph  = None # (key, DepGraph) of classesObj and variants, see depGraph()
 
         # adding these methods on instance level, so the counters are fresh
         self.getPartBitMask   = util.powersOfTwoSequence().next  # generator for part bitmasks
@@ -68,6 +70,16 @@ class Script(object):
         return packageClasses
 
 
+    ##
+    # return the DepGraph of the current class list and variant set, which is
+    # only built again if these have changed
+    def depGraph(self):
+        key = (frozenset(x.id for x in self.classesObj), util.toString(self.variants))
+        if self._depGraph is None or self._depGraph[0] != key:
+            self._depGraph = (key, DepGraph(self.classesObj, self.classesAll, self.variants, self.jobconfig))
+        return self._depGraph[1]
+
+
     ##
     # sort the packages in all parts
     def sortParts(self):
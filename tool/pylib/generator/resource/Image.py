@@ -24,7 +24,7 @@
 # Base image class
 ##
 
-import re, os, sys, types, base64, struct, codecs
+import re, os, sys, time, types, base64, struct, codecs
 import xml.etree.cElementTree as et
 
 from misc import filetool, json
@@ -171,18 +171,26 @@ class Image(Resource):
     # --------------------------------------------------------------------------
 
     CHILD_CLASSES = []
+    HEADER_SIZE   = 512  # bytes read to pick the format
 
     def getInfo(self):
         ''' Returns (width, height, "type") of the image'''
-        filename = self.path
-        classes = self.CHILD_CLASSES
+        return infoIndex.get(self.path, self._readInfo)
 
-        for cls in classes:
-            img = cls(filename)
-            if img.verify():
-                size = img.size()
-                if size is not None:
-                    return size + (img.type(),)
+    ##
+    # Read the image info from the file; the header is read once, the format
+    # picked by its magic bytes, and further reading is up to the format
+    def _readInfo(self):
+        fp = open(self.path, "rb")
+        try:
+            head = fp.read(self.HEADER_SIZE)
+            for cls in self.CHILD_CLASSES:
+                if cls.verify(head):
+                    size = cls.size(fp, head)
+                    if size is not None:
+                        return size + (cls.TYPE,)
+        finally:
+            fp.close()
 
         return None
 
@@ -200,94 +208,53 @@ class Image(Resource):
 
 
 ##
-# Child classes for specific image file formats
+# Child classes for specific image file formats; verify(head) checks the
+# first bytes of a file, size(fp, head) returns (width, height) or None
 
 # http://www.w3.org/Graphics/GIF/spec-gif89a.txt
 class GifFile(Image):
-    def __init__(self, path):
-        super(self.__class__, self).__init__(path)
-        self.fp = open(self.path, "rb")
+    TYPE = "gif"
 
-    def __del__(self):
-        self.fp.close()
+    @staticmethod
+    def verify(head):
+        return head[:6] in ("GIF87a", "GIF89a")
 
-    def verify(self):
-        self.fp.seek(0)
-        try:
-            header = self.fp.read(6)
-            signature = struct.unpack("3s3s", header[:6])
-            isGif = signature[0] == "GIF" and signature[1] in ["87a", "89a"]
-        except (struct.error, IOError):
-            isGif = False
-        return isGif
-
-    def type(self):
-        return "gif"
-
-    def size(self):
-        self.fp.seek(0)
-        header = self.fp.read(6+6)
-        (width, height) = struct.unpack("<HH", header[6:10])
+    @staticmethod
+    def size(fp, head):
+        if len(head) < 10:
+            return None
+        (width, height) = struct.unpack("<HH", head[6:10])
         return width, height
 
 
 # http://www.libmng.com/pub/png/spec/1.2/png-1.2-pdg.html#Structure
 class PngFile(Image):
-    def __init__(self, path):
-        super(self.__class__, self).__init__(path)
-        self.fp = open(self.path, "rb")
-
-    def __del__(self):
-        self.fp.close()
+    TYPE = "png"
+    SIGNATURE = struct.pack("8B", 137, 80, 78, 71, 13, 10, 26, 10)
 
-    def type(self):
-        return "png"
+    @staticmethod
+    def verify(head):
+        return head[:8] == PngFile.SIGNATURE
 
-    def verify(self):
-        self.fp.seek(0)
-        try:
-            header = self.fp.read(8)
-            signature = struct.pack("8B", 137, 80, 78, 71, 13, 10, 26, 10)
-            isPng = header[:8] == signature
-        except (struct.error, IOError):
-            isPng = False
-        return isPng
-
-
-    def size(self):
-        self.fp.seek(0)
-        header = self.fp.read(8+4+4+13+4)
-        ihdr = struct.unpack("!I4s", header[8:16])
-        data = struct.unpack("!II5B", header[16:29])
-        (width, height, bitDepth, colorType, compressionMethod, filterMethod, interleaceMethod) = data
+    @staticmethod
+    def size(fp, head):
+        if len(head) < 24:
+            return None
+        # the IHDR chunk comes first
+        (width, height) = struct.unpack("!II", head[16:24])
         return (width, height)
 
 
 class SvgFile(Image):
+    TYPE = "svg"
     DPI = 72
 
-    def __init__(self, path):
-        super(self.__class__, self).__init__(path)
-        self.fp = open(self.path, "r")
-
-    def __del__(self):
-        self.fp.close()
-
-    def type(self):
-        return "svg"
-
-    def verify(self):
-        tag = None
-        try:
-            for event, el in et.iterparse(self.fp, ('start',)):
-                tag = el.tag
-                break
-        except (struct.error, IOError, SyntaxError):
-            # SyntaxError: seems to be no valid XML (or XML at all)
-            pass
-        return tag == '{http://www.w3.org/2000/svg}svg'
+    @staticmethod
+    def verify(head):
+        return head.lstrip("\xef\xbb\xbf \t\r\n").startswith("<")
 
-    def convert_to_pixels(self, str_value):
+    @staticmethod
+    def convert_to_pixels(str_value):
         value = -1
 
         if len(str_value) > 0:
@@ -319,116 +286,88 @@ class SvgFile(Image):
 
         return int(round(value))
 
-    def size(self):
-        self.fp.seek(0)
-        tag = None
-        width = -1
-        height = -1
+    ##
+    # only parses up to the root element
+    @staticmethod
+    def size(fp, head):
+        fp.seek(0)
+        el = None
         try:
-            for event, el in et.iterparse(self.fp, ('start',)):
-                tag = el.tag
-                width = self.convert_to_pixels(el.attrib["width"])
-                height = self.convert_to_pixels(el.attrib["height"])
+            for event, el in et.iterparse(fp, ('start',)):
                 break
-        except (struct.error, IOError, KeyError):
-            pass
-        return (width, height)
+        except (IOError, SyntaxError):
+            # SyntaxError: seems to be no valid XML (or XML at all)
+            return None
+        if el is None or el.tag != '{http://www.w3.org/2000/svg}svg':
+            return None
+        try:
+            return (SvgFile.convert_to_pixels(el.attrib["width"]),
+                    SvgFile.convert_to_pixels(el.attrib["height"]))
+        except KeyError:
+            return (-1, -1)
 
 
 # http://www.obrador.com/essentialjpeg/HeaderInfo.htm
 class JpegFile(Image):
-    def __init__(self, path):
-        super(self.__class__, self).__init__(path)
-        self.fp = open(self.path, "rb")
-
-    def __del__(self):
-        self.fp.close()
+    TYPE = "jpeg"
 
-    def verify(self):
-        self.fp.seek(0)
-        try:
-            signature = struct.unpack("!H", self.fp.read(2))
-            isJpeg = signature[0] == 0xFFD8
-        except (struct.error, IOError):
-            isJpeg = False
-        return isJpeg
+    sof_range = tuple(range(0xffc0,0xffc3+1) + range(0xffc9,0xffcb+1))  # SOFn according to spec.(ITU T.81)
+    standalone = tuple(range(0xffd0,0xffd7+1) + [0xff01])  # rstN, tem - no length bytes, no payload
 
-    def type(self):
-        return "jpeg"
+    @staticmethod
+    def verify(head):
+        return head[:2] == "\xff\xd8"
 
-    sof_range = tuple(range(0xffc0,0xffc3+1) + range(0xffc9,0xffcb+1))  # SOFn according to spec.(ITU T.81)
-    segments = {
-        # (http://en.wikipedia.org/wiki/Jpeg)
-        (0xffd8,) : 0,  # soi - no length bytes, no payload
-        sof_range : 2,  # sofN - 2 length bytes - N is someOf(0..f) (low-nibble of marker)
-        (0xffc4,) : 2,  # dht - 2 len byte
-        (0xffdb,) : 2,  # dqt - 2 len byte
-        (0xffdd,) : 2,  # dri - 2 len byte (value always 4)
-        (0xffda,) : 2,  # sos
-        tuple(range(0xffd0,0xffd7)) : 0,  # rstN - N is oneOf(0..7)
-        tuple(range(0xffe0,0xffef)) : 2,  # appN - N is oneOf(0..f)
-        (0xfffe,) : 2,  # com
-        (0xffd9,) : 0,  # eoi - no payload, no length
-    }
-    def SegmentIterator(self, cont):
-        pos = 0
-        clen = len(cont)
-        while pos<clen-1:
-            segmarker, = struct.unpack("!H", cont[pos:pos+2])
-            # assert segmarker & 0xff00 == 0xff00  # markers have to start with 0xff
-            for range_,lengthlen_ in self.segments.items():
-                if segmarker in range_:
-                    lengthlen = lengthlen_
-                    break
-            if lengthlen == 2:
-                paylen, = struct.unpack("!H", cont[pos+2:pos+2+lengthlen])
-                paystart = pos + 2 + lengthlen
+    ##
+    # Skip from segment to segment (2 marker bytes, 2 length bytes and the
+    # payload, http://en.wikipedia.org/wiki/Jpeg) up to the start-of-frame
+    # segment, seeking over the payloads
+    @staticmethod
+    def size(fp, head):
+        pos = 2  # after soi
+        while True:
+            if pos + 9 <= len(head):
+                seg = head[pos:pos+9]
             else:
-                paylen = 0
-                paystart = pos + 2
-            yield (segmarker, paystart, paylen)
-            pos += 2 + paylen  # paylen includes lengthlen
-
-    def size(self):
-        self.fp.seek(0)
-        cont = self.fp.read()
-        for segmarker,paystart,paylen in self.SegmentIterator(cont):
-            # try both Baseline DCT Start-of-frame marker (SOF0)
-            # and Progressive DCT Start-of-frame marker (SOF2)
-            if segmarker in self.sof_range:
-                (precision, height, width) = struct.unpack("!BHH", cont[paystart:paystart+5])
+                fp.seek(pos)
+                seg = fp.read(9)
+            if len(seg) < 4 or seg[0] != "\xff":
+                return None
+            segmarker, = struct.unpack("!H", seg[:2])
+            if segmarker == 0xffff:  # fill byte
+                pos += 1
+            elif segmarker in JpegFile.standalone:
+                pos += 2
+            elif segmarker in JpegFile.sof_range:
+                if len(seg) < 9:
+                    return None
+                (precision, height, width) = struct.unpack("!BHH", seg[4:9])
                 return (width, height)
-        return None
+            elif segmarker in (0xffda, 0xffd9):  # sos, eoi - no frame header before
+                return None
+            else:
+                paylen, = struct.unpack("!H", seg[2:4])  # paylen includes the length bytes
+                pos += 2 + paylen
 
 ##
 # This is pseudo-image, a combined image with some base64-encoded real images
 class Base64File(Image):
-    def __init__(self, path):
-        super(self.__class__, self).__init__(path)
-        self.fp = codecs.open(self.path, "rb", encoding='utf-8')
-
-    def __del__(self):
-        self.fp.close()
+    TYPE = "b64"
 
-    def type(self):
-        return "b64"
+    @staticmethod
+    def verify(head):
+        return head.lstrip("\xef\xbb\xbf \t\r\n")[:1] in ("{", "[")
 
     ##
-    # has to be a valid Json object
-    def verify(self):
-        self.fp.seek(0)
+    # has to be a valid Json object; the size is not really applicable for
+    # textual images
+    @staticmethod
+    def size(fp, head):
+        fp.seek(0)
         try:
-            cont = self.fp.read()
-            json.loads(cont)
-            isB64 = True
-        except (UnicodeDecodeError,json.DecodeError):
-            isB64 = False
-        return isB64
-
-
-    ##
-    # not really applicable for textual images
-    def size(self):
+            json.loads(fp.read().decode('utf-8'))
+        except (UnicodeDecodeError, json.DecodeError):
+            return None
         (width, height) = -1,-1
         return (width, height)
 
@@ -436,3 +375,50 @@ class Base64File(Image):
 ##
 # Filling Image's child classes list when those classes exist
 Image.CHILD_CLASSES = [PngFile, GifFile, JpegFile, SvgFile, Base64File]
+
+
+##
+# Persistent index of image infos by file, shared by everything that
+# analyzes images (library scans, image combining and slicing). Entries are
+# checked against the size and mtime of their file; the index is kept in
+# the generator cache, where save() writes it back.
+class ImageInfoIndex(object):
+
+    cacheId = "image-infos"
+    racySeconds = 2  # time stamps of the last seconds are not trusted
+
+    def __init__(self):
+        self._index = None  # {path: ((size, mtime), (width, height, type))}
+        self._changed = False
+
+    def get(self, path, readInfo):
+        if self._index is None:
+            cache = getattr(Context, "cache", None)
+            index = cache.read(self.cacheId, memory=True)[0] if cache else None
+            self._index = index if isinstance(index, dict) else {}
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        stamp = (st.st_size, st.st_mtime)
+        entry = self._index.get(path)
+        if entry and entry[0] == stamp:
+            return entry[1]
+        info = readInfo()
+        if info and st.st_mtime < time.time() - self.racySeconds:
+            self._index[path] = (stamp, info)
+            self._changed = True
+        return info
+
+    ##
+    # Write the index to the cache, if it has new entries; entries of images
+    # that are gone (deleted, renamed, or build output since cleaned) are
+    # dropped then
+    def save(self):
+        cache = getattr(Context, "cache", None)
+        if self._changed and cache:
+            for path in self._index.keys():
+                if not os.path.isfile(path):
+                    del self._index[path]
+            cache.write(self.cacheId, self._index, memory=True)
+            self._changed = False
+
+infoIndex = ImageInfoIndex()
@@ -19,17 +19,18 @@
 #
 ################################################################################
 
-import os, re, sys, unicodedata as unidata
+import os, re, sys, stat, time, unicodedata as unidata
 
 from misc                         import filetool, Path, json
 from ecmascript.frontend          import lang, treeutil
 from generator.code.Class         import Class
 from generator.code.qcEnvClass    import qcEnvClass
 from generator.resource.Resource  import Resource
-from generator.resource.Image     import Image
+from generator.resource.Image     import Image, infoIndex as imageInfoIndex
 from generator.resource.CombinedImage    import CombinedImage
 from generator.resource.FontMap   import FontMap
 from generator.config.Manifest    import Manifest
+from generator.runtime            import DirWatcher
 from generator                    import Context as context
 
 
@@ -58,6 +59,9 @@ class Library(object):
 
         self.__youngest = (None, None) # to memoize youngest file in lib
         self._dependencies = None  # for dependencies.json
+        self._scanManifest = {}  # {category: per-directory manifest}, see _scanTree()
+        self._manifestMTime = None
+        self._scanId = None
 
 
     def _init_from_manifest(self):
@@ -121,6 +125,9 @@ class Library(object):
     # unpickling: update state
     def __setstate__(self, d):
         d['_console']      = context.console
+        d.setdefault('_scanManifest', {})
+        d.setdefault('_manifestMTime', None)
+        d.setdefault('_scanId', None)
         self.__dict__ = d
 
 
@@ -186,19 +193,239 @@ class Library(object):
     def getResources(self):
         return self.resources
 
-    def scan(self, timeOfLastScan=0):
+    ##
+    # Whether library directories are watched (see DirWatcher), so checking
+    # a scan needs no file system access; for long-running processes
+    watchDirs = False
+    _dirWatcher = None   # DirWatcher, shared by all libraries
+    _watchedScans = {}   # {manipath: (scan id, watched dir paths)} of scans without changes since
+
+    ##
+    # Time stamps of the last seconds are not trusted, as file systems might
+    # have a coarse time resolution
+    _racySeconds = 2
+
+    ##
+    # Scan the library's classes, translations and resources; with
+    # <lastScan> (a Library object of an earlier scan of the same library),
+    # only new or changed files are analyzed again.
+    def scan(self, lastScan=None):
         self._console.debug("Scanning %s..." % self.path)
         self._console.indent()
 
-        scanres = self._scanClassPath(timeOfLastScan)
+        manifest = {}
+        if lastScan and lastScan._scanSettings() == self._scanSettings():
+            manifest = lastScan._scanManifest
+        self._scanManifest = {}
+        self._scanId = time.time()
+        mtime = os.stat(self.manipath).st_mtime
+        self._manifestMTime = mtime if mtime < time.time() - self._racySeconds else None
+
+        scanres = self._scanClassPath(manifest)
         self._classes = scanres[0]
         self._docs    = scanres[1]
-        self._translations = self._scanTranslationPath()
-        self.resources = self._scanResourcePath()
+        self._translations = self._scanTranslationPath(manifest)
+        self.resources = self._scanResourcePath(manifest)
+        imageInfoIndex.save()
+
+        if self.watchDirs and not (self._startWatching() and self._scanIsFresh()):
+            self._stopWatching()
 
         self._console.outdent()
 
 
+    ##
+    # Whether the scan of <lastScan> (a Library object of an earlier scan of
+    # this library) is still current. Checks the time stamps of the Manifest,
+    # the scanned directories and their files (in-place edits don't touch
+    # directory time stamps), but doesn't need to list directories. With
+    # .watchDirs, only the Manifest is checked while the directories of the
+    # scan report no changes.
+    def scanIsCurrent(self, lastScan):
+        if lastScan._scanSettings() != self._scanSettings():
+            return False
+        self._takeChanges()
+        watched = self._watchedScans.get(self.manipath)
+        if watched and watched[0] == lastScan._scanId:
+            current = lastScan._manifestIsFresh()
+        else:
+            if self.watchDirs:  # watch first, so changes during the check are noticed later
+                lastScan._startWatching()
+            current = lastScan._scanIsFresh()
+        if not current:
+            self._stopWatching()
+        lastScan.__youngest = (None, None)
+        return current
+
+
+    def _manifestIsFresh(self):
+        try:
+            return (self._manifestMTime is not None
+                and os.stat(self.manipath).st_mtime == self._manifestMTime)
+        except OSError:
+            return False
+
+
+    def _scanIsFresh(self):
+        if not self._scanManifest or not self._manifestIsFresh():
+            return False
+        try:
+            for category in self.assets:
+                catPath = self.assets[category]['path']
+                if (catPath is not None and (category in self._scanManifest)
+                        != os.path.isdir(os.path.join(self.path, catPath))):
+                    return False
+            # directories first, as files are many more
+            for dirs_ in self._scanManifest.values():
+                for dirPath, entry in dirs_.iteritems():
+                    if entry[0] is None or os.stat(dirPath).st_mtime != entry[0]:
+                        return False
+            for dirs_ in self._scanManifest.values():
+                for dirPath, (_, _, fileNames, files) in dirs_.iteritems():
+                    for name in fileNames:
+                        stamp = files[name][0]
+                        st = os.stat(os.path.join(dirPath, name))
+                        if stamp is None or stamp[0] != (st.st_size, st.st_mtime):
+                            return False
+        except OSError:
+            return False
+        return True
+
+
+    ##
+    # Have the directories of this scan watched; returns False if they can't be
+    def _startWatching(self):
+        self._stopWatching()
+        if not DirWatcher.available():
+            return False
+        if Library._dirWatcher is None:
+            try:
+                Library._dirWatcher = DirWatcher.DirWatcher()
+            except OSError:  # e.g. over the limit of inotify instances
+                return False
+        self._takeChanges()  # earlier changes are for the scans watched so far
+        dirPaths = set()
+        for dirs_ in self._scanManifest.values():
+            for dirPath in dirs_:
+                if not self._dirWatcher.watch(dirPath):
+                    return False
+                dirPaths.add(DirWatcher.encodePath(dirPath))
+        self._watchedScans[self.manipath] = (self._scanId, dirPaths)
+        return True
+
+
+    def _stopWatching(self):
+        self._watchedScans.pop(self.manipath, None)
+
+
+    ##
+    # Forget the watched scans that have changes in their directories since
+    @classmethod
+    def _takeChanges(cls):
+        if cls._dirWatcher is None:
+            return
+        changes = cls._dirWatcher.changes()
+        for manipath, (_, dirPaths) in cls._watchedScans.items():
+            if changes is None or not dirPaths.isdisjoint(changes):
+                del cls._watchedScans[manipath]
+
+
+    ##
+    # The Manifest settings the scan results depend on
+    def _scanSettings(self):
+        return (self.path, self.namespace, self.encoding, self.classPath,
+            self.resourcePath, self.assets['translations']['path'])
+
+
+    ##
+    # Walk the directory tree under <rootPath> like filetool.walk(), and return
+    # the infos <analyze>(filePath, fileName) derives for its files, in walk
+    # order (a None info drops the file). The scan is kept in
+    # self._scanManifest[<category>] as
+    #
+    #   {dirPath: (dir mtime, [subdir], [fileName], {fileName: (stamp, info)})}
+    #
+    # With the manifest of an earlier scan in <lastManifest>, files with an
+    # unchanged stamp (size and mtime, plus those of a <companion> file like
+    # ".meta") keep their info, and directories with an unchanged mtime are
+    # not listed again. Time stamps of the last seconds are not trusted, as
+    # file systems might have a coarse time resolution.
+    def _scanTree(self, category, rootPath, analyze, lastManifest, companion=None):
+        lastDirs = lastManifest.get(category, {})
+        dirs_    = {}
+        infos    = []
+        racy     = time.time() - self._racySeconds
+
+        def listDir(dirPath):
+            subdirs, fileNames, stats = [], [], {}
+            for name in os.listdir(dirPath):
+                if self._ignoredDirEntries.match(name):
+                    continue
+                try:
+                    st = os.stat(os.path.join(dirPath, name))  # follows symlinks
+                except OSError:  # dangling symlink
+                    continue
+                if stat.S_ISDIR(st.st_mode):
+                    subdirs.append(name)
+                else:
+                    fileNames.append(name)
+                    stats[name] = st
+            return subdirs, fileNames, stats
+
+        def fileStamp(name, stats):
+            entries = [stats[name]]
+            if companion:
+                companionName = os.path.splitext(name)[0] + companion
+                if companionName in stats:
+                    entries.append(stats[companionName])
+            if [st for st in entries if st.st_mtime >= racy]:
+                return None
+            return tuple((st.st_size, st.st_mtime) for st in entries)
+
+        def scanDir(dirPath, dirMTime, ancestors):
+            last = lastDirs.get(dirPath)
+            if dirMTime >= racy:
+                dirMTime = None
+            listing = None
+            if last and dirMTime is not None and last[0] == dirMTime:
+                try:
+                    stats = dict((name, os.stat(os.path.join(dirPath, name))) for name in last[2])
+                    listing = last[1], last[2], stats
+                except OSError:  # changed in the meantime
+                    pass
+            if listing is None:
+                listing = listDir(dirPath)
+            subdirs, fileNames, stats = listing
+
+            lastFiles = last[3] if last else {}
+            files = {}
+            for name in fileNames:
+                stamp = fileStamp(name, stats)
+                if stamp is not None and name in lastFiles and lastFiles[name][0] == stamp:
+                    info = lastFiles[name][1]
+                else:
+                    info = analyze(os.path.join(dirPath, name), name)
+                files[name] = (stamp, info)
+                if info is not None:
+                    infos.append(info)
+            dirs_[dirPath] = (dirMTime, subdirs, fileNames, files)
+
+            for name in subdirs:
+                subPath = os.path.join(dirPath, name)
+                realPath = os.path.realpath(subPath)
+                if realPath in ancestors:  # symlink cycle
+                    continue
+                try:
+                    subMTime = os.stat(subPath).st_mtime
+                except OSError:
+                    continue
+                scanDir(subPath, subMTime, ancestors | set([realPath]))
+
+        scanDir(rootPath, os.stat(rootPath).st_mtime, set([os.path.realpath(rootPath)]))
+        self._scanManifest[category] = dirs_
+        return infos
+
+
     def _get_dependencies(self):
         deps = {}
         if os.path.isfile(self._dependencies_path):
@@ -287,7 +514,7 @@ class Library(object):
         return liblist
 
 
-    def _scanResourcePath(self):
+    def _scanResourcePath(self, lastManifest={}):
         resources = set()
         if self.resourcePath is None or not os.path.isdir(
                 os.path.join(self.path,self.resourcePath)):
@@ -302,32 +529,25 @@ class Library(object):
         if not path.endswith(os.sep):
             lib_prefix_len += 1
 
-        for root, dirs, files in filetool.walk(path):
-            # filter ignored directories
-            for dir in dirs:
-                if self._ignoredDirEntries.match(dir):
-                    dirs.remove(dir)
-
-            for file in files:
-                if self._ignoredDirEntries.match(file):
-                    continue
-                fpath = os.path.join(root, file)
-                fpath = os.path.normpath(fpath)
-                if Image.isImage(fpath):
-                    if CombinedImage.isCombinedImage(fpath):
-                        res = CombinedImage(fpath)
-                    else:
-                        res = Image(fpath)
-                    res.analyzeImage()
-                elif FontMap.isFontMap(fpath):
-                    res = FontMap(fpath)
+        def analyze(fpath, fileName):
+            fpath = os.path.normpath(fpath)
+            if Image.isImage(fpath):
+                if CombinedImage.isCombinedImage(fpath):
+                    res = CombinedImage(fpath)
                 else:
-                    res = Resource(fpath)
+                    res = Image(fpath)
+                res.analyzeImage()
+            elif FontMap.isFontMap(fpath):
+                res = FontMap(fpath)
+            else:
+                res = Resource(fpath)
 
-                res.set_id(Path.posifyPath(fpath[lib_prefix_len:]))
-                res.library= self
+            res.set_id(Path.posifyPath(fpath[lib_prefix_len:]))
+            return res
 
-                resources.add(res)
+        for res in self._scanTree("resources", path, analyze, lastManifest, companion=".meta"):
+            res.library = self
+            resources.add(res)
 
         self._console.indent()
         self._console.debug("Found %s resources" % len(resources))
@@ -336,7 +556,7 @@ class Library(object):
 
 
 
-    def _scanClassPath(self, timeOfLastScan=0):
+    def _scanClassPath(self, lastManifest={}):
 
         ##
         # check single subdirectory from class path
@@ -363,7 +583,6 @@ class Library(object):
             self._console.info("Lib<%s>: Skipping non-existend class path" % self.namespace)
             return classList, docs
 
-        existClassIds = dict([(x.id,x) for x in self._classes])  # if we scanned before
         classRoot   = os.path.join(self.path, self.classPath)
 
         check_multiple_namespaces(classRoot)
@@ -371,62 +590,52 @@ class Library(object):
 
         self._console.debug("Scanning class folder...")
 
-        # Iterate...
-        #for root, dirs, files in filetool.walk(classRoot):
-        #    # Filter ignored directories
-        #    for ignoredDir in dirs:
-        #        if self._ignoredDirEntries.match(ignoredDir):
-        #            dirs.remove(ignoredDir)
-
-        #    # Searching for files
-        #    for fileName in files:
-        #        # ignore dot files
-        #        if fileName.startswith(".") or self._ignoredDirEntries.match(fileName):
-        #            continue
-        for filePathId, filePath in self.classPathIterator():
-                self._console.dot()
-
-                # basic attributes
-                #filePath = os.path.join(root, fileName)    # /foo/bar/baz/source/class/my/space/AppClass.js
-                #filePathId = filePath.replace(classRoot + os.sep, '')  # my/space/AppClass.js
-                filePathId = os.path.splitext(filePathId)[0]  # strip pot. ".js" etc.
-                filePathId = filePathId.replace(os.sep, ".") # my.space.AppClass
-
-                p = self.getFileProps(filePathId, filePath)
-
-                # ignore non-script
-                if p.fileExt != ".js":
-                    continue
-
-                # check if known and fresh
-                if (p.filePathId in existClassIds
-                    and p.fileMTime < timeOfLastScan):
-                    classList.append(existClassIds[filePathId])
-                    continue # re-use known class
-
-                # handle doc files
-                if os.path.basename(filePath) == self._docFilename:
-                    docs[p.filePackage] = {
-                        "relpath"   : p.fileRel,
-                        "path"      : p.filePath,
-                        "encoding"  : p.fileEncoding,
-                        "namespace" : self.namespace,
-                        "id"        : p.filePathId,
-                        "package"   : p.filePackage,
-                        "size"      : p.fileSize
-                    }
-                    # stop further processing
-                    continue
-
-                clazz, fileCodeId = self.makeClassObj(p.filePathId, p.filePath, p)
-
-                # ignore all data files (e.g. translation, doc files, ...)
-                if fileCodeId == None:
-                    continue
-
-                # store file data
-                self._console.debug("Adding class %s" % p.filePathId)
-                classList.append(clazz)
+        ##
+        # returns ("doc", docinfo) or ("class", classObj)
+        def analyze(filePath, fileName):
+            # ignore dot files
+            if fileName.startswith("."):
+                return None
+            self._console.dot()
+
+            # basic attributes
+            filePathId = filePath.replace(classRoot + os.sep, '')  # my/space/AppClass.js
+            filePathId = os.path.splitext(filePathId)[0]  # strip pot. ".js" etc.
+            filePathId = filePathId.replace(os.sep, ".") # my.space.AppClass
+
+            p = self.getFileProps(filePathId, filePath)
+
+            # ignore non-script
+            if p.fileExt != ".js":
+                return None
+
+            # handle doc files
+            if fileName == self._docFilename:
+                return "doc", {
+                    "relpath"   : p.fileRel,
+                    "path"      : p.filePath,
+                    "encoding"  : p.fileEncoding,
+                    "namespace" : self.namespace,
+                    "id"        : p.filePathId,
+                    "package"   : p.filePackage,
+                    "size"      : p.fileSize
+                }
+
+            clazz, fileCodeId = self.makeClassObj(p.filePathId, p.filePath, p)
+
+            # ignore all data files (e.g. translation, doc files, ...)
+            if fileCodeId == None:
+                return None
+
+            self._console.debug("Adding class %s" % p.filePathId)
+            return "class", clazz
+
+        for kind, entry in self._scanTree("classes", classRoot, analyze, lastManifest):
+            if kind == "doc":
+                docs[entry["package"]] = entry
+            else:
+                entry.library = self  # might come from the last scan
+                classList.append(entry)
 
         self._console.indent()
         self._console.debug("Found %s classes" % len(classList))
@@ -437,7 +646,7 @@ class Library(object):
         return classList, docs
 
 
-    def _scanTranslationPath(self):
+    def _scanTranslationPath(self, lastManifest={}):
         translations = {}  # reset
         if self.assets['translations']['path'] is None or not os.path.isdir(
                 os.path.join(self.path,self.assets['translations']['path'])):
@@ -447,23 +656,15 @@ class Library(object):
         path = os.path.join(self.path,self.assets['translations']['path'])
         self._console.debug("Scanning translation folder...")
 
-        # Iterate...
-        for root, dirs, files in filetool.walk(path):
-            # Filter ignored directories
-            for ignoredDir in dirs:
-                if self._ignoredDirEntries.match(ignoredDir):
-                    dirs.remove(ignoredDir)
-
-            # Searching for files
-            for fileName in files:
-                # Ignore non-po and dot files
-                if os.path.splitext(fileName)[-1] != ".po" or fileName.startswith("."):
-                    continue
-
-                filePath = os.path.join(root, fileName)
-                fileLocale = os.path.splitext(fileName)[0]
+        def analyze(filePath, fileName):
+            # Ignore non-po and dot files
+            if os.path.splitext(fileName)[-1] != ".po" or fileName.startswith("."):
+                return None
+            fileLocale = os.path.splitext(fileName)[0]
+            return self.translationEntry(fileLocale, filePath, self.namespace)
 
-                translations[fileLocale] = self.translationEntry(fileLocale, filePath, self.namespace)
+        for entry in self._scanTree("translations", path, analyze, lastManifest):
+            translations[entry["id"]] = entry
 
         self._console.indent()
         self._console.debug("Found %s translations" % len(translations))
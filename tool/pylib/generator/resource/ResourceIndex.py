@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+################################################################################
+#
+#  qooxdoo - the new era of web development
+#
+#  http://qooxdoo.org
+#
+#  License:
+#    MIT: https://opensource.org/licenses/MIT
+#    See the LICENSE file in the project's top-level directory for details.
+#
+################################################################################
+
+##
+# Index of the resources of a list of libraries, for matching @asset hints.
+# Resource ids (and the ids of the images embedded in combined images) are
+# kept sorted, so a hint only tests the ids starting with the literal prefix
+# of its regex.
+##
+
+import re, bisect
+
+from generator.resource.CombinedImage import CombinedImage
+
+_regexMeta = re.compile(r'[.^$*+?{}\[\]\\|()]')
+
+##
+# The literal prefix of regex <expr>, which every string it matches starts
+# with (as of re.match())
+def literalPrefix(expr):
+    if "|" in expr:
+        return ""
+    mo = _regexMeta.search(expr)
+    if not mo:
+        return expr
+    end = mo.start()
+    if mo.group() in "*?{":  # quantifier of the preceding char
+        end = max(end - 1, 0)
+    return expr[:end]
+
+
+class ResourceIndex(object):
+
+    _last = None  # (resource sets, ResourceIndex) of the libraries last asked for
+
+    ##
+    # <resources> is the list of Resource's, in the order of their libraries
+    def __init__(self, resources):
+        self.resources = resources
+        self._ids    = sorted((res.id, i) for i, res in enumerate(resources))
+        self._embeds = sorted((embed.id, i) for i, res in enumerate(resources)
+                                if isinstance(res, CombinedImage) for embed in res.embeds)
+        self._matches = {}  # {hint regexes: match()}
+
+
+    ##
+    # The index of the resources of <libs>, re-used while their resource
+    # sets are the same (a Library re-scan creates a new one)
+    @classmethod
+    def forLibraries(cls, libs):
+        sets = [libObj.getResources() for libObj in libs]
+        if cls._last and len(cls._last[0]) == len(sets) and all(
+                a is b for a, b in zip(cls._last[0], sets)):
+            return cls._last[1]
+
+        resources = []
+        for resSet in sets:
+            resources.extend(resSet)  # weightedness of same res id through order of script.libraries
+        # remove unwanted files
+        exclpatt = re.compile("\.(?:meta|py)$", re.I)
+        resources = [res for res in resources if not exclpatt.search(res.id)]
+
+        index = cls(resources)
+        cls._last = (sets, index)
+        return index
+
+
+    def _startingWith(self, entries, prefix):
+        pos = bisect.bisect_left(entries, (prefix,))
+        while pos < len(entries) and entries[pos][0].startswith(prefix):
+            yield entries[pos]
+            pos += 1
+
+
+    ##
+    # Match the AssetHint's <hints> against the resources (directly, or
+    # through an embedded image); returns the indexes of the matched
+    # resources, sorted, and a list telling which hints matched anything.
+    # Results are memoized by the hints' regexes.
+    def match(self, hints):
+        key = tuple(hint.expanded for hint in hints)
+        if key not in self._matches:
+            matched = set()
+            seen = []
+            for hint in hints:
+                prefix = literalPrefix(hint.expanded)
+                found = False
+                for entries in (self._ids, self._embeds):
+                    for resId, i in self._startingWith(entries, prefix):
+                        if hint.regex.match(resId):
+                            matched.add(i)
+                            found = True
+                seen.append(found)
+            self._matches[key] = (sorted(matched), seen)
+        return self._matches[key]
@@ -25,13 +25,29 @@ from misc import filetool
 from misc.securehash import sha_construct
 from generator.runtime.ShellCmd import ShellCmd
 from generator.runtime.Log import Log
+from generator.runtime import CacheStore
+from generator.runtime.MemoryCache import MemoryCache
 
-memcache  = {} # {key: {'content':content, 'time': (time.time()}}
+memcache  = MemoryCache() # {key: {'content':content, 'time': (time.time()}}, shared by all Cache objects
+digests   = {}  # {path: (size, mtime, digest)}, see Cache.contentDigest()
 check_file     = u".cache_check_file"
-CACHE_REVISION = 0x1292407 # set this to a unique value (e.g. commit hash prefix)
+CACHE_REVISION = 0x1292416 # set this to a unique value (e.g. commit hash prefix)
                            # when existing caches need clearing
 CACHE_THRESHOLD = 500 # lower bound for the number of files in the compile cache for it to be considered "saturated"
 
+##
+# The default codec of cache contents; a codec turns a content into a string
+# and back (see also ecmascript.frontend.treecodec)
+class PickleCodec(object):
+
+    def encode(self, content):
+        return pickle.dumps(content, 2)
+
+    def decode(self, data):
+        return pickle.loads(data)
+
+pickleCodec = PickleCodec()
+
 class Cache(object):
 
 
@@ -41,6 +57,11 @@ class Cache(object):
     #  'cache/downloads' : path
     #  'interruptRegistry' : generator.runtime.InterruptRegistry (mandatory)
     #  'cache/invalidate-on-tool-change' : True|False
+    #  'cache/backend' : "file"|"sqlite" (see generator.runtime.CacheStore)
+    #  'cache/memory-limit' : {"entries":int, "bytes":int, "keep":[prefix], "evict-first":[prefix]}
+    #  'cache/invalidation' : "mtime"|"content"
+    #  'cache/shared' : path
+    #  'cache/shared-write' : True|False
     #
     def __init__(self, path, **kwargs):
         self._cache_revision = CACHE_REVISION
@@ -52,6 +73,15 @@ class Cache(object):
         self._console.debug("Initializing cache...")
         self._console.indent()
         self._check_path(self._path)
+        self._store          = CacheStore.createStore(kwargs.get("cache/backend", "file"), self._path, self._console)
+        if self._store.count() < CACHE_THRESHOLD: # not even minimal framework classes cached
+            self._console.info("Populating the cache, this may take some time")
+        limits               = kwargs.get("cache/memory-limit", {})
+        memcache.configure(limits.get("entries"), limits.get("bytes"),
+                           limits.get("keep", []), limits.get("evict-first", []))
+        self.invalidation    = kwargs.get("cache/invalidation", "mtime")
+        self._sharedWrite    = kwargs.get("cache/shared-write", False)
+        self._shared         = self._openShared(kwargs.get("cache/shared"))
         self._locked_files   = set(())
         self._context['interruptRegistry'].register(self._unlock_files)
         self._assureCacheIsValid()  # checks and pot. clears existing cache
@@ -135,10 +165,7 @@ class Cache(object):
     def cleanCompileCache(self):
         self._check_path(self._path)
         self._console.info("Deleting compile cache")
-        for f in os.listdir(self._path):   # currently, just delete the files in the top-level dir
-            file = os.path.join(self._path, f)
-            if os.path.isfile(file):
-                os.unlink(file)
+        self._store.clear()
         self._update_checkfile()
 
 
@@ -167,8 +194,6 @@ class Cache(object):
             # defer read/write access test to the first call of read()/write()
             self._console.debug("Using existing directory")
             pass
-        if len(os.listdir(path)) < CACHE_THRESHOLD: # not even minimal framework classes cached
-            self._console.info("Populating the cache, this may take some time")
         self._console.outdent()
 
     ##
@@ -178,7 +203,7 @@ class Cache(object):
         for file_ in self._locked_files:
             try:
                 filetool.unlock(file_)
-                os.unlink(file_)  # remove file, as write might be corrupted
+                self._store.delete(os.path.basename(file_))  # remove entry, as write might be corrupted
                 self._console.debug("Cleaned up lock and file: %r" % file_)
             except: # file might not exists since adding to _lock_files and actually locking is not atomic
                 pass   # no sense to do much fancy in an interrupt handler
@@ -192,6 +217,50 @@ class Cache(object):
             self._console.warn("Detected newer tool chain; you might want to run 'generate.py distclean', then re-run this job.")
 
 
+    ##
+    # The shared cache is a read-through layer behind the local store, for
+    # entries keyed by content (see Class.cacheKey()), so it can be used from
+    # different checkouts and machines. Only reads and writes with the 'shared'
+    # flag go there.
+    def _openShared(self, path):
+        if not path:
+            return None
+        if self.invalidation != "content":
+            self._console.warn("! Ignoring shared cache %s, as it requires 'content' cache invalidation" % path)
+            return None
+        if not os.path.isdir(path):
+            if not self._sharedWrite:
+                self._console.warn("! Ignoring missing shared cache directory: %s" % path)
+                return None
+            filetool.directory(path)
+        self._console.debug("Using shared cache: %s" % path)
+        return CacheStore.FileStore(path)
+
+
+    def _isShared(self, shared):
+        return shared and self._shared is not None
+
+
+    ##
+    # Copy the entry from the shared cache into the local store, returning
+    # its new mtime (or None if there is none)
+    def _fetchShared(self, cacheName, cacheFile):
+        try:
+            data = self._shared.load(cacheName)
+        except (IOError, OSError):
+            data = None
+        if data is None:
+            return None
+        if self._store.lockOnAccess:
+            filetool.lock(cacheFile)
+        try:
+            self._store.store(cacheName, data)
+        finally:
+            if self._store.lockOnAccess:
+                filetool.unlock(cacheFile)
+        return self._store.mtime(cacheName)
+
+
     ##
     # create a file name from a cacheId
 
@@ -208,107 +277,166 @@ class Cache(object):
         return "%s-%s" % (baseId, digestId)
 
 
+    ##
+    # Digest of the contents of file <path>, to put into cacheIds with
+    # 'content' invalidation. Memoized by path, size and mtime, so a file is
+    # only hashed again when it (or at least its mtime) has changed.
+    def contentDigest(self, path):
+        st = os.stat(path)
+        entry = digests.get(path)
+        if entry and entry[0] == st.st_size and entry[1] == st.st_mtime:
+            return entry[2]
+        fobj = open(path, 'rb')
+        try:
+            digest = sha_construct(fobj.read()).hexdigest()
+        finally:
+            fobj.close()
+        digests[path] = (st.st_size, st.st_mtime, digest)
+        return digest
+
+
     ##
     # Read an object from cache.
     #
     # @param dependsOn  file name to compare cache file against
     # @param memory     if read from disk keep value also in memory; improves subsequent access
-    def read(self, cacheId, dependsOn=None, memory=False, keepLock=False):
+    # @param shared     fall back to the shared cache (for entries not depending on local state)
+    # @param codec      decoder of the content, the one it was written with
+    def read(self, cacheId, dependsOn=None, memory=False, keepLock=False, shared=False, codec=pickleCodec):
         if dependsOn:
             dependsModTime = os.stat(dependsOn).st_mtime
 
         # Mem cache
-        if cacheId in memcache:
-            memitem = memcache[cacheId]
-            if not dependsOn or dependsModTime < memitem['time']:
-                return memitem['content'], memitem['time']
+        memitem = memcache.get(cacheId, dependsModTime if dependsOn else None)
+        if memitem:
+            return memitem['content'], memitem['time']
 
         # File cache
-        cacheFile = os.path.join(self._path, self.filename(cacheId))
-
-        try:
-            cacheModTime = os.stat(cacheFile).st_mtime
-        except OSError:
+        cacheName = self.filename(cacheId)
+        cacheFile = os.path.join(self._path, cacheName)  # also names the lock file
+        cacheModTime = self._store.mtime(cacheName, dependsModTime if dependsOn else None)
+        if cacheModTime is None and self._isShared(shared):
+            cacheModTime = self._fetchShared(cacheName, cacheFile)
+        if cacheModTime is None:
             return None, None
 
         # out of date check
         if dependsOn and dependsModTime > cacheModTime:
                 return None, cacheModTime
 
+        lock = keepLock or self._store.lockOnAccess
         try:
             try:
-                if not cacheFile in self._locked_files:
+                if lock and not cacheFile in self._locked_files:
                     self._locked_files.add(cacheFile)
                     filetool.lock(cacheFile)
 
-                fobj = open(cacheFile, 'rb')
-                fcontent = fobj.read().decode('zlib')
-                fobj.close()
+                fcontent = self._store.load(cacheName)
+                if fcontent is None:  # removed in the meantime
+                    return None, None
+                fcontent = fcontent.decode('zlib')
             finally:
-                if not keepLock:
+                if lock and not keepLock:
                     filetool.unlock(cacheFile)
                     self._locked_files.remove(cacheFile)
 
-        except (IOError, zlib.error):
+        except (IOError, zlib.error, CacheStore.sqlite3.Error):
             self._console.warn("Could not read cache object %s" % cacheFile)
             return None, cacheModTime
 
         try:
             gc.disable()
             try:
-                content = pickle.loads(fcontent)
+                content = codec.decode(fcontent)
             finally:
                 gc.enable()
 
             if memory:
-                memcache[cacheId] = {'content':content, 'time': time.time()}
+                memcache.put(cacheId, {'content':content, 'time': time.time()}, len(fcontent))
 
             #print "read cacheId: %s" % cacheId
             return content, cacheModTime
 
-        except (EOFError, pickle.PickleError, pickle.UnpicklingError):
+        except (EOFError, ValueError, pickle.PickleError, pickle.UnpicklingError):
             self._console.warn("Could not unpickle cache object %s" % cacheFile)
             return None, cacheModTime
 
 
+    ##
+    # Check whether there is an entry for cacheId that is not older than
+    # <dependsOn>, without reading it.
+    def isFresh(self, cacheId, dependsOn=None, shared=False):
+        dependsModTime = os.stat(dependsOn).st_mtime if dependsOn else None
+
+        memitem = memcache.peek(cacheId)
+        if memitem and (not dependsOn or dependsModTime < memitem['time']):
+            return True
+
+        cacheName = self.filename(cacheId)
+        cacheModTime = self._store.mtime(cacheName, dependsModTime)
+        if cacheModTime is None and self._isShared(shared):
+            cacheModTime = self._shared.mtime(cacheName)
+        if cacheModTime is None:
+            return False
+
+        return not dependsOn or dependsModTime <= cacheModTime
+
+
     ##
     # Write an object to cache.
     #
     # @param memory         keep value also in memory; improves subsequent access
     # @param writeToFile    write value to disk
-    def write(self, cacheId, content, memory=False, writeToFile=True, keepLock=False):
-        cacheFile = os.path.join(self._path, self.filename(cacheId))
+    # @param shared         also write value to the shared cache, with 'cache/shared-write'
+    # @param codec          encoder of the content, e.g. ecmascript.frontend.treecodec.codec
+    def write(self, cacheId, content, memory=False, writeToFile=True, keepLock=False, shared=False, codec=pickleCodec):
+        cacheName = self.filename(cacheId)
+        cacheFile = os.path.join(self._path, cacheName)  # also names the lock file
+        encoded   = None
 
         if writeToFile:
             try:
-                if not cacheFile in self._locked_files:
+                if self._store.lockOnAccess and not cacheFile in self._locked_files:
                     self._locked_files.add(cacheFile)  # this is not atomic with the next one!
                     filetool.lock(cacheFile)
 
-                fobj = open(cacheFile, 'wb')
-                fobj.write(pickle.dumps(content, 2).encode('zlib'))
-                fobj.close()
+                encoded = codec.encode(content)
+                data    = encoded.encode('zlib')
+                self._store.store(cacheName, data)
 
-                if not keepLock:
+                if cacheFile in self._locked_files and not keepLock:
                     filetool.unlock(cacheFile)
                     self._locked_files.remove(cacheFile)  # not atomic with the previous one!
 
-            except (IOError, EOFError, pickle.PickleError, pickle.PicklingError), e:
+            except (IOError, OSError, EOFError, pickle.PickleError, pickle.PicklingError, CacheStore.sqlite3.Error), e:
                 try:
-                    os.unlink(cacheFile) # try remove cache file, Pickle might leave incomplete files
+                    self._store.delete(cacheName) # try remove cache entry, Pickle might leave incomplete files
                 except:
                     e.args = ("Cache file might be crippled.\n" % self._path + e.args[0], ) + e.args[1:]
                 e.args = ("Could not store cache to %s.\n" % self._path + e.args[0], ) + e.args[1:]
                 raise e
 
+            if self._sharedWrite and self._isShared(shared):
+                try:
+                    self._shared.store(cacheName, data)
+                except (IOError, OSError), e:
+                    self._console.warn("Could not write to shared cache: %s" % e)
+
         if memory:
-            memcache[cacheId] = {'time': time.time(), 'content':content}
+            if encoded is None and memcache.needsSizes():
+                encoded = codec.encode(content)
+            memcache.put(cacheId, {'time': time.time(), 'content':content}, len(encoded or ""))
+
+
+    ##
+    # Counters of the in-memory tier (see MemoryCache.stats())
+    def memoryStats(self):
+        return memcache.stats()
 
 
     def remove(self, cacheId, writeToFile=False):
-        if cacheId in memcache:
-           entry = memcache[cacheId]
-           del memcache[cacheId]
+        entry = memcache.pop(cacheId)
+        if entry:
            return entry['content'], entry['time']
         else:
             return None, None
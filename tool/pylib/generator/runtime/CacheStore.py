@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+################################################################################
+#
+#  qooxdoo - the new era of web development
+#
+#  http://qooxdoo.org
+#
+#  License:
+#    MIT: https://opensource.org/licenses/MIT
+#    See the LICENSE file in the project's top-level directory for details.
+#
+################################################################################
+
+##
+# CacheStore -- Storage backends for generator.runtime.Cache
+#
+# A store keeps opaque byte strings (compressed pickles) under entry names
+# (Cache.filename(cacheId)), together with their modification time, which
+# Cache compares against the mtime of 'dependsOn' files.
+#
+# Store interface:
+#   mtime(name, minTime=None) -> entry mtime, or None if there is no entry
+#   load(name)                -> entry data, or None if there is no entry
+#   store(name, data)
+#   delete(name)
+#   count()                   -> number of entries
+#   clear()                   -> remove all entries
+#   lockOnAccess              -> whether Cache has to lock every access (or
+#                                just read-modify-write cycles, with keepLock)
+##
+
+import os, time, sqlite3
+
+STORES = ("file", "sqlite")
+
+
+def createStore(kind, path, console):
+    if kind == "file":
+        return FileStore(path)
+    elif kind == "sqlite":
+        return SqliteStore(path, console)
+    else:
+        raise ValueError("Unknown cache backend '%s' (use one of %r)" % (kind, STORES))
+
+
+##
+# One file per entry, in the cache directory
+class FileStore(object):
+
+    lockOnAccess = True  # files can be seen half-written by other processes
+
+    def __init__(self, path):
+        self._path = path
+
+
+    def _file(self, name):
+        return os.path.join(self._path, name)
+
+
+    def mtime(self, name, minTime=None):
+        try:
+            return os.stat(self._file(name)).st_mtime
+        except OSError:
+            return None
+
+
+    def load(self, name):
+        try:
+            fobj = open(self._file(name), 'rb')
+        except IOError:
+            return None
+        try:
+            return fobj.read()
+        finally:
+            fobj.close()
+
+
+    ##
+    # Write to a temporary file first, so readers not honoring the lock files
+    # (like those of a shared cache) never see partial entries
+    def store(self, name, data):
+        file_ = self._file(name)
+        tmpfile = "%s.%d.tmp" % (file_, os.getpid())
+        fobj = open(tmpfile, 'wb')
+        try:
+            fobj.write(data)
+        finally:
+            fobj.close()
+        if os.name == 'nt' and os.path.exists(file_):  # no atomic replace on Windows
+            os.unlink(file_)
+        os.rename(tmpfile, file_)
+
+
+    def delete(self, name):
+        try:
+            os.unlink(self._file(name))
+        except OSError:
+            pass
+
+
+    def count(self):
+        return len(os.listdir(self._path))
+
+
+    def clear(self):
+        for f in os.listdir(self._path):   # currently, just delete the files in the top-level dir
+            file_ = os.path.join(self._path, f)
+            if os.path.isfile(file_):
+                os.unlink(file_)
+
+
+##
+# All entries in a single SQLite database in the cache directory, with an
+# in-memory index of entry names and mtimes. Reading an entry costs one
+# query, and no file system operations. The database should live on a local
+# file system (no NFS).
+class SqliteStore(object):
+
+    lockOnAccess = False  # sqlite transactions are atomic
+    DB_NAME = "cache.sqlite"
+
+    def __init__(self, path, console):
+        self._path    = path
+        self._console = console
+        self._dbfile  = os.path.join(path, self.DB_NAME)
+        self._conn    = None
+        self._pid     = None
+        self._index   = {}  # {name : mtime}
+        self._refreshIndex()
+        self._importFileEntries()
+
+
+    ##
+    # Each process needs its own connection, so reconnect after a fork()
+    def _db(self):
+        if self._pid != os.getpid():
+            self._conn = sqlite3.connect(self._dbfile, timeout=60, isolation_level=None)
+            self._conn.text_factory = str
+            self._conn.execute("PRAGMA journal_mode=WAL")  # readers don't block the writer
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS entries (name TEXT PRIMARY KEY, mtime REAL, data BLOB)")
+            self._pid = os.getpid()
+        return self._conn
+
+
+    def _refreshIndex(self):
+        self._index = dict(self._db().execute("SELECT name, mtime FROM entries"))
+
+
+    def _isDbFile(self, fname):
+        return fname.startswith(self.DB_NAME)  # incl. -wal and -shm files
+
+
+    ##
+    # Migration: move entries of the 'file' store found in the cache directory
+    # into the database
+    def _importFileEntries(self):
+        entries = [x for x in os.listdir(self._path)
+                    if not x.startswith(".") and not x.endswith((".lock", ".tmp")) and not self._isDbFile(x)
+                        and os.path.isfile(os.path.join(self._path, x))]
+        if not entries:
+            return
+        self._console.info("Importing %s cache files into %s" % (len(entries), self._dbfile))
+        db = self._db()
+        db.execute("BEGIN")
+        try:
+            for name in entries:
+                file_ = os.path.join(self._path, name)
+                fobj = open(file_, 'rb')
+                try:
+                    data = fobj.read()
+                finally:
+                    fobj.close()
+                mtime = os.stat(file_).st_mtime
+                if self._index.get(name, 0) < mtime:
+                    db.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?)", (name, mtime, sqlite3.Binary(data)))
+                    self._index[name] = mtime
+            db.execute("COMMIT")
+        except:
+            db.execute("ROLLBACK")
+            raise
+        for name in entries:
+            os.unlink(os.path.join(self._path, name))
+
+
+    ##
+    # The index might be behind other processes writing to the database, so
+    # look up entries missing from it, or older than <minTime>.
+    def mtime(self, name, minTime=None):
+        mtime = self._index.get(name)
+        if mtime is None or (minTime is not None and mtime < minTime):
+            row = self._db().execute("SELECT mtime FROM entries WHERE name=?", (name,)).fetchone()
+            if row:
+                mtime = self._index[name] = row[0]
+            else:
+                mtime = None
+                self._index.pop(name, None)
+        return mtime
+
+
+    def load(self, name):
+        row = self._db().execute("SELECT data FROM entries WHERE name=?", (name,)).fetchone()
+        if row:
+            return str(row[0])
+        else:
+            return None
+
+
+    def store(self, name, data):
+        mtime = time.time()
+        self._db().execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?)", (name, mtime, sqlite3.Binary(data)))
+        self._index[name] = mtime
+
+
+    def delete(self, name):
+        self._db().execute("DELETE FROM entries WHERE name=?", (name,))
+        self._index.pop(name, None)
+
+
+    def count(self):
+        return len(self._index)
+
+
+    def clear(self):
+        db = self._db()
+        db.execute("DELETE FROM entries")
+        db.execute("VACUUM")
+        self._index = {}
+        for f in os.listdir(self._path):
+            file_ = os.path.join(self._path, f)
+            if os.path.isfile(file_) and not self._isDbFile(f):
+                os.unlink(file_)
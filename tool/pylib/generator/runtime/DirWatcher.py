@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+################################################################################
+#
+#  qooxdoo - the new era of web development
+#
+#  http://qooxdoo.org
+#
+#  License:
+#    MIT: https://opensource.org/licenses/MIT
+#    See the LICENSE file in the project's top-level directory for details.
+#
+################################################################################
+
+##
+# DirWatcher -- change notification for directories
+#
+#   Wraps Linux inotify (through ctypes), so long-running processes (the
+#   generator daemon, 'watch-files', the web server's active reload) can
+#   learn about changes in the entries of a set of directories without
+#   walking them. Each watcher reports changes to its own consumer. Where
+#   inotify is not available, available() is False, and callers fall back
+#   to checking time stamps.
+##
+
+import sys, os, errno, struct, ctypes
+
+try:
+    _libc = ctypes.CDLL(None, use_errno=True)
+    _libc.inotify_init1
+    _libc.inotify_add_watch
+except (OSError, AttributeError):
+    _libc = None
+
+_EVENT = struct.Struct("iIII")  # wd, mask, cookie, len (of the following name)
+
+IN_MODIFY      = 0x00000002
+IN_ATTRIB      = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM  = 0x00000040
+IN_MOVED_TO    = 0x00000080
+IN_CREATE      = 0x00000100
+IN_DELETE      = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF   = 0x00000800
+IN_Q_OVERFLOW  = 0x00004000
+IN_IGNORED     = 0x00008000
+IN_ONLYDIR     = 0x01000000
+IN_CLOEXEC     = 0x00080000
+IN_NONBLOCK    = 0x00000800
+
+_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+    | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+
+
+def available():
+    return _libc is not None and sys.platform.startswith("linux")
+
+
+##
+# <path> the way changes() reports it
+def encodePath(path):
+    if isinstance(path, unicode):
+        path = path.encode(sys.getfilesystemencoding() or "utf-8")
+    return path
+
+
+class DirWatcher(object):
+
+    def __init__(self):
+        self._fd = _libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            code = ctypes.get_errno()
+            raise OSError(code, os.strerror(code))
+        self._paths = {}  # {watch descriptor: dir path}
+
+
+    ##
+    # Watch the entries of directory <path> (not recursive); returns False if
+    # that is not possible, e.g. when over the system's limit of watches
+    def watch(self, path):
+        path = encodePath(path)
+        wd = _libc.inotify_add_watch(self._fd, path, _MASK)
+        if wd < 0:
+            return False
+        self._paths[wd] = path
+        return True
+
+
+    ##
+    # Directories with changes since the last call, as a set of paths; None
+    # if events have been lost, so anything might have changed
+    def changes(self):
+        changed = set()
+        lost = False
+        while True:
+            try:
+                data = os.read(self._fd, 65536)
+            except OSError, e:
+                if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    break
+                raise
+            pos = 0
+            while pos < len(data):
+                wd, mask, _, length = _EVENT.unpack_from(data, pos)
+                pos += _EVENT.size + length
+                if mask & IN_Q_OVERFLOW:
+                    lost = True
+                elif wd in self._paths:
+                    changed.add(self._paths[wd])
+                    if mask & IN_IGNORED:  # directory is gone
+                        del self._paths[wd]
+        return None if lost else changed
+
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+        self._paths = {}
+
+    def __del__(self):
+        self.close()
@@ -21,113 +21,174 @@
 ##
 # Generatord  -- Generator Daemon Module
 #
-#   Allows to run generator.py in daemon mode.
+#   Allows to run generator.py in daemon mode. The daemon listens on a Unix
+#   socket (one per config file, see socketPath()), and runs the command lines
+#   forwarded to it by later generator.py invocations (see forward()) in its
+#   own process, sending output and exit code back. So the in-memory cache
+#   (library scans with their Class objects, class infos and dependencies,
+#   translations, ...) stays populated between invocations. Entries are still
+#   checked against their files when used, which picks up changes per file.
+#
+#   Requests are single JSON lines:
+#     {"argv": [<arg>,...], "cwd": <dir>}  -- run a command line
+#     {"command": "stop"}                  -- shut the daemon down
+#   Responses are a stream of JSON lines, ending with the exit code:
+#     {"out": <text>} | {"err": <text>} | {"exit": <int>}
 ##
 
-import sys, os, re, string, types, copy
+import sys, os, socket, json, tempfile, traceback
 
-from generator import Context
-from generator.Generator import Generator
-from generator.code.Class import Class
-from generator.runtime.Cache import Cache
+from misc.securehash import sha_construct
 
-# -- BaseHTTPServer stuff ----
-import BaseHTTPServer, cgi
 
-# -- Pyro stuff ----
-import Pyro.core, Pyro.naming
+def available():
+    return hasattr(socket, "AF_UNIX")
 
-generator_context = None
 
-class Generatord(object):
+##
+# Socket path of the daemon serving <configFile>
+def socketPath(configFile):
+    key = sha_construct(os.path.abspath(configFile)).hexdigest()[:12]
+    return os.path.join(tempfile.gettempdir(), "qxgenerator-%s-%s.sock" % (os.getuid(), key))
 
-    def __init__(self, context, num=0):
-        global generator_context
-        generator_context = context
-        self.num = num
-        generator_context['cache'] = Cache("/tmp/qx1.5/cache", **generator_context) # TODO: cache path
-        #self.servAddr = ('',8008)
-        #self.serv = BaseHTTPServer.HTTPServer(self.servAddr, httpServerHandler)
-        generator_context['interruptRegistry'].register(self.shut_down)
 
-    def serve(self):
-        #self.serv.serve_forever()
-        daemon = Pyro.core.Daemon()
-        self.daemon = daemon
-        ns = Pyro.naming.NameServerLocator().getNS()
-        daemon.useNameServer(ns)
-        uri = daemon.connect(GeneratordWorker(self.num), "genworker"+str(self.num))
-        daemon.requestLoop()
-
-    def shut_down(self):
-        self.daemon.shutdown(True)
-
-
-# This is adopted from the standard Pyro example
-class GeneratordWorker(Pyro.core.ObjBase):
-
-    def __init__(self, num):
-        Pyro.core.ObjBase.__init__(self)
-        self.num = num
-        self.job = generator_context['jobconf']
-        self.classList = self._scanLibs(self.job)
-
-    def _scanLibs(self, job):
-        genobj = Generator(generator_context)
-        (ns,classes,d,tr,lib) = genobj.scanLibrary(job.get("library", []))
-        return classes
-
-
-    def joke(self,name):
-        return "sorry "+name+", I don't know any jokes!"
-
-    def tree(self, classId, classPath, variantSet):
-        c = Class(classId, classPath, None, generator_context, {})
-        t = c.tree()
-        return t
-
-    def dependencies(self, classId, classPath, variantSet, force=False):
-        print "\nrunning on Pyro server", str(self.num)
-        c = Class(classId, classPath, None, generator_context, self.classList)
-        d, cached = c.dependencies(variantSet, force)
-        return d, cached
-        
-    def run(self, jobname):
-        print "\nrunning on Pyro server", str(self.num), ":", jobname
-        config = generator_context['config']
-        console = generator_context['console']
-        expjobs = config.resolveExtendsAndRuns([jobname])
-        config.includeSystemDefaults(expjobs)
-        config.resolveMacros(expjobs)
-        config.resolveLibs(expjobs)
-        config.checkSchema(expjobs, checkJobTypes=True)
-        config.cleanUpJobs(expjobs)
-        console.resetFilter()
-        for jobn in expjobs:
-            console.head("Executing: %s" % jobn, True)
-            job = generator_context['config'].getJob(jobn)
-            assert job is not None
-            job_context = copy.copy(generator_context)
-            job_context.update({'jobconf':job})
-            genobj = Generator(job_context)
-            genobj.run()
-        
-
-# This is from B.Dayley's "Python Phrasebook"
-class httpServerHandler(BaseHTTPServer.BaseHTTPRequestHandler):
-    
-    def do_POST(self):
-        self.query_string = self.rfile.read(int(self.headers['Content-Length']))
-        self.args = dict(cgi.parse_qsl(self.query_string))
-        self.send_response(200)
-        self.send_header('Content-type', 'text/html')
-        self.end_headers()
-        sys.stdout = self.wfile
-        self.wfile.write("<h2>Handling Post</h2><p>")
-        self.wfile.write("<li>Location: <b>%s</b>" % (self.path,))
-        self.wfile.write("<li>Arguments: <b>%s</b><hr>" % (self.args,))
-        #execfile(self.path, self.args)
+def _send(conn, msg):
+    conn.sendall(json.dumps(msg) + "\n")
+
+
+def _connect(path):
+    if not available() or not os.path.exists(path):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except socket.error:
+        sock.close()
+        return None
+    return sock
+
+
+##
+# Send <request> to the daemon at <path>, copying its output to stdout and
+# stderr. Returns the exit code, or None if there is no daemon listening.
+def _request(path, request):
+    sock = _connect(path)
+    if sock is None:
+        return None
+    try:
+        _send(sock, request)
+        for line in sock.makefile('rb'):
+            msg = json.loads(line)
+            if "out" in msg:
+                sys.stdout.write(msg["out"])
+                sys.stdout.flush()
+            elif "err" in msg:
+                sys.stderr.write(msg["err"])
+            elif "exit" in msg:
+                return msg["exit"]
+        sys.stderr.write("Generator daemon closed the connection\n")
+        return 1
+    finally:
+        sock.close()
+
+
+##
+# Have the daemon at <path> run the generator command line <argv>
+def forward(path, argv):
+    return _request(path, {"argv": argv, "cwd": os.getcwd()})
 
 
+def stop(path):
+    return _request(path, {"command": "stop"})
 
 
+##
+# File-like object sending what is written to it over the client connection
+class _StreamWriter(object):
+
+    def __init__(self, conn, key):
+        self._conn = conn
+        self._key  = key
+
+    def write(self, text):
+        if isinstance(text, unicode):
+            text = text.encode('utf-8')
+        if text:
+            _send(self._conn, {self._key: text})
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return False
+
+
+class Generatord(object):
+
+    ##
+    # @param path    {String} socket path
+    # @param runFunc {Function} runs a generator command line (list of
+    #                args), returning the exit code
+    # @param console {Log}
+    def __init__(self, path, runFunc, console):
+        self._path    = path
+        self._runFunc = runFunc
+        self._console = console
+        self._running = False
+
+
+    def serve(self):
+        if _connect(self._path) is not None:
+            raise RuntimeError("There is already a generator daemon listening on %s" % self._path)
+        if os.path.exists(self._path):  # stale socket
+            os.unlink(self._path)
+
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(self._path)
+        os.chmod(self._path, 0600)
+        sock.listen(5)
+        self._console.info("Generator daemon listening on %s" % self._path)
+        self._running = True
+        try:
+            while self._running:
+                conn, _ = sock.accept()
+                try:
+                    self._handle(conn)
+                except socket.error:  # client has gone
+                    pass
+                finally:
+                    conn.close()
+        finally:
+            sock.close()
+            os.unlink(self._path)
+        self._console.info("Generator daemon stopped")
+
+
+    def _handle(self, conn):
+        request = json.loads(conn.makefile('rb').readline() or "{}")
+        if request.get("command") == "stop":
+            self._running = False
+            _send(conn, {"exit": 0})
+            return
+        if "argv" not in request:
+            return
+
+        self._console.debug("Running: %s" % " ".join(request["argv"]))
+        saved = sys.stdout, sys.stderr, os.getcwd()
+        sys.stdout = _StreamWriter(conn, "out")
+        sys.stderr = _StreamWriter(conn, "err")
+        try:
+            try:
+                os.chdir(request["cwd"])
+                code = self._runFunc(request["argv"])
+            except Exception:
+                traceback.print_exc()
+                code = 1
+        finally:
+            sys.stdout, sys.stderr = saved[:2]
+            os.chdir(saved[2])
+
+        try:
+            _send(conn, {"exit": code})
+        except socket.error:
+            pass
@@ -278,3 +278,48 @@ class Log(object):
         stream = sys.stdout
         stream.write("\n")
         stream.flush()
+
+
+    ##
+    # Record all output of this process (standard streams, log file) instead
+    # of writing it, for replay() by another process. Used by worker
+    # processes, whose output would otherwise interleave.
+    #
+    # @return {List} the output recorded from now on, as (stream, text) entries
+    #
+    def capture(self):
+        captured = []
+        sys.stdout = _Capture(captured, "stdout")
+        sys.stderr = _Capture(captured, "stderr")
+        if self.logfile:
+            self.logfile = _Capture(captured, "logfile")
+        return captured
+
+
+    ##
+    # Write output recorded by capture()
+    def replay(self, captured):
+        for streamName, text in captured:
+            if streamName == "logfile":
+                stream = self.logfile
+                if not stream:
+                    continue
+            else:
+                stream = getattr(sys, streamName)
+            stream.write(text)
+            stream.flush()
+        if captured:
+            after_newline(captured[-1][1].endswith('\n'))
+
+
+class _Capture(object):
+
+    def __init__(self, captured, streamName):
+        self.captured = captured
+        self.streamName = streamName
+
+    def write(self, text):
+        self.captured.append((self.streamName, text))
+
+    def flush(self):
+        pass
@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+################################################################################
+#
+#  qooxdoo - the new era of web development
+#
+#  http://qooxdoo.org
+#
+#  License:
+#    MIT: https://opensource.org/licenses/MIT
+#    See the LICENSE file in the project's top-level directory for details.
+#
+################################################################################
+
+##
+# MemoryCache -- The in-process tier of generator.runtime.Cache
+#
+# An LRU map of {cacheId : {'content':content, 'time':time.time()}}, which
+# can be bounded by number of entries and by size. Entry sizes are estimated
+# by the size of the pickled entry. Entries whose cacheId starts with a 'keep'
+# prefix are never evicted, entries with an 'evict-first' prefix are evicted
+# before all others.
+##
+
+from collections import OrderedDict
+
+KEEP, EVICT_FIRST, NORMAL = range(3)
+
+
+class MemoryCache(object):
+
+    def __init__(self):
+        self._tiers = {    # LRU order, least recently used first
+            KEEP        : OrderedDict(),
+            EVICT_FIRST : OrderedDict(),
+            NORMAL      : OrderedDict(),
+        }
+        self._where = {}   # {cacheId : tier}
+        self._sizes = {}   # {cacheId : size}
+        self._size  = 0
+        self.hits = self.misses = self.evictions = 0
+        self.configure()
+
+
+    ##
+    # Set the limits and the eviction policy; None means unlimited
+    def configure(self, entries=None, size=None, keep=(), evictFirst=()):
+        self._maxEntries = entries
+        self._maxSize    = size
+        self._keep       = tuple(keep)
+        self._evictFirst = tuple(evictFirst)
+        self._evict()
+
+
+    ##
+    # Whether sizes are needed, which can spare callers the estimation
+    def needsSizes(self):
+        return self._maxSize is not None
+
+
+    def _tier(self, cacheId):
+        if self._keep and cacheId.startswith(self._keep):
+            return KEEP
+        elif self._evictFirst and cacheId.startswith(self._evictFirst):
+            return EVICT_FIRST
+        else:
+            return NORMAL
+
+
+    def __contains__(self, cacheId):
+        return cacheId in self._where
+
+
+    ##
+    # Return the entry for cacheId, without recording the access
+    def peek(self, cacheId):
+        if cacheId in self._where:
+            return self._tiers[self._where[cacheId]][cacheId]
+        return None
+
+
+    ##
+    # Return the entry for cacheId, if it is younger than <minTime>, and
+    # record the access
+    def get(self, cacheId, minTime=None):
+        if cacheId in self._where:
+            tier = self._tiers[self._where[cacheId]]
+            entry = tier.pop(cacheId)
+            tier[cacheId] = entry   # most recently used
+            if minTime is None or minTime < entry['time']:
+                self.hits += 1
+                return entry
+        self.misses += 1
+        return None
+
+
+    def put(self, cacheId, entry, size=0):
+        self.pop(cacheId)
+        where = self._tier(cacheId)
+        self._tiers[where][cacheId] = entry
+        self._where[cacheId] = where
+        self._sizes[cacheId] = size
+        self._size += size
+        self._evict()
+
+
+    def pop(self, cacheId):
+        if cacheId not in self._where:
+            return None
+        entry = self._tiers[self._where.pop(cacheId)].pop(cacheId)
+        self._size -= self._sizes.pop(cacheId)
+        return entry
+
+
+    def _overLimit(self):
+        return ((self._maxEntries is not None and len(self._where) > self._maxEntries)
+            or (self._maxSize is not None and self._size > self._maxSize))
+
+
+    def _evict(self):
+        for where in (EVICT_FIRST, NORMAL):
+            tier = self._tiers[where]
+            while tier and self._overLimit():
+                self.pop(next(iter(tier)))
+                self.evictions += 1
+
+
+    def stats(self):
+        return {
+            'entries'   : len(self._where),
+            'size'      : self._size,
+            'hits'      : self.hits,
+            'misses'    : self.misses,
+            'evictions' : self.evictions,
+        }
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+################################################################################
+#
+#  qooxdoo - the new era of web development
+#
+#  http://qooxdoo.org
+#
+#  License:
+#    MIT: https://opensource.org/licenses/MIT
+#    See the LICENSE file in the project's top-level directory for details.
+#
+################################################################################
+
+##
+# WorkerPool -- Run independent per-item tasks in a pool of forked worker
+# processes, delivering the results in submission order.
+#
+# Workers are forked from the generator process, so they see everything the
+# parent had in memory at the time the pool is created (class objects, trees,
+# the Cache object, ...). Hand such state over through the module-level
+# 'shared' map, and let the task function (which has to be a module-level
+# function, to be picklable) look it up there. Only the task arguments and
+# the results travel between processes.
+##
+
+import os, signal, multiprocessing
+
+shared = {}   # state for the task functions, inherited by the workers through fork()
+
+_inWorker = False  # True in the worker processes of a pool
+
+WAIT_TIMEOUT = 60 * 60 * 24  # wait for results with a timeout, so Ctrl-C gets through (Python 2 Pool quirk)
+
+
+##
+# Turn a 'workers' config value into a number of processes:
+# 1 (or unset) means serial processing, 0 means one per CPU. Without fork(),
+# and within a worker (pool workers cannot have pools of their own),
+# processing is always serial.
+def workerCount(setting):
+    if not hasattr(os, "fork") or _inWorker:
+        return 1
+    if setting is None or isinstance(setting, bool):
+        return 1
+    if int(setting) == 0:
+        try:
+            return multiprocessing.cpu_count()
+        except NotImplementedError:
+            return 1
+    return max(int(setting), 1)
+
+
+def _runChunk((func, items)):
+    return [func(item) for item in items]
+
+
+def _initWorker():
+    global _inWorker
+    _inWorker = True
+    # Ctrl-C is handled by the parent, which terminates the pool
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+##
+# Apply <func> to every item in <items>, returning the results in the order
+# of <items>. With less than two workers (see workerCount()) or items, the
+# items are processed serially in the current process.
+#
+# @param func     {Function} module-level function, taking a single item
+# @param items    {List} task arguments (have to be picklable)
+# @param workers  {Int} number of worker processes
+# @param progress {Function} called after each delivered result
+# @param data     {Map} entries to put into 'shared' for the duration of the run
+# @return {List} results
+#
+def map(func, items, workers=1, progress=lambda: None, data={}):
+    results = []
+    for result in imap(func, items, workers, data):
+        results.append(result)
+        progress()
+    return results
+
+
+##
+# Like map(), but yielding the results in the order of <items> as soon as
+# they are available.
+#
+def imap(func, items, workers=1, data={}):
+    items = list(items)
+    saved = shared.copy()
+    shared.update(data)
+    try:
+        if workers < 2 or len(items) < 2:
+            for item in items:
+                yield func(item)
+            return
+
+        workers = min(workers, len(items))
+        chunksize = max(len(items) // (workers * 8), 1)
+        chunks = [(func, items[i:i+chunksize]) for i in range(0, len(items), chunksize)]
+        pool = multiprocessing.Pool(workers, _initWorker)
+        try:
+            resultIter = pool.imap(_runChunk, chunks)  # chunking here, as only an unchunked imap() has next(timeout)
+            for _ in chunks:
+                for result in resultIter.next(WAIT_TIMEOUT):
+                    yield result
+            pool.close()
+        except:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+
+    finally:
+        shared.clear()
+        shared.update(saved)
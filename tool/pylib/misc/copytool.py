@@ -28,6 +28,10 @@ import optparse
 import shutil
 import filecmp
 import stat
+import errno
+import time
+import ctypes
+from multiprocessing.pool import ThreadPool
 
 sys.path.append(os.path.abspath(os.pardir))
 from misc.ExtendAction import ExtendAction
@@ -205,6 +209,174 @@ copy file or directory SOURCE to directory TARGET'''
 
 
 
+##
+# Batch copying
+#
+# copyFiles() copies a whole list of (source file, target file) pairs, as
+# 'copy-resources' produces them: the target directories are created in one
+# pass, files that are unchanged since the last run are skipped (by the size
+# and mtime of source and target, recorded in a manifest), and the rest is
+# copied by a pool of threads (the copying itself runs outside the GIL).
+##
+
+try:
+    _libc = ctypes.CDLL(None, use_errno=True)
+    _copy_file_range = _libc.copy_file_range
+    _copy_file_range.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_int, ctypes.c_void_p,
+                                 ctypes.c_size_t, ctypes.c_uint]
+    _copy_file_range.restype = ctypes.c_ssize_t
+except (OSError, AttributeError, TypeError):
+    _copy_file_range = None
+
+FICLONE = 0x40049409  # ioctl, Linux
+
+LINK_MODES = (None, "hard", "clone")
+
+WAIT_TIMEOUT = 60 * 60 * 24  # wait for the pool with a timeout, so Ctrl-C gets through
+
+
+def _stamp(st):
+    return (st.st_size, st.st_mtime)
+
+
+##
+# Copy the contents of <fsrc> to <fdst> within the kernel; returns False if
+# that is not supported (for these files), before anything was copied
+def _copyRange(fsrc, fdst):
+    if _copy_file_range is None:
+        return False
+    copied = 0
+    while True:
+        n = _copy_file_range(fsrc.fileno(), None, fdst.fileno(), None, 1 << 30, 0)
+        if n < 0:
+            code = ctypes.get_errno()
+            if copied == 0 and code in (errno.ENOSYS, errno.EXDEV, errno.EINVAL, errno.EOPNOTSUPP, errno.EPERM):
+                return False
+            raise OSError(code, os.strerror(code))
+        if n == 0:
+            return True
+        copied += n
+
+
+##
+# Make <fdst> share the data blocks of <fsrc> (reflink, on Btrfs, XFS, ...);
+# returns False if the file system can't
+def _clone(fsrc, fdst):
+    try:
+        import fcntl
+        fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        return True
+    except (ImportError, IOError, OSError):
+        return False
+
+
+##
+# Copy file <source> to <target>, whose directory exists; an existing
+# target is replaced (not written through, as it may be a link to the source)
+def copyFile(source, target, link=None):
+    if os.path.lexists(target):
+        os.remove(target)
+    if link == "hard":
+        try:
+            os.link(source, target)
+            return
+        except OSError:  # e.g. across devices
+            pass
+    fsrc = open(source, "rb")
+    try:
+        fdst = open(target, "wb")
+        try:
+            if not (link == "clone" and _clone(fsrc, fdst)) and not _copyRange(fsrc, fdst):
+                shutil.copyfileobj(fsrc, fdst, 1 << 20)
+        finally:
+            fdst.close()
+    finally:
+        fsrc.close()
+    shutil.copymode(source, target)
+
+
+##
+# Copy the files of <pairs>, a list of (source file, target file).
+#
+# @param manifest {Map} {target: (source, source stamp, target stamp)} of
+#                 the last run, updated in place; targets that still come
+#                 from the same source, and whose source and target still
+#                 have these stamps, are skipped
+# @param link     {String} None (copy the contents), "hard" (hard-link the
+#                 targets to the sources), or "clone" (reflink); where linking
+#                 is not possible the file is copied
+# @param threads  {Int} size of the copying thread pool
+# @param racySeconds {Int} sources changed within the last seconds are not
+#                 recorded in the manifest, as their time stamps can't tell
+#                 a later change
+# @return {Int} number of files copied
+#
+def copyFiles(pairs, manifest=None, link=None, threads=4, console=DummyConsole(), racySeconds=2):
+    if link not in LINK_MODES:
+        raise ValueError("Unknown link mode: %r" % (link,))
+    if manifest is None:
+        manifest = {}
+
+    todo = []
+    for source, target in pairs:
+        try:
+            srcStamp = _stamp(os.stat(source))
+        except OSError, e:
+            console.error("Error copying file %s: %s" % (source, str(e)))
+            continue
+        entry = manifest.get(target)
+        if entry and entry[:2] == (source, srcStamp):
+            try:
+                if _stamp(os.stat(target)) == entry[2]:
+                    continue
+            except OSError:
+                pass
+        todo.append((source, target, srcStamp))
+
+    for targetDir in sorted(set(os.path.dirname(target) for _, target, _ in todo)):
+        if not os.path.isdir(targetDir):
+            console.debug("Creating directory %s." % targetDir)
+            try:
+                os.makedirs(targetDir)
+            except OSError, e:
+                if e.errno != errno.EEXIST:
+                    raise
+
+    def copy((source, target, srcStamp)):
+        try:
+            copyFile(source, target, link)
+            return _stamp(os.stat(target)), None
+        except (IOError, OSError), e:
+            return None, str(e)
+
+    if threads > 1 and len(todo) > 1:
+        pool = ThreadPool(min(threads, len(todo)))
+        try:
+            results = pool.map_async(copy, todo, chunksize=max(len(todo) // (threads * 4), 1)).get(WAIT_TIMEOUT)
+            pool.close()
+        except:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+    else:
+        results = [copy(job) for job in todo]
+
+    recent = time.time() - racySeconds
+    copied = 0
+    for (source, target, srcStamp), (targetStamp, error) in zip(todo, results):
+        if error:
+            console.error("Error copying file %s to %s: %s" % (source, target, error))
+            manifest.pop(target, None)
+            continue
+        copied += 1
+        if srcStamp[1] < recent:
+            manifest[target] = (source, srcStamp, targetStamp)
+        else:
+            manifest.pop(target, None)
+    return copied
+
+
 def main():
     copier = CopyTool()
     copier.parse_args()
@@ -19,9 +19,9 @@
 #
 ################################################################################
 
-import os, codecs, cPickle, sys, re, time, base64, math, itertools as itert
+import os, codecs, cPickle, sys, re, time, base64, math, tempfile, itertools as itert
 import gzip as sys_gzip
-import textutil
+import textutil, securehash
 
 ##
 # directory entry patterns we generally want to ignore
@@ -100,6 +100,61 @@ def save(filePath, content="", encoding="utf-8"):
     outputFile.close()
 
 
+_umask = os.umask(0)
+os.umask(_umask)
+
+##
+# File that is written piecewise and named when it is complete, e.g. by the
+# hash of its content: write() encodes each chunk and feeds it to a SHA-1
+# hash and to a temporary file in <dirname>, optionally gzip'ed. close()
+# moves the file to its final path. Only a chunk at a time is held in memory.
+#
+class HashedFile(object):
+
+    def __init__(self, dirname, compress=False, encoding="utf-8"):
+        dirname = normalize(dirname)
+        directory(dirname)
+        fd, self.tmpPath = tempfile.mkstemp(suffix=".tmp", prefix=".", dir=dirname)
+        os.chmod(self.tmpPath, 0666 & ~_umask)  # like a file from save()
+        self.file = os.fdopen(fd, "wb")
+        # no file name in the gzip header, as the final name is not known yet
+        self.stream = sys_gzip.GzipFile("", "wb", 9, self.file) if compress else self.file
+        self.encoding = encoding
+        self.hasher = securehash.sha_construct()
+
+    def write(self, content):
+        data = unicode(content).encode(self.encoding, "replace")
+        self.hasher.update(data)
+        self.stream.write(data)
+
+    ##
+    # SHA-1 of the content so far, as for securehash.getHash(content)
+    def hexdigest(self):
+        return self.hasher.hexdigest()
+
+    ##
+    # Finish the file and move it to <filePath> (replacing an existing file)
+    def close(self, filePath):
+        self.stream.close()
+        self.file.close()
+        filePath = normalize(filePath)
+        try:
+            os.rename(self.tmpPath, filePath)
+        except OSError:
+            if not os.path.exists(filePath):  # not on Windows' existing target
+                raise
+            os.remove(filePath)
+            os.rename(self.tmpPath, filePath)
+
+    ##
+    # Drop the file, e.g. after an error
+    def discard(self):
+        self.stream.close()
+        self.file.close()
+        if os.path.exists(self.tmpPath):
+            os.remove(self.tmpPath)
+
+
 def directory(dirname):
     # Normalize
     dirname = normalize(dirname)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+################################################################################
+#
+#  qooxdoo - the new era of web development
+#
+#  http://qooxdoo.org
+#
+#  License:
+#    MIT: https://opensource.org/licenses/MIT
+#    See the LICENSE file in the project's top-level directory for details.
+#
+################################################################################
+
+##
+# Conformance of tokenizer.FastTokenizer with tokenizer.Tokenizer, on all
+# framework classes and some special cases.
+#
+# Usage:
+#   python tokenizer.py            -- run the tests
+#   python tokenizer.py bench      -- compare tokens/sec
+##
+
+import unittest
+import sys, os, time
+
+testDir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(testDir, os.pardir, os.pardir, "pylib"))
+from ecmascript.frontend import tokenizer
+from misc import filetool
+
+classDir = os.path.join(testDir, os.pardir, os.pardir, os.pardir, "framework", "source", "class")
+
+KEYS = ('type', 'source', 'detail', 'line', 'column', 'id', 'begin', 'end', 'connection', 'multiline')
+
+def classFiles():
+    for root, dirs, files in filetool.walk(classDir):
+        for f in sorted(files):
+            if f.endswith(".js"):
+                yield os.path.join(root, f)
+
+def tokenize(tokenizerClass, text, fileId):
+    try:
+        tokens = tokenizerClass().parseStream(text, fileId)
+    except Exception, e:
+        return "%s: %s" % (e.__class__.__name__, e)
+    return [tuple(t.get(k) for k in KEYS) for t in tokens]
+
+
+class TestFastTokenizer(unittest.TestCase):
+
+    def assertConforms(self, text, fileId="test"):
+        expected = tokenize(tokenizer.Tokenizer, text, fileId)
+        actual   = tokenize(tokenizer.FastTokenizer, text, fileId)
+        if isinstance(expected, list) and isinstance(actual, list):
+            for pos, (tok1, tok2) in enumerate(zip(expected, actual)):
+                self.assertEqual(tok1, tok2, "%s: token #%d differs" % (fileId, pos))
+        self.assertEqual(expected, actual)
+
+    def testSpecialCases(self):
+        for text in [
+            '',
+            'var s = "a\\"b" + \'c\\\\\';',
+            'a = b /* c */ / 2;',          # look-behind excludes comments
+            'a = 1;\n/x/.test(b)',
+            'a = /[/]x/g.exec(s)//c\n',
+            'a.import = 1; b = { delete : 2 };',
+            '  /**\n   * doc\n   */\n  foo();  // end\n',
+            'var s = "line\\\nnext";\r\nx = 0x1F + 1.5e3;',
+            'var a = "abc',                 # errors
+            'a = /abc\nb',
+            'x /* abc',
+        ]:
+            self.assertConforms(text)
+
+    def testFrameworkClasses(self):
+        for path in classFiles():
+            self.assertConforms(filetool.read(path), path)
+
+    def testTokenAccess(self):
+        tok = tokenizer.FastTokenizer().parseStream("a += 1")[2]
+        self.assertEqual((tok.name, tok.value, tok.detail), ("operator", "+=", "ASSIGN_ADD"))
+        self.assertEqual((tok['type'], tok['source']), ("token", "+="))
+        self.assertEqual(tok.get('begin'), None)
+        self.assertRaises(KeyError, lambda: tok['nosuchkey'])
+
+
+def benchmark():
+    texts = [filetool.read(path) for path in classFiles()]
+    for tokenizerClass in (tokenizer.Tokenizer, tokenizer.FastTokenizer):
+        count = 0
+        start = time.time()
+        for text in texts:
+            count += len(tokenizerClass().parseStream(text))
+        secs = time.time() - start
+        print "%-14s %8d tokens %6.2fs %8d tokens/sec" % (tokenizerClass.__name__, count, secs, count / secs)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["bench"]:
+        benchmark()
+    else:
+        unittest.main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+################################################################################
+#
+#  qooxdoo - the new era of web development
+#
+#  http://qooxdoo.org
+#
+#  License:
+#    MIT: https://opensource.org/licenses/MIT
+#    See the LICENSE file in the project's top-level directory for details.
+#
+################################################################################
+
+##
+# Slotted tree.Node: attribute handling, copying and the flat pickle format.
+#
+# Usage:
+#   python tree.py
+##
+
+import unittest
+import sys, os, copy, cPickle
+
+testDir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(testDir, os.pardir, os.pardir, "pylib"))
+from ecmascript.frontend import tokenizer, treegenerator, tree
+from ecmascript.transform.check import scopes
+
+def parse(text):
+    return treegenerator.createFileTree(tokenizer.FastTokenizer().parseStream(text, "test"), "test")
+
+def walk(node):
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(reversed(node.children))
+
+def roundtrip(obj):
+    return cPickle.loads(cPickle.dumps(obj, 2))
+
+
+class TestNode(unittest.TestCase):
+
+    def testSlots(self):
+        node = parse("var a = b + 1;")
+        for n in walk(node):
+            self.assertFalse(vars(n))  # no fields in __dict__
+        self.assertFalse(hasattr(node, 'scope'))
+        node.extra = 1  # other attributes are still possible
+        self.assertEqual(node.extra, 1)
+        self.assertEqual(tree.Node("block").dep, None)
+
+    def testPickleTree(self):
+        root = scopes.create_scopes(parse("function f(a) { var b = a; return function () { return b; }; }"))
+        root.getChild("statements").addChild(tree.Node("foo").set("bar", 1))
+        copied = roundtrip(root)
+
+        self.assertEqual(copied.toXml(), root.toXml())
+        origPos = dict((id(n), pos) for pos, n in enumerate(walk(root)))
+        copiedPos = dict((id(n), pos) for pos, n in enumerate(walk(copied)))
+        for orig, node in zip(walk(root), walk(copied)):
+            self.assertEqual((node.__class__, node.attributes), (orig.__class__, orig.attributes))
+            for child in node.children:
+                self.assertTrue(child.parent is node)
+            self.assertEqual(hasattr(node, 'scope'), hasattr(orig, 'scope'))
+            if hasattr(orig, 'scope'):
+                # scopes reference the very nodes of the unpickled tree
+                self.assertEqual(copiedPos[id(node.scope.node)], origPos[id(orig.scope.node)])
+                for name, var in orig.scope.vars.items():
+                    self.assertEqual([copiedPos[id(n)] for n in node.scope.vars[name].uses],
+                                     [origPos[id(n)] for n in var.uses])
+
+    def testPickleDetached(self):
+        root = parse("a(b(c));")
+        call = [x for x in walk(root) if x.type == "call"][1]
+        call.parent.removeChild(call)  # keeps call.parent
+        root2, call2 = roundtrip((root, call))
+        self.assertEqual(call2.toXml(), call.toXml())
+        self.assertFalse(root2.contains(call2))
+        self.assertTrue(call2.parent.parent.parent.parent is root2)
+
+    def testPickleDeepTree(self):
+        root = parse("x = " + "+".join(["1"] * 3000) + ";")
+        limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(1000)
+        try:
+            copied = roundtrip(root)
+        finally:
+            sys.setrecursionlimit(limit)
+        self.assertEqual(len(list(walk(copied))), len(list(walk(root))))
+
+    def testPickleWideTree(self):
+        root = parse("a();" * 3000)
+        self.assertEqual(roundtrip(root).toXml(), root.toXml())
+        self.assertFalse(tree._listedNodes)
+
+        inner = root.getChild("statements").children[10]
+        inner2, root2 = roundtrip((inner, root))  # a node before its top node
+        self.assertEqual(root2.toXml(), root.toXml())
+        self.assertTrue(inner2.parent.parent is root2)
+
+    def testCopy(self):
+        node = parse("a = 1;").getChild("statements").children[0]
+        clone = node.clone()
+        self.assertEqual((clone.__class__, clone.type, clone.attributes), (node.__class__, node.type, node.attributes))
+        self.assertTrue(clone.children is node.children)
+        self.assertFalse(clone.attributes is node.attributes)
+
+        deep = copy.deepcopy(node)
+        self.assertEqual(deep.toXml(), node.toXml())
+        self.assertFalse(deep.children[0] is node.children[0])
+        self.assertTrue(deep.children[0].parent is deep)
+
+        other = tree.Node("other")
+        node.patch(other)
+        self.assertEqual((other.type, other.comments), ("other", node.comments))
+
+
+if __name__ == "__main__":
+    unittest.main()
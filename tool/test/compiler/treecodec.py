@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+################################################################################
+#
+#  qooxdoo - the new era of web development
+#
+#  http://qooxdoo.org
+#
+#  License:
+#    MIT: https://opensource.org/licenses/MIT
+#    See the LICENSE file in the project's top-level directory for details.
+#
+################################################################################
+
+##
+# treecodec: binary encoding of syntax trees for the cache.
+#
+# Usage:
+#   python treecodec.py
+##
+
+import unittest
+import sys, os, cPickle
+
+testDir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(testDir, os.pardir, os.pardir, "pylib"))
+from ecmascript.frontend import tokenizer, treegenerator, tree, treecodec, treeutil
+from ecmascript.frontend.treegenerator import PackerFlags as pp
+from ecmascript.transform.check import scopes, jshints
+
+def parse(text):
+    return treegenerator.createFileTree(tokenizer.FastTokenizer().parseStream(text, "test"), "test")
+
+def walk(node):
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(reversed(node.children))
+
+def roundtrip(obj):
+    return treecodec.codec.decode(treecodec.codec.encode(obj))
+
+
+class TestTreeCodec(unittest.TestCase):
+
+    def testTree(self):
+        root = scopes.create_scopes(parse(
+            "/** doc */\nfunction f(a) { // c\n var b = a; return function () { return b; }; }"))
+        root.hint = jshints.Hint()
+        root.hint.node = root
+        root.getChild("statements").addChild(tree.Node("foo").set("bar", 1))
+        data = treecodec.codec.encode(root)
+        self.assertTrue(data.startswith(treecodec.MAGIC))
+        copied = treecodec.codec.decode(data)
+
+        self.assertEqual(copied.toXml(), root.toXml())
+        self.assertTrue(copied.hint.node is copied)
+        origPos = dict((id(n), pos) for pos, n in enumerate(walk(root)))
+        copiedPos = dict((id(n), pos) for pos, n in enumerate(walk(copied)))
+        for orig, node in zip(walk(root), walk(copied)):
+            self.assertEqual((node.__class__, node.type, node.attributes), (orig.__class__, orig.type, orig.attributes))
+            for child in node.children:
+                self.assertTrue(child.parent is node)
+            self.assertEqual([c.get("value") for c in getattr(node, "comments", [])],
+                             [c.get("value") for c in getattr(orig, "comments", [])])
+            self.assertEqual(hasattr(node, 'hint'), hasattr(orig, 'hint'))
+            self.assertEqual(hasattr(node, 'scope'), hasattr(orig, 'scope'))
+            if hasattr(orig, 'scope'):
+                self.assertEqual(copiedPos[id(node.scope.node)], origPos[id(orig.scope.node)])
+                for name, var in orig.scope.vars.items():
+                    self.assertEqual([copiedPos[id(n)] for n in node.scope.vars[name].uses],
+                                     [origPos[id(n)] for n in var.uses])
+
+    def testLazy(self):
+        root = scopes.create_scopes(parse("""qx.Class.define("foo.Bar", {
+            extend : qx.core.Object,
+            members : {
+              /** doc */
+              a : function(x) { return x + foo.Bar.c(); },
+              b : 2
+            },
+            statics : { c : function() { return 1; } }
+          });"""))
+        data = treecodec.codec.encode(root)
+        copied = treecodec.lazyCodec.decode(data)
+
+        classMap = treeutil.getClassMap(treeutil.findQxDefine(copied))
+        self.assertEqual(classMap["extend"].toJS(pp), "qx.core.Object")
+        members = classMap["members"]
+        self.assertEqual(sorted(members), ["a", "b"])
+        for value in members.values() + classMap["statics"].values():
+            self.assertEqual(value.type, "value")
+            self.assertFalse(tree._hasChildren(value))  # not decoded yet
+        self.assertEqual(members["a"].parent.comments[0].get("value"), "/** doc */")
+        function = members["a"].getChild("function")  # decodes the subtree of a
+        self.assertTrue(function.parent is members["a"])
+        self.assertFalse(tree._hasChildren(members["b"]))
+
+        # scopes reference the nodes of subtrees not decoded yet
+        static = classMap["statics"]["c"]
+        scope = copied.scope.children[1]
+        self.assertEqual(scope.node.type, "function")
+        self.assertTrue(scope.node.parent is static)
+        self.assertFalse(tree._hasChildren(static))
+        self.assertEqual(scope.node.toJS(pp), "function(){return 1;}")
+        self.assertTrue(tree._hasChildren(static))
+
+        self.assertEqual(copied.toXml(), root.toXml())
+        self.assertEqual(treecodec.codec.decode(treecodec.codec.encode(copied)).toXml(), root.toXml())
+        partial = treecodec.lazyCodec.decode(data)
+        self.assertEqual(cPickle.loads(cPickle.dumps(partial, 2)).toXml(), root.toXml())
+
+    def testSharedLists(self):
+        root = parse("a = 1; b = 2;")
+        first, second = root.getChild("statements").children
+        second.comments = first.comments  # as left by Node.patch()
+        copied = roundtrip(root)
+        first, second = copied.getChild("statements").children
+        self.assertTrue(second.comments is first.comments)
+        self.assertFalse(second.commentsAfter is first.commentsAfter)
+
+    def testDetached(self):
+        root = parse("a(b(c));")
+        call = [x for x in walk(root) if x.type == "call"][1]
+        call.parent.removeChild(call)  # keeps call.parent
+        copied = roundtrip(call)
+        self.assertEqual(copied.toXml(), call.toXml())
+        self.assertEqual(copied.parent.toXml(), call.parent.toXml())
+        self.assertFalse(copied.parent.contains(copied))
+
+    def testIrregular(self):
+        node = tree.Node("block")
+        child = tree.Node("foo")
+        node.children = [child, child]
+        data = treecodec.codec.encode(node)
+        self.assertTrue(data.startswith(treecodec.MAGIC_PICKLE))
+        copied = treecodec.codec.decode(data)
+        self.assertTrue(copied.children[0] is copied.children[1])
+        self.assertEqual(roundtrip({"a": 1}), {"a": 1})
+        self.assertRaises(ValueError, treecodec.codec.decode, treecodec.MAGIC[:2])
+
+
+if __name__ == "__main__":
+    unittest.main()
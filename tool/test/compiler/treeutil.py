@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+################################################################################
+#
+#  qooxdoo - the new era of web development
+#
+#  http://qooxdoo.org
+#
+#  License:
+#    MIT: https://opensource.org/licenses/MIT
+#    See the LICENSE file in the project's top-level directory for details.
+#
+################################################################################
+
+##
+# treeutil: NodeVisitor dispatch and fused tree passes.
+#
+# Usage:
+#   python treeutil.py
+##
+
+import unittest
+import sys, os
+
+testDir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(testDir, os.pardir, os.pardir, "pylib"))
+from ecmascript.frontend import tokenizer, treegenerator, treeutil
+
+def parse(text):
+    return treegenerator.createFileTree(tokenizer.FastTokenizer().parseStream(text, "test"), "test")
+
+
+class Collector(treeutil.NodeVisitor):
+
+    def __init__(self):
+        super(Collector, self).__init__()
+        self.found = []
+
+    def visit_identifier(self, node):
+        self.found.append(node.get("value"))
+
+    def visit_function(self, node):
+        self.found.append("function")  # handler decides about the subtree
+
+
+class Trace(treeutil.TreePass):
+
+    def __init__(self, events):
+        self.events = events
+
+    def enter_function(self, node):
+        self.events.append("enter function")
+
+    def leave_function(self, node):
+        self.events.append("leave function")
+
+    def finish(self):
+        self.events.append("finish")
+
+
+class Identifiers(treeutil.TreePass):
+
+    def __init__(self, events):
+        self.events = events
+
+    def enter(self, node):
+        if node.type == "identifier":
+            self.events.append(node.get("value"))
+
+
+class TestTreeUtil(unittest.TestCase):
+
+    def testNodeVisitor(self):
+        collector = Collector()
+        collector.visit(parse("a = b; x(function(c) { return d; }, e);"))
+        self.assertEqual(collector.found, ["a", "b", "x", "function", "e"])
+        self.assertEqual(collector.handler("block"), None)
+        self.assertEqual(collector.handler("identifier").__name__, "visit_identifier")
+
+    def testDeepTree(self):
+        root = parse("x = " + "+".join(["a"] * 3000) + ";")
+        collector = Collector()
+        collector.visit(root)
+        self.assertEqual(len(collector.found), 3001)
+
+    def testWalkPasses(self):
+        events = []
+        treeutil.walkPasses(parse("a(function() { b(); function c() {} });"),
+                            [Trace(events), Identifiers(events)])
+        self.assertEqual(events, ["a", "enter function", "b", "enter function", "c",
+                                  "leave function", "leave function", "finish"])
+
+
+if __name__ == "__main__":
+    unittest.main()
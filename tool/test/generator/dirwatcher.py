@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+################################################################################
+#
+#  qooxdoo - the new era of web development
+#
+#  http://qooxdoo.org
+#
+#  License:
+#    MIT: https://opensource.org/licenses/MIT
+#    See the LICENSE file in the project's top-level directory for details.
+#
+################################################################################
+
+##
+# DirWatcher: change notification for directories (needs Linux inotify).
+#
+# Usage:
+#   python dirwatcher.py
+##
+
+import unittest
+import sys, os, shutil, tempfile
+
+testDir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(testDir, os.pardir, os.pardir, "pylib"))
+from generator.runtime import DirWatcher
+
+
+class TestDirWatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.sub = os.path.join(self.root, "sub")
+        os.mkdir(self.sub)
+        open(os.path.join(self.sub, "a.txt"), "w").write("a")
+        self.watcher = DirWatcher.DirWatcher()
+
+    def tearDown(self):
+        self.watcher.close()
+        shutil.rmtree(self.root)
+
+    def testChanges(self):
+        self.assertTrue(self.watcher.watch(self.root))
+        self.assertTrue(self.watcher.watch(self.sub))
+        self.assertEqual(self.watcher.changes(), set())
+
+        open(os.path.join(self.sub, "a.txt"), "w").write("b")  # in place
+        self.assertEqual(self.watcher.changes(), set([self.sub]))
+        self.assertEqual(self.watcher.changes(), set())
+
+        open(os.path.join(self.root, "b.txt"), "w").close()
+        shutil.rmtree(self.sub)
+        self.assertEqual(self.watcher.changes(), set([self.root, self.sub]))
+        open(os.path.join(self.root, "b.txt"), "w").write("b")
+        self.assertEqual(self.watcher.changes(), set([self.root]))
+
+    def testNoDirectory(self):
+        self.assertFalse(self.watcher.watch(os.path.join(self.sub, "a.txt")))
+        self.assertFalse(self.watcher.watch(os.path.join(self.root, "missing")))
+
+
+if __name__ == "__main__":
+    if not DirWatcher.available():
+        print "DirWatcher not available on this platform, skipping"
+    else:
+        unittest.main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+################################################################################
+#
+#  qooxdoo - the new era of web development
+#
+#  http://qooxdoo.org
+#
+#  License:
+#    MIT: https://opensource.org/licenses/MIT
+#    See the LICENSE file in the project's top-level directory for details.
+#
+################################################################################
+
+##
+# Image: image infos from file headers, and their index.
+#
+# Usage:
+#   python image.py
+##
+
+import unittest
+import sys, os, shutil, struct, tempfile, time
+
+testDir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(testDir, os.pardir, os.pardir, "pylib"))
+from generator.resource import Image as ImageModule
+from generator.resource.Image import Image
+
+PNG  = struct.pack("8B", 137, 80, 78, 71, 13, 10, 26, 10) + struct.pack("!I4sII5B", 13, "IHDR", 30, 20, 8, 6, 0, 0, 0)
+GIF  = "GIF89a" + struct.pack("<HH", 12, 34) + "\0" * 20
+JPEG = ("\xff\xd8" + "\xff\xe0" + struct.pack("!H", 1002) + "\0" * 1000  # app0, beyond the header read
+        + "\xff\xff\xff\xc2" + struct.pack("!HBHH", 17, 8, 48, 64) + "\0" * 12 + "\xff\xd9")
+SVG  = '<?xml version="1.0"?>\n<svg xmlns="http://www.w3.org/2000/svg" width="2in" height="16px"/>'
+B64  = '{"foo.png": {"width": 1, "height": 1, "type": "png", "encoding": "base64", "data": ""}}'
+
+
+class TestImageInfo(unittest.TestCase):
+
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tempDir)
+
+    def image(self, name, content, age=100):
+        path = os.path.join(self.tempDir, name)
+        open(path, "wb").write(content)
+        past = time.time() - age
+        os.utime(path, (past, past))
+        return Image(path)
+
+    def testFormats(self):
+        self.assertEqual(self.image("a.png", PNG).getInfo(), (30, 20, "png"))
+        self.assertEqual(self.image("a.gif", GIF).getInfo(), (12, 34, "gif"))
+        self.assertEqual(self.image("a.jpg", JPEG).getInfo(), (64, 48, "jpeg"))
+        self.assertEqual(self.image("a.svg", SVG).getInfo(), (144, 16, "svg"))
+        self.assertEqual(self.image("a.b64.json", B64).getInfo(), (-1, -1, "b64"))
+        self.assertEqual(self.image("b.png", PNG[:20]).getInfo(), None)
+        self.assertEqual(self.image("b.jpg", JPEG[:1010]).getInfo(), None)
+        self.assertEqual(self.image("b.svg", "<html/>").getInfo(), None)
+
+    def testIndex(self):
+        index = ImageModule.ImageInfoIndex()
+        reads = []
+        def readInfo():
+            reads.append(1)
+            return (1, 2, "png")
+        img = self.image("c.png", PNG)
+        self.assertEqual(index.get(img.path, readInfo), (1, 2, "png"))
+        self.assertEqual(index.get(img.path, readInfo), (1, 2, "png"))
+        self.assertEqual(len(reads), 1)
+
+        img = self.image("c.png", PNG + "\0", age=50)  # changed
+        index.get(img.path, readInfo)
+        self.assertEqual(len(reads), 2)
+
+        img = self.image("c.png", PNG, age=0)  # too fresh to be kept
+        index.get(img.path, readInfo)
+        index.get(img.path, readInfo)
+        self.assertEqual(len(reads), 4)
+
+    def testSave(self):
+        class Cache(object):
+            def write(self, cacheId, content, memory=False):
+                self.content = dict(content)
+        index = ImageModule.ImageInfoIndex()
+        index._index = {}
+        kept, gone = self.image("d.png", PNG), self.image("e.png", PNG)
+        index.get(kept.path, kept._readInfo)
+        index.get(gone.path, gone._readInfo)
+        os.remove(gone.path)
+        cache = Cache()
+        saved = ImageModule.Context.__dict__.get("cache")
+        ImageModule.Context.cache = cache
+        try:
+            index.save()
+        finally:
+            ImageModule.Context.cache = saved
+        self.assertEqual(cache.content.keys(), [os.path.abspath(kept.path)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+################################################################################
+#
+#  qooxdoo - the new era of web development
+#
+#  http://qooxdoo.org
+#
+#  License:
+#    MIT: https://opensource.org/licenses/MIT
+#    See the LICENSE file in the project's top-level directory for details.
+#
+################################################################################
+
+##
+# Library: incremental scans of library directories.
+#
+# Usage:
+#   python library.py
+##
+
+import unittest
+import sys, os, shutil, tempfile, time
+
+testDir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(testDir, os.pardir, os.pardir, "pylib"))
+from generator.resource.Library import Library
+from generator.runtime import DirWatcher
+
+
+class TestScanTree(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.analyzed = []
+        self.past = time.time() - 100
+        self.write("a.png", "a")
+        self.write("a.meta", "{}")
+        self.write("sub/b.txt", "b")
+        self.write(".svn/c.txt", "c")
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write(self, name, content):
+        path = os.path.join(self.root, name)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        open(path, "w").write(content)
+        self.age(path)
+
+    ##
+    # move the time stamps of <path> and its directories out of the racy window
+    def age(self, path):
+        self.past += 1
+        while len(path) >= len(self.root):
+            if os.path.exists(path):
+                os.utime(path, (self.past, self.past))
+            path = os.path.dirname(path)
+
+    def analyze(self, path, name):
+        self.analyzed.append(path[len(self.root) + 1:])
+        return None if name.endswith(".meta") else name.upper()
+
+    def scan(self, last):
+        lib = Library(os.path.join(self.root, "Manifest.json"), None)
+        self.analyzed = []
+        infos = lib._scanTree("resources", self.root, self.analyze, last._scanManifest if last else {}, ".meta")
+        return lib, sorted(infos)
+
+    def testRescan(self):
+        lib, infos = self.scan(None)
+        self.assertEqual(infos, ["A.PNG", "B.TXT"])
+        self.assertEqual(sorted(self.analyzed), ["a.meta", "a.png", "sub/b.txt"])
+
+        lib, infos = self.scan(lib)
+        self.assertEqual(infos, ["A.PNG", "B.TXT"])
+        self.assertEqual(self.analyzed, [])
+
+        self.write("sub/b.txt", "bb")
+        self.write("sub/d.txt", "d")
+        lib, infos = self.scan(lib)
+        self.assertEqual(infos, ["A.PNG", "B.TXT", "D.TXT"])
+        self.assertEqual(sorted(self.analyzed), ["sub/b.txt", "sub/d.txt"])
+
+        self.write("a.meta", "{ }")  # companion file changed
+        lib, infos = self.scan(lib)
+        self.assertEqual(sorted(self.analyzed), ["a.meta", "a.png"])
+
+        os.remove(os.path.join(self.root, "sub", "b.txt"))
+        self.age(os.path.join(self.root, "sub", "b.txt"))
+        lib, infos = self.scan(lib)
+        self.assertEqual(infos, ["A.PNG", "D.TXT"])
+        self.assertEqual(self.analyzed, [])
+
+    def testScanIsFresh(self):
+        self.write("Manifest.json", "{}")
+        lib, infos = self.scan(None)
+        lib.path = self.root
+        lib.assets = {"resources": {"path": "."}}
+        lib._manifestMTime = os.stat(lib.manipath).st_mtime
+        self.assertTrue(lib._scanIsFresh())
+
+        path = os.path.join(self.root, "sub", "b.txt")
+        open(path, "w").write("bb")  # in place, the directory is unchanged
+        os.utime(path, (self.past + 1, self.past + 1))
+        self.assertFalse(lib._scanIsFresh())
+        lib, infos = self.scan(lib)
+        lib.path = self.root
+        lib.assets = {"resources": {"path": "."}}
+        lib._manifestMTime = os.stat(lib.manipath).st_mtime
+        self.assertTrue(lib._scanIsFresh())
+
+        self.write("sub/d.txt", "d")
+        self.assertFalse(lib._scanIsFresh())
+
+    def watchedScan(self, root):
+        root, self.root = self.root, root
+        try:
+            self.write("Manifest.json", "{}")
+            self.write("sub/b.txt", "b")
+            lib, infos = self.scan(None)
+        finally:
+            root, self.root = self.root, root
+        lib.path = lib.namespace = lib.encoding = lib.classPath = lib.resourcePath = root
+        lib.assets = {"resources": {"path": "."}, "translations": {"path": None}}
+        lib._manifestMTime = os.stat(lib.manipath).st_mtime
+        lib._scanId = root
+        self.assertTrue(lib._startWatching())
+        return lib
+
+    def testWatching(self):
+        if not DirWatcher.available():
+            return
+        first = self.root
+        other = tempfile.mkdtemp()
+        try:
+            lib1, lib2 = self.watchedScan(first), self.watchedScan(other)
+            self.assertEqual(len(Library._watchedScans), 2)  # with one DirWatcher
+            self.assertTrue(lib1.scanIsCurrent(lib1) and lib2.scanIsCurrent(lib2))
+
+            open(os.path.join(other, "sub", "b.txt"), "w").write("bb")
+            Library._takeChanges()
+            self.assertEqual(sorted(Library._watchedScans), [lib1.manipath])
+            self.assertTrue(lib1.scanIsCurrent(lib1))
+            self.assertFalse(lib2.scanIsCurrent(lib2))
+        finally:
+            Library._watchedScans.clear()
+            shutil.rmtree(other)
+
+    def testWatchingUnavailable(self):
+        def fail():
+            raise OSError(24, "Too many open files")
+        watcher, DirWatcher.DirWatcher = DirWatcher.DirWatcher, fail
+        shared, Library._dirWatcher = Library._dirWatcher, None
+        try:
+            self.write("Manifest.json", "{}")
+            lib, infos = self.scan(None)
+            self.assertFalse(lib._startWatching())
+        finally:
+            DirWatcher.DirWatcher = watcher
+            Library._dirWatcher = shared
+
+    def testRacy(self):
+        lib, infos = self.scan(None)
+        open(os.path.join(self.root, "sub", "b.txt"), "w").write("bb")  # fresh time stamp
+        lib, infos = self.scan(lib)
+        lib, infos = self.scan(lib)
+        self.assertEqual(self.analyzed, ["sub/b.txt"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+################################################################################
+#
+#  qooxdoo - the new era of web development
+#
+#  http://qooxdoo.org
+#
+#  License:
+#    MIT: https://opensource.org/licenses/MIT
+#    See the LICENSE file in the project's top-level directory for details.
+#
+################################################################################
+
+##
+# ResourceIndex: matching @asset hints against library resources.
+#
+# Usage:
+#   python resourceindex.py
+##
+
+import unittest
+import sys, os, re
+
+testDir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(testDir, os.pardir, os.pardir, "pylib"))
+from generator.resource.Resource import Resource
+from generator.resource.Image import Image
+from generator.resource.CombinedImage import CombinedImage
+from generator.resource.AssetHint import AssetHint
+from generator.resource.ResourceIndex import ResourceIndex, literalPrefix
+
+
+def resource(id_, cls=Resource):
+    res = cls()
+    res.set_id(unicode(id_))
+    return res
+
+def hint(expanded):
+    assetHint = AssetHint(expanded)
+    assetHint.expanded = expanded
+    assetHint.regex = re.compile(expanded)
+    return assetHint
+
+class Lib(object):
+    def __init__(self, resources):
+        self.resources = resources
+    def getResources(self):
+        return self.resources
+
+
+class TestResourceIndex(unittest.TestCase):
+
+    def testLiteralPrefix(self):
+        self.assertEqual(literalPrefix("qx/icon/Tango/16/.*"), "qx/icon/Tango/16/")
+        self.assertEqual(literalPrefix("qx/static/blank.gif"), "qx/static/blank")
+        self.assertEqual(literalPrefix("foo/bars?/.*"), "foo/bar")
+        self.assertEqual(literalPrefix("a{2}"), "")
+        self.assertEqual(literalPrefix("foo/(a|b)"), "")
+        self.assertEqual(literalPrefix("foo/a\\.png"), "foo/a")
+        self.assertEqual(literalPrefix("foo/a"), "foo/a")
+
+    def testMatch(self):
+        combined = resource("app/combined.png", CombinedImage)
+        combined.embeds = [resource("app/icons/a.png", Image)]
+        first, second = resource("app/b.png"), resource("app/b.png")
+        libs = [Lib(set([first, combined, resource("app/b.meta")])),
+                Lib(set([second, resource("other/c.png")]))]
+        index = ResourceIndex.forLibraries(libs)
+        self.assertTrue(ResourceIndex.forLibraries(libs) is index)
+
+        matched, seen = index.match([hint("app/icons/.*"), hint("app/b.*"), hint("none/.*")])
+        self.assertEqual(seen, [True, True, False])
+        resources = [index.resources[i] for i in matched]
+        self.assertEqual(sorted(res.id for res in resources), ["app/b.png", "app/b.png", "app/combined.png"])
+        identities = [id(res) for res in resources]
+        self.assertTrue(identities.index(id(first)) < identities.index(id(second)))  # library order
+
+        self.assertTrue(index.match([hint("app/icons/.*"), hint("app/b.*"), hint("none/.*")]) is index.match(
+            [hint("app/icons/.*"), hint("app/b.*"), hint("none/.*")]))
+        self.assertEqual(index.match([hint(".*c\\.png")])[1], [True])
+
+        libs[1].resources = set([second])  # a library re-scan
+        self.assertFalse(ResourceIndex.forLibraries(libs) is index)
+
+
+if __name__ == "__main__":
+    unittest.main()
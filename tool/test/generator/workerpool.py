@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+################################################################################
+#
+#  qooxdoo - the new era of web development
+#
+#  License:
+#    MIT: https://opensource.org/licenses/MIT
+#    See the LICENSE file in the project's top-level directory for details.
+#
+################################################################################
+
+##
+# WorkerPool: errors of variant sets processed in worker processes.
+#
+# Usage:
+#   python workerpool.py
+##
+
+import unittest
+import sys, os
+
+testDir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(testDir, os.pardir, os.pardir, "pylib"))
+from generator.runtime import WorkerPool
+from generator.Generator import _variantSetTask
+
+
+class Console(object):
+    def capture(self):
+        return []
+
+class UnpicklableError(Exception):
+    def __init__(self, a, b):
+        Exception.__init__(self, "%s/%s" % (a, b))
+
+def process(num):
+    if num == 1:
+        raise KeyError("missing")
+    if num == 2:
+        raise UnpicklableError("a", "b")
+    if num == 3:
+        sys.exit(3)
+
+
+class TestVariantSetTask(unittest.TestCase):
+
+    def testErrors(self):
+        data = {'process' : process, 'console' : Console()}
+        results = list(WorkerPool.imap(_variantSetTask, range(4), 2, data))
+        errors = [error for _, error in results]
+
+        self.assertEqual(errors[0], None)
+        self.assertTrue(isinstance(errors[1], KeyError))
+        self.assertEqual(errors[1].args, ("missing",))
+        self.assertTrue("raise KeyError" in errors[1].workerTraceback)
+        self.assertTrue(isinstance(errors[2], RuntimeError))
+        self.assertEqual(str(errors[2]), "UnpicklableError: a/b")
+        self.assertTrue("UnpicklableError" in errors[2].workerTraceback)
+        self.assertTrue(isinstance(errors[3], SystemExit))
+        self.assertEqual(errors[3].code, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
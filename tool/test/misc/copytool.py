@@ -25,10 +25,11 @@ import shutil
 import stat
 import filecmp
 import tempfile
+import time
 
 libDir = os.path.abspath(os.path.join(os.pardir, os.pardir, "pylib"))
 sys.path.append(libDir)
-from misc.copytool import CopyTool
+from misc.copytool import CopyTool, copyFiles
 
 class TestCopyTool(unittest.TestCase):
 
@@ -233,5 +234,76 @@ class TestCopyTool(unittest.TestCase):
         self.failUnless(os.path.isfile(syncTargetPath), "Directory contents not synchronized!")
     
 
+class TestCopyFiles(unittest.TestCase):
+
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+        self.past = time.time() - 100
+        self.sources = [self.write(os.path.join("source", name), name) for name in ("a", "b", "c")]
+        self.targets = [os.path.join(self.tempDir, "target", "x", "y", name) for name in ("a", "b", "c")]
+        self.pairs = zip(self.sources, self.targets)
+
+    def tearDown(self):
+        shutil.rmtree(self.tempDir)
+
+    def write(self, name, content):
+        path = os.path.join(self.tempDir, name)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        file(path, "w").write(content)
+        self.past += 1
+        os.utime(path, (self.past, self.past))
+        return path
+
+    def testCopy(self):
+        manifest = {}
+        self.assertEqual(copyFiles(self.pairs, manifest, threads=2), 3)
+        self.assertEqual([file(path).read() for path in self.targets], ["a", "b", "c"])
+        self.assertEqual(copyFiles(self.pairs, manifest, threads=2), 0)
+
+        self.write("source/b", "bb")
+        self.write("target/x/y/c", "cc")  # changed target
+        self.assertEqual(copyFiles(self.pairs, manifest, threads=2), 2)
+        self.assertEqual([file(path).read() for path in self.targets], ["a", "bb", "c"])
+
+        os.remove(self.targets[0])
+        self.assertEqual(copyFiles(self.pairs, manifest), 1)
+        self.assertEqual(copyFiles(self.pairs, manifest), 0)
+
+    def testOtherSource(self):
+        manifest = {}
+        copyFiles(self.pairs, manifest)
+        other = self.write(os.path.join("other", "a"), "x")  # same size
+        os.utime(other, (os.stat(self.sources[0]).st_mtime,) * 2)  # and mtime
+        self.assertEqual(copyFiles([(other, self.targets[0])], manifest), 1)
+        self.assertEqual(file(self.targets[0]).read(), "x")
+
+    def testRacy(self):
+        manifest = {}
+        path = os.path.join(self.tempDir, "source", "a")
+        file(path, "w").write("aa")  # fresh time stamp
+        self.assertEqual(copyFiles(self.pairs, manifest), 3)
+        self.assertEqual(copyFiles(self.pairs, manifest), 1)
+
+    def testHardLink(self):
+        manifest = {}
+        copyFiles(self.pairs, manifest, link="hard")
+        self.failUnless(os.path.samefile(self.sources[0], self.targets[0]), "Target is not a link to the source!")
+
+        copyFiles(self.pairs, {})  # replaces the link
+        self.failIf(os.path.samefile(self.sources[0], self.targets[0]), "Target is still a link to the source!")
+        file(self.targets[0], "w").write("changed")
+        self.assertEqual(file(self.sources[0]).read(), "a")
+
+    def testClone(self):
+        copyFiles(self.pairs, {}, link="clone")  # falls back to copying
+        self.assertEqual([file(path).read() for path in self.targets], ["a", "b", "c"])
+        self.failUnlessRaises(ValueError, copyFiles, self.pairs, {}, "soft")
+
+    def testMissingSource(self):
+        pairs = [(os.path.join(self.tempDir, "nothing"), self.targets[0])] + self.pairs[1:]
+        self.assertEqual(copyFiles(pairs, {}), 2)
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
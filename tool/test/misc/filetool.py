@@ -23,7 +23,7 @@ import sys, os, shutil, tempfile
 
 libDir = os.path.abspath(os.path.join(os.pardir, os.pardir, "pylib"))
 sys.path.append(libDir)
-from misc import filetool
+from misc import filetool, securehash
 
 class TestWalk(unittest.TestCase):
 
@@ -156,5 +156,38 @@ class TestWalk(unittest.TestCase):
         self.failUnlessEqual(foundFiles, expectedFiles)
 
 
+class TestHashedFile(unittest.TestCase):
+
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tempDir)
+
+    def testWrite(self):
+        out = filetool.HashedFile(self.tempDir)
+        out.write(u"var a = 1;")
+        out.write(u"var b = '\xe4';")
+        content = u"var a = 1;var b = '\xe4';".encode("utf-8")
+        self.failUnlessEqual(out.hexdigest(), securehash.getHash(content))
+        path = os.path.join(self.tempDir, out.hexdigest()[:12] + ".js")
+        out.close(path)
+        self.failUnlessEqual(os.listdir(self.tempDir), [os.path.basename(path)])
+        self.failUnlessEqual(open(path, "rb").read(), content)
+
+    def testCompressed(self):
+        path = os.path.join(self.tempDir, "foo.js.gz")
+        out = filetool.HashedFile(self.tempDir, compress=True)
+        out.write(u"foo();")
+        out.close(path)
+        self.failUnlessEqual(filetool.gunzip(path), u"foo();")
+
+    def testDiscard(self):
+        out = filetool.HashedFile(self.tempDir)
+        out.write(u"foo();")
+        out.discard()
+        self.failUnlessEqual(os.listdir(self.tempDir), [])
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file